@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark of a plain --polygon run of create_insar_template.
+
+Compares the wall time of the run with the same run when numpy and requests are imported
+up front (what every run paid when the CLI imported asf_extractor and the geometry kernel
+at module level), and lists the slowest imports reported by ``python -X importtime``.
+The run fails if any of numpy, pandas, openpyxl or requests gets imported.
+
+    PYTHONPATH=src python benchmarks/startup.py --repeat 20
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+HEAVY_MODULES = ('numpy', 'pandas', 'openpyxl', 'requests')
+EAGER_MODULES = ('numpy', 'requests')
+POLYGON = 'POLYGON((130.5892 31.2764,131.0501 31.2764,131.0501 31.5882,130.5892 31.5882,130.5892 31.2764))'
+CLI_ARGS = ['--polygon', POLYGON, '--relativeOrbit', '54', '--subswath', '1 2']
+
+RUN = (
+    "import sys, runpy{preload}; "
+    "sys.argv = ['create_insar_template.py'] + {args!r}; "
+    "runpy.run_module('maketemplate.cli.create_insar_template', run_name='__main__'); "
+    "heavy = [m for m in {heavy!r} if m in sys.modules]; "
+    "sys.exit('heavy modules imported: ' + ', '.join(heavy) if heavy and {strict} else 0)"
+)
+
+
+def _env():
+    env = os.environ.copy()
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [src, env.get('PYTHONPATH')]))
+    return env
+
+
+def time_run(code, repeat, env):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL, env=env)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def slowest_imports(env, count):
+    code = "import maketemplate.cli.create_insar_template"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, env=env, check=True)
+    rows = []
+    for line in result.stderr.splitlines()[1:]:
+        _, cumulative, name = line.split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main(iargs=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='Runs per measurement (default: %(default)s).')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to list (default: %(default)s).')
+    inps = parser.parse_args(iargs)
+    env = _env()
+
+    interpreter = time_run('pass', inps.repeat, env)
+    lazy = time_run(RUN.format(preload='', args=CLI_ARGS, heavy=HEAVY_MODULES, strict=True), inps.repeat, env)
+    eager = time_run(RUN.format(preload=', ' + ', '.join(EAGER_MODULES), args=CLI_ARGS, heavy=HEAVY_MODULES, strict=False), inps.repeat, env)
+
+    print(f"Median wall time over {inps.repeat} runs")
+    print(f"  interpreter only          : {interpreter * 1000:8.1f} ms")
+    print(f"  --polygon run             : {lazy * 1000:8.1f} ms")
+    print(f"  --polygon run, eager deps : {eager * 1000:8.1f} ms")
+    print(f"  lazy / eager              : {lazy / eager:8.2f}")
+    print("\nSlowest imports of maketemplate.cli.create_insar_template (cumulative us)")
+    for cumulative, name in slowest_imports(env, inps.top):
+        print(f"  {cumulative:8d}  {name.strip()}")
+
+
+if __name__ == '__main__':
+    main()
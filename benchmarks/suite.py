@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite of the template pipeline: sheet loading, polygon parsing, config
+generation, the full create_insar_template run and the ASF lookup (against a local stub
+of the search API). Inputs are synthetic, see synthetic.py.
+
+Every benchmark reports the median and fastest time per call over --repeat samples.
+--save stores the numbers in benchmarks/baseline.json, --compare checks the current
+numbers against it and fails if a benchmark got more than --threshold times slower.
+
+    PYTHONPATH=src python benchmarks/suite.py --quick
+    PYTHONPATH=src python benchmarks/suite.py --filter parse_polygon --compare
+    PYTHONPATH=src python benchmarks/suite.py --save
+"""
+import io
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import synthetic
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+TEMPLATE = os.path.join(ROOT, 'docs', 'template.txt')
+SHEET_SIZES = (10, 1000, 100000)
+QUICK_SIZES = (10, 1000)
+VERTICES = (5, 100, 1000, 10000)
+GRANULE = 'S1B_IW_SLC__1SDV_20190627T092113_20190627T092140_016880_01FC2F_0C69'
+
+BENCHMARKS = []
+
+
+def benchmark(params=(None,)):
+    """
+    Registers a benchmark.
+
+    The decorated function gets one entry of ``params`` and the work directory, does its
+    setup and returns the zero-argument callable that is timed.
+    """
+    def register(func):
+        BENCHMARKS.append((func.__name__, params, func))
+        return func
+    return register
+
+
+class Workspace:
+    """
+    Work directory of a run; synthetic inputs are generated once and reused.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def sheet(self, rows, extension='.xlsx'):
+        path = os.path.join(self.path, f"sheet_{rows}{extension}")
+        with self._lock:
+            if not os.path.exists(path):
+                synthetic.write_sheet(path, rows)
+        return path
+
+    def directory(self, name):
+        path = os.path.join(self.path, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+
+@benchmark(params=SHEET_SIZES)
+def read_excel_uncached(rows, work):
+    from maketemplate import read_excel
+
+    path = work.sheet(rows)
+    return lambda: read_excel.main(path, columns=read_excel.SHEET_COLUMNS, cache=False)
+
+
+@benchmark(params=SHEET_SIZES)
+def read_excel_cached(rows, work):
+    from maketemplate import read_excel
+
+    path = work.sheet(rows)
+    read_excel.main(path, columns=read_excel.SHEET_COLUMNS)
+    return lambda: read_excel.main(path, columns=read_excel.SHEET_COLUMNS)
+
+
+@benchmark(params=SHEET_SIZES)
+def read_csv(rows, work):
+    from maketemplate import read_excel
+
+    path = work.sheet(rows, '.csv')
+    return lambda: read_excel.main(path, columns=read_excel.SHEET_COLUMNS)
+
+
+@benchmark(params=SHEET_SIZES)
+def records_from_dataframe(rows, work):
+    from maketemplate import api, read_excel
+
+    df = read_excel.main(work.sheet(rows, '.csv'), columns=read_excel.SHEET_COLUMNS)
+    return lambda: api.records_from_dataframe(df)
+
+
+@benchmark(params=SHEET_SIZES)
+def validate_sheet(rows, work):
+    from maketemplate import read_excel, validate
+
+    df = read_excel.main(work.sheet(rows, '.csv'), columns=read_excel.SHEET_COLUMNS)
+    return lambda: validate.validate_sheet(df)
+
+
+@benchmark(params=SHEET_SIZES)
+def find_clusters(rows, work):
+    from maketemplate import clusters, read_excel
+
+    df = read_excel.main(work.sheet(rows, '.csv'), columns=read_excel.SHEET_COLUMNS)
+    return lambda: clusters.find_clusters(df)
+
+
+@benchmark(params=VERTICES)
+def parse_polygon(vertices, work):
+    from maketemplate import api
+
+    polygon = synthetic.polygon_wkt(vertices)
+    return lambda: api.parse_polygon(polygon)
+
+
+@benchmark(params=VERTICES)
+def polygon_bounds_100(vertices, work):
+    from maketemplate import geometry
+
+    polygons = [row['polygon'] for row in synthetic.sheet_rows(100, vertices=vertices)]
+    return lambda: geometry.polygon_bounds(polygons)
+
+
+@benchmark(params=('builtin', 'template.txt'))
+def generate_config(template, work):
+    from maketemplate import api
+
+    record = api.records_from_dataframe(_dataframe(synthetic.sheet_rows(1)))[0]
+    values = api.template_values(record, api.RenderOptions())
+    template_file = TEMPLATE if template == 'template.txt' else None
+    return lambda: api.generate_config(**values, template_file=template_file)
+
+
+@benchmark(params=('builtin', 'template.txt'))
+def render_record(template, work):
+    from maketemplate import api
+
+    record = api.records_from_dataframe(_dataframe(synthetic.sheet_rows(1)))[0]
+    compiled = api.compile_template(TEMPLATE if template == 'template.txt' else None)
+    options = api.RenderOptions()
+    return lambda: api.render_record(record, options, compiled)
+
+
+@benchmark(params=('off', 'on'))
+def instrument_stage(state, work):
+    from maketemplate import instrument
+
+    if state == 'off':
+        def run():
+            with instrument.stage('bench'):
+                instrument.count('bench')
+        return run
+
+    # What instrument.stage/count do while a recording is active
+    recorder = instrument.Recorder()
+
+    def run():
+        with instrument._Stage(recorder, 'bench'):
+            recorder.count('bench')
+    return run
+
+
+@benchmark(params=SHEET_SIZES)
+def main_xlsfile(rows, work):
+    from maketemplate.cli.create_insar_template import create_parser, main
+
+    path = work.sheet(rows)
+    out_dir = work.directory(f"out_{rows}")
+    return lambda: main(create_parser(['--xlsfile', path, '--save', '--dir', out_dir]))
+
+
+@benchmark(params=(250, 1000, 5000))
+def asf_lookup(results, work):
+    from maketemplate import asf_extractor
+    from maketemplate.asf_cache import ResponseCache
+
+    api_url = _asf_stub(synthetic.asf_results(results, GRANULE))
+    url = (
+        "https://search.asf.alaska.edu/#/?polygon=POLYGON((130.5892%2031.2764,131.0501%2031.2764,131.0501%2031.5882,"
+        f"130.5892%2031.5882,130.5892%2031.2764))&productTypes=SLC&flightDirs=Ascending&granule={GRANULE}-SLC"
+    )
+    cache = ResponseCache(os.path.join(work.path, f"asf_{results}.sqlite"))
+    session = asf_extractor.create_session()
+    return lambda: asf_extractor.main(url, cache=cache, refresh=True, api_url=api_url, session=session)
+
+
+def _dataframe(rows):
+    import pandas as pd
+
+    return pd.DataFrame(rows)
+
+
+def _asf_stub(results):
+    """
+    Serves ``results`` like the ASF search API (newest first, 'end' and 'maxResults'
+    filters) on a local port for the rest of the process; returns the endpoint URL.
+    """
+    results = sorted(results, key=lambda r: r['st'], reverse=True)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            page = results
+            if 'end' in query:
+                page = [r for r in page if r['st'] <= query['end'][0]]
+            body = json.dumps({'results': page[:int(query['maxResults'][0])]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/services/search/param"
+
+
+def measure(func, repeat, min_time):
+    """
+    Times ``func`` like timeit: calls per sample are chosen so one sample takes at least
+    ``min_time`` seconds.
+
+    Returns:
+        (median, fastest) seconds per call.
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time or number >= 1_000_000:
+            break
+        number *= 10
+    samples = [total / number for total in timer.repeat(repeat, number)]
+    return statistics.median(samples), min(samples)
+
+
+def _format(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.2f} ns"
+
+
+def run(selected, repeat, min_time, work):
+    results = {}
+    for name, params, func in BENCHMARKS:
+        for param in params:
+            key = name if param is None else f"{name}[{param}]"
+            if not selected(key, param):
+                continue
+            with contextlib.redirect_stdout(io.StringIO()):
+                target = func(param, work)
+                median, fastest = measure(target, repeat, min_time)
+            results[key] = {'median': median, 'min': fastest}
+            yield key, results[key]
+
+
+def main(iargs=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--filter', action='append', help='Only run benchmarks whose name contains this (repeatable).')
+    parser.add_argument('--quick', action='store_true', help=f'Skip the {SHEET_SIZES[-1]}-row sheets.')
+    parser.add_argument('--repeat', type=int, default=5, help='Samples per benchmark (default: %(default)s).')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per sample (default: %(default)s).')
+    parser.add_argument('--work-dir', help='Keep the generated inputs in this directory (default: a temporary one).')
+    parser.add_argument('--baseline', default=BASELINE, help='Baseline file (default: benchmarks/baseline.json).')
+    parser.add_argument('--save', action='store_true', help='Store the results in the baseline file.')
+    parser.add_argument('--compare', action='store_true', help='Compare with the baseline file, fail on regressions.')
+    parser.add_argument('--threshold', type=float, default=1.5, help='Slowdown reported as regression (default: %(default)s).')
+    inps = parser.parse_args(iargs)
+
+    def selected(key, param):
+        if inps.quick and param in SHEET_SIZES and param not in QUICK_SIZES:
+            return False
+        return not inps.filter or any(part in key for part in inps.filter)
+
+    baseline = {}
+    if inps.compare or inps.save:
+        try:
+            with open(inps.baseline) as f:
+                baseline = json.load(f)['results']
+        except (OSError, ValueError, KeyError):
+            if inps.compare:
+                parser.error(f"No baseline in {inps.baseline}, create it with --save")
+
+    with contextlib.ExitStack() as stack:
+        work_dir = inps.work_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix='maketemplate_bench_'))
+        os.makedirs(work_dir, exist_ok=True)
+
+        results = {}
+        regressions = []
+        for key, result in run(selected, inps.repeat, inps.min_time, Workspace(work_dir)):
+            results[key] = result
+            line = f"{key:40s} {_format(result['median'])}  (min {_format(result['min'])})"
+            if inps.compare and key in baseline:
+                ratio = result['median'] / baseline[key]['median']
+                line += f"  x{ratio:5.2f}"
+                if ratio > inps.threshold:
+                    regressions.append(key)
+                    line += '  REGRESSION'
+            print(line, flush=True)
+
+    if inps.save:
+        baseline.update(results)
+        with open(inps.baseline, 'w') as f:
+            json.dump({
+                'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'processor': platform.processor()},
+                'saved': time.strftime('%Y-%m-%d'),
+                'results': dict(sorted(baseline.items())),
+            }, f, indent=1)
+            f.write('\n')
+        print(f"Baseline saved in {inps.baseline}")
+
+    if regressions:
+        sys.exit(f"{len(regressions)} benchmark(s) slower than {inps.threshold}x the baseline: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
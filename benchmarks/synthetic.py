@@ -0,0 +1,87 @@
+"""
+Synthetic inputs for the benchmarks: volcano sheets of any size and polygons with any
+number of vertices, generated deterministically from a seed.
+"""
+import math
+import random
+
+SUBSWATHS = (1, 2, 3, '1 2', '2 3', '1 2 3')
+
+
+def polygon_wkt(vertices, lon=-85.35, lat=10.8, radius=0.05):
+    """
+    Returns a closed WKT polygon ring with ``vertices`` corners around (lon, lat).
+    """
+    points = [
+        (lon + radius * math.cos(2 * math.pi * i / vertices), lat + radius * math.sin(2 * math.pi * i / vertices))
+        for i in range(vertices)
+    ]
+    points.append(points[0])
+    return 'POLYGON((' + ','.join(f"{x:.4f} {y:.4f}" for x, y in points) + '))'
+
+
+def sheet_rows(count, seed=0, vertices=5):
+    """
+    Returns ``count`` rows shaped like docs/Central_America.xlsx: every site has an
+    ascending and a descending row with a small polygon somewhere on the globe.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        if i % 2 == 0:
+            lon, lat = rng.uniform(-179, 179), rng.uniform(-60, 70)
+            polygon = polygon_wkt(vertices, lon, lat, radius=rng.uniform(0.02, 0.2))
+        rows.append({
+            'name': f"Site{i // 2}",
+            'direction': 'D' if i % 2 == 0 else 'A',
+            'ssaraopt.startDate': 20160701,
+            'ssaraopt.endDate': 'auto',
+            'ssaraopt.relativeOrbit': rng.randint(1, 175),
+            'topsStack.subswath': rng.choice(SUBSWATHS),
+            'mintpy.troposphericDelay': 'auto',
+            'polygon': polygon,
+            'satellite': 'Sen',
+        })
+    return rows
+
+
+def write_sheet(path, count, seed=0):
+    """
+    Writes a synthetic sheet of ``count`` rows; the format follows the extension of
+    ``path`` (.xlsx, .csv, .parquet or .feather).
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(sheet_rows(count, seed))
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False)
+    elif path.endswith('.parquet') or path.endswith('.feather'):
+        # Arrow needs one type per column
+        df['topsStack.subswath'] = df['topsStack.subswath'].astype(str)
+        getattr(df, 'to_parquet' if path.endswith('.parquet') else 'to_feather')(path)
+    else:
+        df.to_excel(path, index=False)
+    return path
+
+
+def asf_results(count, granule, path=54, seed=0):
+    """
+    Returns ``count`` jsonlite2 result entries, newest first, with ``granule`` (covering
+    the whole globe) as the oldest one, so a lookup has to page through all of them.
+    """
+    rng = random.Random(seed)
+    results = []
+    for i in range(count - 1):
+        lon, lat = rng.uniform(-179, 178), rng.uniform(-60, 70)
+        results.append({
+            'gn': f"S1A_IW_SLC__1SDV_{i:08d}",
+            'p': rng.randint(1, 175),
+            'fd': rng.choice(('ASCENDING', 'DESCENDING')),
+            'st': f"2020-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}",
+            'w': f"POLYGON(({lon} {lat},{lon + 1} {lat},{lon + 1} {lat + 1},{lon} {lat + 1},{lon} {lat}))",
+        })
+    results.append({
+        'gn': granule, 'p': path, 'fd': 'ASCENDING', 'st': '2019-01-01T00:00:00.000000',
+        'w': 'POLYGON((-180 -90,180 -90,180 90,-180 90,-180 -90))',
+    })
+    return results
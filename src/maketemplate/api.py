@@ -0,0 +1,474 @@
+"""
+Library API to build template records and render them without any side effects.
+
+    from maketemplate.api import RenderOptions, records_from_dataframe, render_templates
+
+    records = records_from_dataframe(df)
+    for name, text in render_templates(records, 'docs/template.txt', RenderOptions(start_date='20160601')):
+        sink.add(name, text)
+"""
+import os
+import math
+from dataclasses import dataclass
+from datetime import datetime as dt
+from datetime import timedelta as td
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from maketemplate import instrument
+from maketemplate.records import Record
+from maketemplate.template import CompiledTemplate, load_template
+
+# Spreadsheet rows converted to records at a time
+CHUNK_ROWS = 4096
+
+
+def miaplpy_check_longitude(lon1, lon2):
+    """
+    Adjusts longitude values based on the Miaplpy criteria.
+    """
+    if abs(lon1 - lon2) > 0.2:
+        val = (abs(lon1 - lon2) - 0.2) / 2
+        miaLon1 = round(lon1 - val, 2) if lon1 > 0 else round(lon1 + val, 2)
+        miaLon2 = round(lon2 + val, 2) if lon2 > 0 else round(lon2 - val, 2)
+    else:
+        miaLon1 = lon1
+        miaLon2 = lon2
+    return miaLon1, miaLon2
+
+
+def topstack_check_longitude(lon1, lon2):
+    """
+    Adjusts longitude values based on the TopStack criteria.
+    """
+    if abs(lon1 - lon2) < 5:
+        val = (5 - abs(lon1 - lon2)) / 2
+        topLon1 = round(lon1 + val, 2) if lon1 > 0 else round(lon1 - val, 2)
+        topLon2 = round(lon2 - val, 2) if lon2 > 0 else round(lon2 + val, 2)
+    else:
+        topLon1 = min(lon1, lon2)
+        topLon2 = max(lon1, lon2)
+    return topLon1, topLon2
+
+
+def generate_lat_lon_steps(latitude_step, lat1, lat2):
+    """
+    Generates latitude and longitude steps based on the input latitude step.
+
+    Args:
+        lat_step: Latitude step size in degrees.
+        lat1, lat2: Latitude range.
+
+    Returns:
+        A tuple containing the latitude and longitude steps.
+    """
+    #Convert lat_step from meters to degrees
+    lat_step = latitude_step / 111320
+    latitude = (lat1 + lat2)/2
+    lon_step = round(lat_step / math.cos(math.radians(float(latitude))), 5)
+    return lat_step, lon_step
+
+
+def parse_polygon(polygon):
+        polygon = polygon.replace("POLYGON((", "").replace("))", "")
+
+        latitude = []
+        longitude = []
+
+        for vertex in polygon.split(','):
+            lon, lat = vertex.split()[:2]
+            longitude.append(float(lon))
+            latitude.append(float(lat))
+
+        lon1, lon2 = round(min(longitude),2), round(max(longitude),2)
+        lat1, lat2 = round(min(latitude),2), round(max(latitude),2)
+
+        return lat1, lat2, lon1, lon2
+
+
+# Sheet/CLI satellite names -> satellite names of the templates
+SATELLITES = {
+    'Sen': 'SENTINEL-1A,SENTINEL-1B',
+    'Radarsat': 'RADARSAT2',
+    'TerraSAR': 'TerraSAR-X',
+}
+
+
+def get_satellite_name(satellite):
+    try:
+        return SATELLITES[satellite]
+    except (KeyError, TypeError):
+        raise ValueError(f"Invalid satellite name. Choose from {list(SATELLITES)}") from None
+
+
+TEMPLATE_MARKERS = (
+    'satellite', 'relative_orbit', 'start_date', 'end_date', 'subswath', 'tropospheric_delay_method',
+    'lat1', 'lat2', 'lon1', 'lon2', 'miaLon1', 'miaLon2', 'lat_step', 'lon_step', 'min_temp_coh',
+)
+
+
+def generate_config(relative_orbit, satellite, lat1, lat2, lon1, lon2, topLon1, topLon2, subswath, tropospheric_delay_method, miaLon1, miaLon2, lat_step, lon_step, start_date, end_date, min_temp_coh, template_file):
+    """
+    Generate configuration either by rendering a template file with ***markers*** or by
+    falling back to the built-in f-string config.
+    """
+    if template_file and os.path.exists(template_file):
+        # mapping of marker -> value (all converted to strings when substituted)
+        mapping = {
+            'satellite': satellite,
+            'relative_orbit': relative_orbit,
+            'start_date': start_date,
+            'end_date': end_date,
+            'subswath': subswath,
+            'tropospheric_delay_method': tropospheric_delay_method,
+            'lat1': lat1,
+            'lat2': lat2,
+            'lon1': lon1,
+            'lon2': lon2,
+            'miaLon1': miaLon1,
+            'miaLon2': miaLon2,
+            'lat_step': lat_step,
+            'lon_step': lon_step,
+            'min_temp_coh': min_temp_coh,
+        }
+
+        # unknown markers are left unchanged
+        return load_template(template_file).render(mapping)
+    config = f"""\
+######################################################
+ssaraopt.platform                  = {satellite}  # [Sentinel-1 / ALOS2 / RADARSAT2 / TerraSAR-X / COSMO-Skymed]
+ssaraopt.relativeOrbit             = {relative_orbit}
+ssaraopt.startDate                 = {start_date}  # YYYYMMDD
+ssaraopt.endDate                   = {end_date}    # YYYYMMDD
+######################################################
+topsStack.subswath                 = {subswath} # '1 2'
+topsStack.numConnections           = 3    # comment
+topsStack.azimuthLooks             = 5    # comment
+topsStack.rangeLooks               = 20   # comment
+topsStack.filtStrength             = 0.2  # comment
+topsStack.unwMethod                = snaphu  # comment
+topsStack.coregistration           = auto  # [NESD geometry], auto for NESD
+#topsStack.excludeDates            =  20240926
+######################################################
+mintpy.load.autoPath               = yes
+mintpy.compute.cluster             = local #[local / slurm / pbs / lsf / none], auto for none, cluster type
+mintpy.compute.numWorker           = 40 #[int > 1 / all], auto for 4 (local) or 40 (non-local), num of workers
+mintpy.plot.maxMemory              = 0.2  #[float], auto for 4, max memory used by one call of view.py for plotting.
+mintpy.networkInversion.parallel   = yes  #[yes / no], auto for no, parallel processing using dask
+mintpy.save.hdfEos5                = yes   #[yes / update / no], auto for no, save timeseries to UNAVCO InSAR Archive format
+mintpy.save.hdfEos5.update         = yes   #[yes / no], auto for no, put XXXXXXXX as endDate in output filename
+mintpy.save.hdfEos5.subset         = yes   #[yes / no], auto for no, put subset range info in output filename
+mintpy.save.kmz                    = yes   #[yes / no], auto for yes, save geocoded velocity to Google Earth KMZ file
+mintpy.reference.minCoherence      = auto      #[0.0-1.0], auto for 0.85, minimum coherence for auto method
+mintpy.troposphericDelay.method    = {tropospheric_delay_method}   # pyaps  #[pyaps / height_correlation / base_trop_cor / no], auto for pyaps
+######################################################
+miaplpy.load.processor               = isce
+miaplpy.multiprocessing.numProcessor = 40
+miaplpy.inversion.rangeWindow        = 24   # range window size for searching SHPs, auto for 15
+miaplpy.inversion.azimuthWindow      = 7    # azimuth window size for searching SHPs, auto for 15
+miaplpy.timeseries.tempCohType       = full     # [full, average], auto for full.
+miaplpy.interferograms.networkType   = delaunay # network
+miaplpy.unwrap.snaphu.tileNumPixels  = 10000000000     # number of pixels in a tile, auto for 10000000
+######################################################
+minsar.miaplpyDir.addition           = date  #[name / lalo / no] auto for no (miaply_$name_startDate_endDate))
+mintpy.subset.lalo                   = {lat1}:{lat2},{lon1}:{lon2}
+miaplpy.subset.lalo                  = {lat1}:{lat2},{miaLon1}:{miaLon2}  #[S:N,W:E / no], auto for no
+miaplpy.load.startDate               = auto  # 20200101
+miaplpy.load.endDate                 = auto
+mintpy.geocode.laloStep              = {lat_step},{lon_step}
+miaplpy.timeseries.minTempCoh        = {min_temp_coh}      # auto for 0.5
+mintpy.networkInversion.minTempCoh   = {min_temp_coh}
+mintpy.network.coherenceBased  = yes
+######################################################
+minsar.insarmaps_flag                = True
+minsar.upload_flag                   = True
+minsar.insarmaps_dataset             = filt*DS
+"""
+    return config
+
+
+def _loc_dict(lat1, lat2, lon1, lon2, satellite):
+    miaLon1, miaLon2 = miaplpy_check_longitude(lon1, lon2)
+    topLon1, topLon2 = topstack_check_longitude(lon1, lon2)
+    return {
+        'latitude1': lat1,
+        'latitude2': lat2,
+        'longitude1': lon1,
+        'longitude2': lon2,
+        'miaplpy.longitude1': miaLon1,
+        'miaplpy.longitude2': miaLon2,
+        'topsStack.longitude1': topLon1,
+        'topsStack.longitude2': topLon2,
+        'satellite': satellite
+    }
+
+
+def iter_records(df, latitude_step=None, chunk_size=CHUNK_ROWS):
+    """
+    Yields one template Record per spreadsheet row.
+
+    The DataFrame is converted ``chunk_size`` rows at a time and column by column (one
+    ``tolist`` per column and chunk), so only one chunk of Python values exists at any
+    time however long the sheet is. Bounding boxes, MiaplPy/TopsStack longitudes and
+    lat/lon steps are computed for the whole polygon column of a chunk at once.
+
+    Args:
+        df: DataFrame as returned by ``read_excel.main``.
+        latitude_step: Latitude step size in meters, sets 'lat_step'/'lon_step' of the records if given.
+        chunk_size: rows converted at a time.
+    """
+    from maketemplate import geometry
+
+    yesterday = (dt.now() - td(days=1)).strftime('%Y%m%d')
+    satellites = {}
+
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        nrows = len(chunk)
+
+        def _column(name, default=''):
+            return chunk[name].tolist() if name in chunk.columns else [default] * nrows
+
+        polygons = _column('polygon')
+        with instrument.stage('polygons'):
+            lat1, lat2, lon1, lon2 = geometry.polygon_bounds(polygons)
+        instrument.count('polygons', nrows)
+        miaLon1, miaLon2 = geometry.miaplpy_check_longitudes(lon1, lon2)
+        topLon1, topLon2 = geometry.topstack_check_longitudes(lon1, lon2)
+
+        for sat in set(_column('satellite', None)) - satellites.keys():
+            satellites[sat] = get_satellite_name(sat)
+
+        columns = {
+            'name': _column('name'),
+            'direction': _column('direction'),
+            'satellite': [satellites[sat] for sat in _column('satellite', None)],
+            'relative_orbit': [_orbit(orbit) for orbit in _column('ssaraopt.relativeOrbit')],
+            'start_date': _column('ssaraopt.startDate'),
+            'end_date': [yesterday if 'auto' in str(end) else end for end in _column('ssaraopt.endDate')],
+            'subswath': _column('topsStack.subswath'),
+            'tropospheric_delay_method': _column('mintpy.troposphericDelay', 'auto'),
+            'polygon': polygons,
+            'latitude1': lat1.tolist(),
+            'latitude2': lat2.tolist(),
+            'longitude1': lon1.tolist(),
+            'longitude2': lon2.tolist(),
+            'mia_lon1': miaLon1.tolist(),
+            'mia_lon2': miaLon2.tolist(),
+            'top_lon1': topLon1.tolist(),
+            'top_lon2': topLon2.tolist(),
+        }
+        if latitude_step is not None:
+            lat_step, lon_step = geometry.lat_lon_steps(latitude_step, lat1, lat2)
+            columns['lat_step'], columns['lon_step'] = lat_step.tolist(), lon_step.tolist()
+
+        keys = list(columns)
+        for values in zip(*columns.values()):
+            yield Record(**dict(zip(keys, values)))
+
+
+def _orbit(value):
+    """
+    Returns a whole-valued relative orbit as int: pandas reads an orbit column with
+    blank cells as float64, which would render '142.0'. Blank cells stay NaN.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def records_from_dataframe(df, latitude_step=None):
+    """
+    Converts the spreadsheet into one template record per row.
+
+    Returns:
+        A list of Records, see ``iter_records``.
+    """
+    return list(iter_records(df, latitude_step))
+
+
+def location_record(relative_orbit, satellite, direction, lat1, lat2, lon1, lon2, **fields):
+    """
+    Builds the template record of a single area of interest (--polygon or --url input).
+
+    Args:
+        relative_orbit: relative orbit number.
+        satellite: full satellite name (see ``get_satellite_name``).
+        direction: flight direction ('A' or 'D').
+        lat1, lat2, lon1, lon2: bounding box of the area.
+        fields: further record fields, e.g. name, polygon, topsStack.subswath.
+    """
+    return Record.from_mapping({
+        **_loc_dict(lat1, lat2, lon1, lon2, satellite),
+        'name': 'Unknown',
+        'direction': direction,
+        'relative_orbit': relative_orbit,
+        **fields,
+    })
+
+
+@dataclass(frozen=True)
+class RenderOptions:
+    """
+    Options shared by all templates of a run.
+
+    Attributes:
+        start_date, end_date: ssaraopt start/end date (YYYYMMDD or 'auto').
+        min_temp_coh: temporal coherence threshold.
+        lat_step: latitude step size in meters.
+        template: path of the ***marker*** template, the built-in config if None or missing.
+        file_name: template name used instead of the record name.
+        workflow: processing workflow of the template profiles (see maketemplate.profiles),
+            the default workflow of every satellite if None.
+        profile_templates: render every record with the template of its profile; if
+            False (an explicit --template) every record renders with ``template``.
+    """
+    start_date: str = '20170101'
+    end_date: str = 'auto'
+    min_temp_coh: float = 0.75
+    lat_step: float = 15
+    template: Optional[str] = None
+    file_name: Optional[str] = None
+    workflow: Optional[str] = None
+    profile_templates: bool = True
+
+    @classmethod
+    def from_namespace(cls, inps) -> 'RenderOptions':
+        """
+        Builds the options from parsed CLI arguments.
+        """
+        return cls(
+            start_date=inps.start_date[0],
+            end_date=inps.end_date[0],
+            min_temp_coh=inps.min_temp_coh,
+            lat_step=inps.lat_step,
+            template=inps.template,
+            file_name=inps.file_name,
+            workflow=getattr(inps, 'workflow', None),
+            profile_templates=not getattr(inps, 'template_given', False),
+        )
+
+
+def template_name(record: Union[Record, Dict[str, Any]], file_name: Optional[str] = None, suffix: str = '') -> str:
+    """
+    Returns the file name of the template of ``record``, e.g. 'SangaySenA18.template'
+    ('SangaySenA18_20170101_20191231.template' with a period ``suffix``).
+    """
+    name = file_name if file_name else record.get('name', '')
+    sat = "Sen" if "SEN" in (record.get('satellite') or '').upper()[:4] else ""
+    return f"{name}{sat}{record.get('direction')}{record.get('relative_orbit')}{suffix}.template"
+
+
+def _or_auto(value):
+    """
+    Returns ``value``, or 'auto' for a blank sheet cell (None, empty string or NaN).
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)) or not str(value).strip():
+        return 'auto'
+    return value
+
+
+def template_values(record: Union[Record, Dict[str, Any]], options: RenderOptions) -> Dict[str, Any]:
+    """
+    Returns the marker values of a record (the arguments of ``generate_config``).
+    """
+    lat1, lat2 = record.get('latitude1'), record.get('latitude2')
+    if record.get('lat_step') is not None:
+        lat_step, lon_step = record['lat_step'], record['lon_step']
+    else:
+        lat_step, lon_step = generate_lat_lon_steps(options.lat_step, lat1, lat2)
+
+    return {
+        'relative_orbit': record.get('relative_orbit', ''),
+        'satellite': record.get('satellite'),
+        'lat1': lat1,
+        'lat2': lat2,
+        'lon1': record.get('longitude1'),
+        'lon2': record.get('longitude2'),
+        'topLon1': record.get('topsStack.longitude1'),
+        'topLon2': record.get('topsStack.longitude2'),
+        'subswath': record.get('topsStack.subswath', ''),
+        'tropospheric_delay_method': _or_auto(record.get('tropospheric_delay_method')),
+        'miaLon1': record.get('miaplpy.longitude1'),
+        'miaLon2': record.get('miaplpy.longitude2'),
+        'lat_step': lat_step,
+        'lon_step': lon_step,
+        'start_date': options.start_date,
+        'end_date': options.end_date,
+        'min_temp_coh': options.min_temp_coh,
+    }
+
+
+def compile_template(template: Union[str, CompiledTemplate, None]) -> Optional[CompiledTemplate]:
+    """
+    Returns the compiled template for a path, or None (built-in config) if the path is None or missing.
+    """
+    if template is None or isinstance(template, CompiledTemplate):
+        return template
+    return load_template(template) if os.path.exists(template) else None
+
+
+def render_record(record: Union[Record, Dict[str, Any]], options: Optional[RenderOptions] = None, template: Union[str, CompiledTemplate, None] = None) -> str:
+    """
+    Renders the template text of one record.
+
+    Args:
+        record: template record (see ``records_from_dataframe`` and ``location_record``).
+        options: run options, defaults of RenderOptions if None.
+        template: path or CompiledTemplate, if None the template of the profile of the
+            record satellite and ``options.workflow`` (see ``profiles.find``), or
+            ``options.template`` if ``options.profile_templates`` is False.
+    """
+    options = options or RenderOptions()
+    compiled = compile_template(template) if template is not None else _profile_template(record, options)
+    return render_values(compiled, template_values(record, options))
+
+
+def _profile_template(record, options, cache=None):
+    """
+    Returns the compiled template of the profile of the record satellite and workflow.
+    """
+    from maketemplate import profiles
+
+    if not options.profile_templates:
+        return compile_template(options.template)
+    satellite = record.get('satellite')
+    if cache is not None and satellite in cache:
+        return cache[satellite]
+    compiled = profiles.compiled(profiles.find(satellite, options.workflow), options.template)
+    if cache is not None:
+        cache[satellite] = compiled
+    return compiled
+
+
+def render_values(compiled, values):
+    """
+    Renders marker values (see ``template_values``) with a compiled template, or the
+    built-in config if ``compiled`` is None.
+    """
+    if compiled is None:
+        return generate_config(**values, template_file=None)
+    return compiled.render(values)
+
+
+def render_templates(records: Iterable[Union[Record, Dict[str, Any]]], template: Union[str, CompiledTemplate, None] = None, options: Optional[RenderOptions] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Renders templates lazily, one (file name, template text) tuple per record.
+
+    Nothing is printed or written: the caller decides where the templates go. The
+    template is compiled once for the whole stream, or once per satellite profile.
+
+    Args:
+        records: iterable of template records.
+        template: path or CompiledTemplate, if None the template of the profile of every
+            record satellite and ``options.workflow`` (see ``profiles.find``), or
+            ``options.template`` if ``options.profile_templates`` is False.
+        options: run options, defaults of RenderOptions if None.
+    """
+    options = options or RenderOptions()
+    compiled = compile_template(template) if template is not None else None
+    profile_templates = {}
+
+    for record in records:
+        if template is None:
+            compiled = _profile_template(record, options, profile_templates)
+        yield template_name(record, options.file_name), render_values(compiled, template_values(record, options))
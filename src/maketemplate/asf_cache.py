@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing
+
+SCRATCHDIR = os.getenv('SCRATCHDIR')
+
+CACHE_NAME = 'maketemplate_asf_cache.sqlite'
+DEFAULT_TTL = 7 * 24 * 3600             # seconds
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024   # bytes
+
+
+def default_cache_path():
+    root = SCRATCHDIR or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, CACHE_NAME)
+
+
+def cache_key(bbox, dataset, processing_level, flight_direction, **extra):
+    """
+    Builds the normalized cache key of an ASF search query.
+
+    Args:
+        bbox: (min_lon, min_lat, max_lon, max_lat), rounded to 6 decimals so that
+              equivalent float formatting maps to the same key.
+        dataset, processing_level, flight_direction: search parameters (case-insensitive).
+        extra: any further query parameters (e.g. result paging).
+
+    Returns:
+        The key as a canonical JSON string.
+    """
+    query = {
+        'bbox': [round(float(value), 6) for value in bbox],
+        'dataset': str(dataset).upper(),
+        'processinglevel': str(processing_level).upper(),
+        'flightDirection': str(flight_direction).upper(),
+    }
+    query.update({key: str(value) for key, value in extra.items()})
+    return json.dumps(query, sort_keys=True)
+
+
+class ResponseCache:
+    """
+    ASF search responses stored in a single SQLite file.
+
+    Entries older than ``ttl`` seconds are ignored and removed. When the stored bodies
+    exceed ``max_bytes`` the least recently used entries are evicted.
+    """
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or default_cache_path()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, body TEXT NOT NULL, size INTEGER NOT NULL, '
+                'created REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def get(self, key):
+        """
+        Returns the cached body for ``key``, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute('SELECT body, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                return None
+            conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+            return row[0]
+
+    def put(self, key, body):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, body, size, created, accessed) VALUES (?, ?, ?, ?, ?)',
+                (key, body, len(body.encode('utf8')), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for key, size in conn.execute('SELECT key, size FROM responses ORDER BY accessed ASC'):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany('DELETE FROM responses WHERE key = ?', stale)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM responses')
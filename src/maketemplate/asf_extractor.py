@@ -1,10 +1,28 @@
+import re
 import sys
+import json
+import codecs
+import logging
 import requests
-from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs, urlencode
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from maketemplate import instrument
+from maketemplate.asf_cache import ResponseCache, cache_key
+
+logger = logging.getLogger(__name__)
 
 path=54
 frame=97
 
+ASF_SEARCH_API = "https://api-prod-private.asf.alaska.edu/services/search/param"
+MAX_RESULTS = 250      # results per page
+CHUNK_SIZE = 64 * 1024
+CONCURRENCY = 8
+RETRIES = 3
+BACKOFF = 0.5   # seconds, doubled after every failed attempt
+
 def extract_coordinates(polygon_str):
     # Remove "POLYGON((" and "))" to isolate the coordinates
     coordinates = polygon_str.replace("POLYGON((", "").replace("))", "")
@@ -25,7 +43,169 @@ def extract_coordinates(polygon_str):
     return min_lon, max_lon, min_lat, max_lat
 
 
-def main(url):
+def create_session(pool_size=CONCURRENCY, retries=RETRIES, backoff=BACKOFF):
+    """
+    Creates an HTTP session with a connection pool of ``pool_size`` and retries with
+    exponential backoff on connection errors, throttling (429) and server errors (5xx).
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=('GET',),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def iter_json_items(chunks, key='results'):
+    """
+    Yields the items of the JSON array stored under ``key`` one at a time.
+
+    Args:
+        chunks: iterable of text chunks of a JSON document, e.g. a streamed response.
+        key: name of the array to iterate over.
+    """
+    decoder = json.JSONDecoder()
+    marker = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    chunks = iter(chunks)
+    buffer = ''
+
+    # Skip everything up to the opening bracket of the array
+    while True:
+        match = marker.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        chunk = next(chunks, None)
+        if chunk is None:
+            return
+        buffer += chunk
+
+    pos = 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            item, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Item continues in the next chunk
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError(f"Truncated JSON response: '{key}' array is not terminated")
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield item
+
+
+def _stream_text(response, chunk_size=CHUNK_SIZE):
+    decoder = codecs.getincrementaldecoder('utf8')()
+    for chunk in response.iter_content(chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def _page_entries(params, key, cache, offline, refresh, api_url, session):
+    body = cache.get(key) if cache is not None and not refresh else None
+    if body is not None:
+        instrument.count('asf.cache_hits')
+        logger.debug("Using cached ASF response for %s", key)
+        yield from iter_json_items([body])
+        return
+
+    if offline:
+        raise RuntimeError(f"No cached ASF response for {key} (offline mode)")
+
+    instrument.count('asf.requests')
+    with instrument.stage('asf.http'):
+        response = (session or requests).get(f"{api_url}?{urlencode(params, safe=',:')}", stream=True)
+    with response:
+        response.raise_for_status()
+        logger.debug("ASF request for %s was successful", key)
+
+        text = []
+        stream = _stream_text(response)
+        if cache is not None:
+            stream = (chunk for chunk in stream if not text.append(chunk))
+
+        try:
+            yield from iter_json_items(stream)
+        except GeneratorExit:
+            # The caller stopped early: read the rest of the (bounded) page so it can be cached
+            if cache is not None:
+                for _ in stream:
+                    pass
+                cache.put(key, ''.join(text))
+            raise
+
+        if cache is not None:
+            cache.put(key, ''.join(text))
+
+
+def iter_results(bbox, dataset, processing_level, flight_direction, page_size=MAX_RESULTS, cache=None, offline=False, refresh=False, api_url=ASF_SEARCH_API, session=None):
+    """
+    Yields the jsonlite2 result entries of an ASF search, newest first, page by page.
+
+    Every page holds at most ``page_size`` entries and is parsed while it streams in, so
+    memory use does not depend on the total number of results. The next page is only
+    requested once the caller has consumed the current one: it asks for granules that
+    started no later than the oldest granule of the current page ('st' field), skipping
+    the granules of that boundary time which were already yielded.
+
+    Args:
+        bbox: (min_lon, min_lat, max_lon, max_lat) of the area of interest.
+        dataset, processing_level, flight_direction: ASF search parameters.
+        page_size: maximum number of results per request.
+        cache: ResponseCache for the pages, or None to always query the API.
+        offline: never query the API, fail if a page is not cached.
+        refresh: ignore the cached pages and store the new ones.
+        api_url: ASF search endpoint.
+        session: requests.Session used for the queries (see ``create_session``).
+    """
+    end = None
+    seen_at_end = set()
+
+    while True:
+        params = {
+            'bbox': ','.join(str(value) for value in bbox),
+            'dataset': dataset,
+            'processinglevel': processing_level,
+            'flightDirection': flight_direction,
+            'maxResults': page_size,
+            'output': 'jsonlite2',
+        }
+        if end:
+            params['end'] = end
+        key = cache_key(bbox, dataset, processing_level, flight_direction, maxResults=page_size, end=end or '')
+
+        count = 0
+        oldest = None
+        names_at_oldest = set()
+        for entry in _page_entries(params, key, cache, offline, refresh, api_url, session):
+            count += 1
+            start = entry.get('st')
+            if start is not None and (oldest is None or start < oldest):
+                oldest, names_at_oldest = start, set()
+            if start is not None and start == oldest:
+                names_at_oldest.add(entry.get('gn'))
+
+            if end and start == end and entry.get('gn') in seen_at_end:
+                continue
+            yield entry
+
+        if count < page_size or oldest is None or oldest == end:
+            return
+        end, seen_at_end = oldest, names_at_oldest
+
+
+def main(url, cache=None, offline=False, refresh=False, api_url=ASF_SEARCH_API, session=None):
     # Parse the URL
     parsed_url = urlparse(url)
 
@@ -39,31 +219,42 @@ def main(url):
 
     satellite = 'SENTINEL-1' if 'S1' in query_params['granule'][0] else None
 
-    # Format the result
-    bounding_box = f"{min_lon},{min_lat},{max_lon},{max_lat}"
+    if cache is None:
+        cache = ResponseCache()
 
-    api = f"https://api-prod-private.asf.alaska.edu/services/search/param?bbox={bounding_box}&dataset={satellite}&processinglevel={query_params['productTypes'][0]}&flightDirection={query_params['flightDirs'][0]}&maxResults=250&output=jsonlite2"
+    results = iter_results(
+        (min_lon, min_lat, max_lon, max_lat),
+        satellite,
+        query_params['productTypes'][0],
+        query_params['flightDirs'][0],
+        cache=cache,
+        offline=offline,
+        refresh=refresh,
+        api_url=api_url,
+        session=session,
+    )
 
-    request = requests.get(api)
-    if request.status_code == 200:
-        print("Request was successful\n")
-        data = request.json()
+    msg = f"Granule {query_params['granule'][0]} not found in the ASF search results"
 
-    for result in data.get("results", []):
+    for result in results:
         if result["gn"] not in query_params['granule'][0]:
             continue
 
-        print(result['gn'])
+        logger.debug("Found granule %s", result['gn'])
         result_min_lon, result_max_lon, result_min_lat, result_max_lat = extract_coordinates(result["w"])
 
         # Check if the result polygon's bounding box contains the input polygon's bounding box
         if not (result_min_lon <= min_lon and result_max_lon >= max_lon and
             result_min_lat <= min_lat and result_max_lat >= max_lat):
             msg = f"Result {result['gn']} does not contain the input polygon"
-            continue
+            # Granule names are unique, no later page can match
+            break
 
         path = result["p"]
         msg = None
+        break
+
+    results.close()
 
     if msg:
         raise ValueError(msg)
@@ -71,5 +262,54 @@ def main(url):
     return str(path), satellite, query_params['flightDirs'][0][0], min_lat, max_lat, min_lon, max_lon
 
 
+def resolve_urls(urls, concurrency=CONCURRENCY, retries=RETRIES, backoff=BACKOFF, cache=None, offline=False, refresh=False, api_url=ASF_SEARCH_API):
+    """
+    Resolves many ASF search URLs concurrently.
+
+    All requests share one pooled session and one response cache, at most
+    ``concurrency`` requests are in flight at a time.
+
+    Args:
+        urls: iterable of ASF search URLs (see ``main``).
+        concurrency: maximum number of concurrent requests.
+        retries, backoff: retry policy of the session (see ``create_session``).
+        cache, offline, refresh, api_url: see ``iter_results`` and ``main``.
+
+    Returns:
+        A list of (path, satellite, direction, lat1, lat2, lon1, lon2) tuples in input order.
+    """
+    urls = list(urls)
+    if cache is None:
+        cache = ResponseCache()
+
+    concurrency = max(1, min(concurrency, len(urls)))
+    with create_session(concurrency, retries, backoff) as session:
+        def _resolve(url):
+            return main(url, cache=cache, offline=offline, refresh=refresh, api_url=api_url, session=session)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(_resolve, urls))
+
+
+def read_url_file(file_name):
+    """
+    Reads a file with one ASF search URL per line, optionally preceded by a name.
+
+    Blank lines and lines starting with '#' are skipped.
+
+    Returns:
+        A list of (name, url) tuples, name is None when the line only holds a URL.
+    """
+    entries = []
+    with open(file_name, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split()
+            entries.append((parts[0], parts[1]) if len(parts) > 1 else (None, parts[0]))
+    return entries
+
+
 if __name__ == '__main__':
-    main(iargs=sys.argv)
\ No newline at end of file
+    main(iargs=sys.argv)
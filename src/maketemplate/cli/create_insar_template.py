@@ -3,65 +3,158 @@ import os
 import re
 import sys
 import math
+import time
 import argparse
+import itertools
+import contextlib
+import collections
 import datetime
-from datetime import datetime as dt
-from datetime import timedelta as td
-from maketemplate import asf_extractor
+from maketemplate import instrument, profiles
+from maketemplate.template import load_template
+# The template logic lives in maketemplate.api, names used by existing scripts are re-exported here
+from maketemplate.api import (
+    SATELLITES,
+    TEMPLATE_MARKERS,
+    RenderOptions,
+    compile_template,
+    generate_config,
+    generate_lat_lon_steps,
+    get_satellite_name,
+    iter_records,
+    location_record,
+    miaplpy_check_longitude,
+    parse_polygon,
+    records_from_dataframe,
+    render_record,
+    template_name,
+    template_values,
+    topstack_check_longitude,
+)
+from maketemplate.clusters import CELL_SIZE, MODES, OVERLAP
+from maketemplate.fanout import CHUNK_SIZE, FanOut, render_processes
+from maketemplate.profiles import WORKFLOWS
+from maketemplate.sinks import OUT_FORMATS, open_sink
+from maketemplate.validate import Problem, ValidationError, check_date, check_orbit, check_polygon, check_template, format_report, save_report, validate_sheet
 
 
 EXAMPLE = f"""
 DEFAULT FULLPATH FOR xlsfile IS ${os.getenv('SCRATCHDIR')}
 
 create_insar_template.py --xlsfile Central_America.xlsx --save
+create_insar_template.py --xlsfile Central_America.xlsx --save --jobs 8
+create_insar_template.py --xlsfile Central_America.xlsx --save --incremental
+create_insar_template.py --xlsfile Central_America.xlsx --save --watch
+create_insar_template.py --xlsfile Central_America.xlsx --validate-only --validation-report problems.json
+create_insar_template.py --xlsfile Central_America.xlsx Caribbean.xlsx --save --dedup union --cluster-report clusters.json
+create_insar_template.py --xlsfile Central_America.xlsx --save --out-format tar --archive templates.tar
+create_insar_template.py --xlsfile Central_America.xlsx --save --timings timings.json --profile run.folded
+create_insar_template.py --xlsfile Central_America.xlsx --save --processes 0 --period 20170101:20191231 20200101:20221231 --subswath '1 2' '2 3'
 create_insar_template.py --subswath '1 2' --url https://search.asf.alaska.edu/#/?zoom=9.065&center=130.657,31.033&polygon=POLYGON((130.5892%2031.2764,131.0501%2031.2764,131.0501%2031.5882,130.5892%2031.5882,130.5892%2031.2764))&productTypes=SLC&flightDirs=Ascending&resultsLoaded=true&granule=S1B_IW_SLC__1SDV_20190627T092113_20190627T092140_016880_01FC2F_0C69-SLC
+create_insar_template.py --url-file campaign_urls.txt --concurrency 16 --save
+create_insar_template.py --subswath '1 2' --offline --url <ASF search URL resolved before>
 create_insar_template.py --polygon 'POLYGON((130.5892 31.2764,131.0501 31.2764,131.0501 31.5882,130.5892 31.5882,130.5892 31.2764))' --relativeOrbit 54 --subswath '1 2' --satellite 'Sen' --start-date '20160601' --end-date '20230926'
+create_insar_template.py --serve 127.0.0.1:8765 --start-date 20160601 --xlsfile Central_America.xlsx --serve-template miaplpy=miaplpy_template.txt
+create_insar_template.py --polygon 'POLYGON((130.5892 31.2764,131.0501 31.2764,131.0501 31.5882,130.5892 31.5882,130.5892 31.2764))' --direction D --track-table sentinel1_tracks.npy
+create_insar_template.py --polygon 'POLYGON((130.5892 31.2764,131.0501 31.2764,131.0501 31.5882,130.5892 31.5882,130.5892 31.2764))' --relativeOrbit 54 --satellite 'Radarsat' --workflow miaplpy
 create_insar_template.py --polygon 'POLYGON((27.1216 36.557,27.2123 36.557,27.2123 36.62,27.1216 36.62,27.1216 36.557))' --relativeOrbit 131 --start-date 20220101 --end-date 20220228 --filename volcano
 """
 SCRATCHDIR = os.getenv('SCRATCHDIR')
 
-def create_parser():
+# Records looked up in the footprint index at a time
+BATCH_SIZE = 4096
+
+# numpy, pandas/openpyxl (--xlsfile) and requests (--url, --url-file) are imported where
+# they are used, so a plain --polygon run does not pay for importing them.
+
+def create_parser(iargs=None):
     synopsis = 'Create Template for insar processing'
     epilog = EXAMPLE
     parser = argparse.ArgumentParser(description=synopsis, epilog=epilog, formatter_class=argparse.RawTextHelpFormatter)
 
-    parser.add_argument('--xlsfile', type=str, help="Path to the xlsfile file with volcano data.")
-    parser.add_argument('--template', type=str, help="Path to the template file (default: template.txt in docs folder).")
+    parser.add_argument('--xlsfile', nargs='+', type=str, help="Path to the xlsfile file with volcano data (.xlsx, .csv, .parquet or .feather); several sheets are processed as one.")
+    parser.add_argument('--no-sheet-cache', dest='no_sheet_cache', action='store_true', help="Parse the workbook instead of loading the cached copy next to it.")
+    parser.add_argument('--template', type=str, help="Path to the template file, used for every satellite and workflow (default: template.txt in docs folder for Sentinel-1 topsStack, the docs/templates profile templates otherwise).")
     parser.add_argument('--url', type=str, help="URL to the ASF data.")
+    parser.add_argument('--url-file', dest='url_file', type=str, help="File with one ASF URL per line (optionally preceded by a template name), resolved concurrently.")
+    parser.add_argument('--concurrency', type=int, help="Maximum number of concurrent ASF requests for --url-file (default: 8).")
+    parser.add_argument('--footprint-index', dest='footprint_index', type=str, help="Granule footprint index (.npz, see FootprintIndex.save) used to fill in missing relative orbits.")
+    parser.add_argument('--track-table', dest='track_table', type=str, help="Sentinel-1 track table (.npy, see maketemplate.track_table): inputs without relative orbit get one template per covering track.")
+    parser.add_argument('--offline', action='store_true', help="Resolve --url from the ASF response cache only, never query the API.")
+    parser.add_argument('--refresh-cache', dest='refresh_cache', action='store_true', help="Query the ASF API even if the response is cached and update the cache.")
     parser.add_argument('--polygon', type=str, help="Polygon coordinates in WKT format.")
-    parser.add_argument('--relativeOrbit', dest='relative_orbit', type=int, help="relative orbit number.")
-    parser.add_argument('--direction', type=str, choices=['A', 'D'], default='A', help="Flight direction (default: %(default)s).")
-    parser.add_argument('--subswath', type=str, default='1 2 3', help="subswath numbers as a string (default: %(default)s).")
+    parser.add_argument('--relativeOrbit', dest='relative_orbit', nargs='+', type=int, help="relative orbit number; several numbers render one template per orbit (replacing the sheet orbits).")
+    parser.add_argument('--direction', type=str, choices=['A', 'D'], help="Flight direction (default: the tracks of both directions with --track-table, A otherwise).")
+    parser.add_argument('--subswath', nargs='+', type=str, help="subswath numbers as a string (default: '1 2 3'); several sets render one template per set (replacing the sheet subswaths).")
     parser.add_argument('--troposphericDelay-method',dest='tropospheric_delay_method', type=str, default='auto', help="Tropospheric correction mode.")
     parser.add_argument('--minTempCoh', dest='min_temp_coh', type=float, default=0.75, help="Threshold value for temporal coherence.")
     parser.add_argument('--lat-step', dest='lat_step', type=float, default=15, help="Latitude step size in meters (default: %(default)s meters).")
-    parser.add_argument('--satellite', type=str, choices=['Sen'], default='Sen', help="Specify satellite (default: %(default)s).")
-    parser.add_argument('--filename', dest='file_name', type=str, default=None, help=f"Name of template file (Default: Unknown).")
+    parser.add_argument('--satellite', type=str, choices=list(SATELLITES), default='Sen', help="Specify satellite (default: %(default)s).")
+    parser.add_argument('--workflow', type=str, choices=WORKFLOWS, help="Processing workflow of the template profiles (default: topsStack for Sen, stripmap for Radarsat/TerraSAR).")
+    parser.add_argument('--filename', dest='file_name', type=str, default=None, help="Name of template file (Default: Unknown).")
     parser.add_argument('--save', action="store_true")
+    parser.add_argument('--out-format', dest='out_format', choices=OUT_FORMATS, default='dir', help="Write one file per template (dir) or stream all templates into one tar/zip/jsonl file (default: %(default)s).")
+    parser.add_argument('--archive', type=str, help="Path of the tar/zip/jsonl output (default: templates.<format> in --dir).")
+    parser.add_argument('--incremental', action='store_true', help="Only render and write templates whose inputs changed since the last --save run.")
     parser.add_argument('--start-date', nargs='*', metavar='YYYYMMDD', type=str, default=['20170101'],help='Start date')
     parser.add_argument('--end-date', nargs='*', metavar='YYYYMMDD', type=str, default=['auto'], help='End date')
     parser.add_argument('--dir', dest='out_dir', type=str, default=os.getcwd(), help='Output directory (Default: current directory.)')
     parser.add_argument('--period', nargs='*', metavar='YYYYMMDD:YYYYMMDD, YYYYMMDD,YYYYMMDD', type=str, help='Period of the search')
-
-    inps = parser.parse_args()
+    parser.add_argument('--serve', metavar='ADDRESS', type=str, help="Run as a template server on HOST:PORT or unix:/path/to/socket, the other options are the request defaults.")
+    parser.add_argument('--serve-template', dest='serve_templates', metavar='NAME=PATH', action='append', help="Template file that --serve requests may pick by NAME (repeatable); requests cannot name files.")
+    parser.add_argument('--serve-remote', dest='serve_remote', action='store_true', help="Let --serve listen on a non-loopback HOST; the server has no authentication.")
+    parser.add_argument('--timings', metavar='FILE', type=str, help="Write the wall/CPU time of every stage and the run counters to FILE as JSON.")
+    parser.add_argument('--profile', metavar='FILE', type=str, help="Profile the run: FILE.folded gets sampled stacks of all threads (flame graphs), any other name a cProfile dump of the main thread.")
+    parser.add_argument('--dedup', choices=MODES, help="Find rows on the same track whose areas overlap by more than --overlap: report them (flag), keep the first row of each cluster (merge) or one row with the union bounding box (union).")
+    parser.add_argument('--overlap', type=float, default=OVERLAP, help="Intersection over union of two areas from which --dedup clusters them (default: %(default)s).")
+    parser.add_argument('--grid-cell', dest='grid_cell', type=float, default=CELL_SIZE, help="Grid cell size in degrees of the --dedup spatial hash (default: %(default)s).")
+    parser.add_argument('--cluster-report', dest='cluster_report', metavar='FILE', type=str, help="Write the --dedup clusters to FILE as JSON.")
+    parser.add_argument('--watch', action='store_true', help="Keep running: re-render the changed rows whenever the sheet(s) or the template change.")
+    parser.add_argument('--watch-polling', dest='watch_polling', action='store_true', help="Poll the watched files instead of using inotify (e.g. network file systems).")
+    parser.add_argument('--validate-only', dest='validate_only', action='store_true', help="Check the inputs and report every problem, do not render anything.")
+    parser.add_argument('--validation-report', dest='validation_report', metavar='FILE', type=str, help="Write the problems found in the inputs to FILE as JSON.")
+    parser.add_argument('--jobs', type=int, default=1, help='Number of workers used to render and write templates (default: %(default)s).')
+    parser.add_argument('--processes', type=int, help='Render in this many worker processes (0: one per core), written by the main process.')
+    parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=256, help='Templates per work unit of --processes (default: %(default)s).')
+
+    inps = parser.parse_args(iargs)
+    if not 0 < inps.overlap <= 1 or inps.grid_cell <= 0:
+        parser.error("--overlap must be in (0, 1] and --grid-cell positive")
+    if inps.watch and (not inps.xlsfile or inps.out_format != 'dir'):
+        parser.error("--watch needs --xlsfile and the dir output format")
+
+    # Without direction --track-table fills in the covering tracks of both directions
+    if inps.direction is None and not inps.track_table:
+        inps.direction = 'A'
+
+    # Several subswath sets / relative orbits fan out, the first one is the single value
+    inps.subswath_sets = inps.subswath or []
+    inps.subswath = inps.subswath[0] if inps.subswath else '1 2 3'
+    inps.relative_orbits = inps.relative_orbit or []
+    inps.relative_orbit = inps.relative_orbit[0] if inps.relative_orbit else None
+    inps.periods = []
 
     if inps.period:
         for p in inps.period:
-            delimiters = '[,:\-\s]'
-            dates = re.split(delimiters, p)
+            delimiters = r'[,:\-\s]'
+            dates = re.split(delimiters, p.strip())
 
-            if len(dates[0]) and len(dates[1]) != 8:
-                msg = 'Date format not valid, it must be in the format YYYYMMDD'
-                raise ValueError(msg)
+            if len(dates) != 2 or check_date(dates[0]) or check_date(dates[1], allow_auto=True):
+                parser.error(f'Period {p!r} not valid, it must be two dates in the format YYYYMMDD (the end date may be auto)')
 
             inps.start_date.append(dates[0])
             inps.end_date.append(dates[1])
+            inps.periods.append((dates[0], dates[1]))
     else:
         if not inps.start_date:
-            inps.start_date = "20160601"
+            inps.start_date = ["20160601"]
         if not inps.end_date:
-            inps.end_date = datetime.datetime.now().strftime("%Y%m%d")
+            inps.end_date = [datetime.datetime.now().strftime("%Y%m%d")]
+        # --start-date A B --end-date C D are the periods A-C and B-D
+        end_dates = inps.end_date if len(inps.end_date) == len(inps.start_date) else inps.end_date[-1:] * len(inps.start_date)
+        inps.periods = list(zip(inps.start_date, end_dates))
 
+    # An explicit --template renders every row, the default one only the profiles without template file
+    inps.template_given = bool(inps.template)
     if not inps.template:
         from pathlib import Path
         try:
@@ -83,53 +176,7 @@ def create_parser():
     return inps
 
 
-def miaplpy_check_longitude(lon1, lon2):
-    """
-    Adjusts longitude values based on the Miaplpy criteria.
-    """
-    if abs(lon1 - lon2) > 0.2:
-        val = (abs(lon1 - lon2) - 0.2) / 2
-        miaLon1 = round(lon1 - val, 2) if lon1 > 0 else round(lon1 + val, 2)
-        miaLon2 = round(lon2 + val, 2) if lon2 > 0 else round(lon2 - val, 2)
-    else:
-        miaLon1 = lon1
-        miaLon2 = lon2
-    return miaLon1, miaLon2
-
-
-def topstack_check_longitude(lon1, lon2):
-    """
-    Adjusts longitude values based on the TopStack criteria.
-    """
-    if abs(lon1 - lon2) < 5:
-        val = (5 - abs(lon1 - lon2)) / 2
-        topLon1 = round(lon1 + val, 2) if lon1 > 0 else round(lon1 - val, 2)
-        topLon2 = round(lon2 - val, 2) if lon2 > 0 else round(lon2 + val, 2)
-    else:
-        topLon1 = min(lon1, lon2)
-        topLon2 = max(lon1, lon2)
-    return topLon1, topLon2
-
-
-def generate_lat_lon_steps(latitude_step, lat1, lat2):
-    """
-    Generates latitude and longitude steps based on the input latitude step.
-
-    Args:
-        lat_step: Latitude step size in degrees.
-        lat1, lat2: Latitude range.
-
-    Returns:
-        A tuple containing the latitude and longitude steps.
-    """
-    #Convert lat_step from meters to degrees
-    lat_step = latitude_step / 111320
-    latitude = (lat1 + lat2)/2
-    lon_step = round(lat_step / math.cos(math.radians(float(latitude))), 5)
-    return lat_step, lon_step
-
-
-def create_insar_template(inps, relative_orbit, subswath, tropospheric_delay_method, latitude_step, start_date, end_date, satellite, lat1, lat2, lon1, lon2, miaLon1, miaLon2, topLon1, topLon2):
+def create_insar_template(inps, relative_orbit, subswath, tropospheric_delay_method, latitude_step, start_date, end_date, satellite, lat1, lat2, lon1, lon2, miaLon1, miaLon2, topLon1, topLon2, lat_lon_step=None):
     """
     Creates an InSAR template configuration.
 
@@ -140,11 +187,12 @@ def create_insar_template(inps, relative_orbit, subswath, tropospheric_delay_met
         lon1, lon2: Longitude range.
         miaLon1, miaLon2: Miaplpy longitude range.
         topLon1, topLon2: Topstack longitude range.
+        lat_lon_step: Precomputed (lat_step, lon_step) in degrees, computed from latitude_step if None.
 
     Returns:
         The generated template configuration.
     """
-    lat_step, lon_step = generate_lat_lon_steps(latitude_step, lat1, lat2)
+    lat_step, lon_step = lat_lon_step if lat_lon_step else generate_lat_lon_steps(latitude_step, lat1, lat2)
 
     print(f"Latitude range: {lat1}, {lat2}\n")
     print(f"Longitude range: {lon1}, {lon2}\n")
@@ -175,227 +223,432 @@ def create_insar_template(inps, relative_orbit, subswath, tropospheric_delay_met
     return template
 
 
-def parse_polygon(polygon):
-        polygon = polygon.replace("POLYGON((", "").replace("))", "")
+def input_record(inps, relative_orbit, satellite, direction, lat1, lat2, lon1, lon2):
+    """
+    Builds the template record of a --url, --url-file or --polygon input.
+    """
+    return location_record(
+        relative_orbit, satellite, direction, lat1, lat2, lon1, lon2,
+        **{
+            'name': inps.name if hasattr(inps, 'name') else 'Unknown',
+            'ssaraopt.startDate': inps.start_date if hasattr(inps, 'start_date') else 'auto',
+            'ssaraopt.endDate': inps.end_date if hasattr(inps, 'end_date') else 'auto',
+            'ssaraopt.relativeOrbit': inps.relative_orbit if hasattr(inps, 'relative_orbit') else None,
+            'topsStack.subswath': inps.subswath if hasattr(inps, 'subswath') else None,
+            'mintpy.troposphericDelay.method': inps.tropospheric_delay_method,
+            'tropospheric_delay_method': inps.tropospheric_delay_method,
+            'polygon': inps.polygon if hasattr(inps, 'polygon') else None,
+        }
+    )
+
+
+def template_file_name(inps, data):
+    name = template_name(data, inps.file_name)
+    if inps.out_dir:
+        name = os.path.join(inps.out_dir, name)
+    return name
+
+
+def _print_ranges(values):
+    print(f"Latitude range: {values['lat1']}, {values['lat2']}\n")
+    print(f"Longitude range: {values['lon1']}, {values['lon2']}\n")
+    print(f"Miaplpy longitude range: {values['miaLon1']}, {values['miaLon2']}\n")
+    print(f"Topstack longitude range: {values['topLon1']}, {values['topLon2']}\n")
+
+
+def main(iargs=None):
+    inps = create_parser() if not isinstance(iargs, argparse.Namespace) else iargs
+    if getattr(inps, 'serve', None):
+        from maketemplate.server import serve
+        serve(inps.serve, inps)
+        return
+
+    try:
+        with instrument.recording() as recorder, instrument.profile(getattr(inps, 'profile', None)):
+            if getattr(inps, 'watch', False):
+                _watch(inps)
+            else:
+                _run(inps)
+    except ValidationError as error:
+        print(format_report(error.problems), file=sys.stderr)
+        sys.exit(1)
+    except RuntimeError as error:
+        # --offline run without cached ASF response
+        print(f"ERROR: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    recorder.report()
+    if getattr(inps, 'timings', None):
+        recorder.save(inps.timings)
+        print(f"Timings saved in {inps.timings}")
+    if getattr(inps, 'profile', None):
+        print(f"Profile saved in {inps.profile}")
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _fill_relative_orbits(records, index_file):
+    """
+    Yields the records with missing relative orbits filled in from the footprint index,
+    looking them up BATCH_SIZE records at a time.
+    """
+    from maketemplate.footprint_index import FootprintIndex, fill_relative_orbits
+
+    index = FootprintIndex.load(index_file)
+    filled = 0
+    for batch in _batches(records, BATCH_SIZE):
+        with instrument.stage('orbits'):
+            filled += fill_relative_orbits(batch, index)
+        yield from batch
+    print(f"Relative orbit filled in from {index_file} for {filled} record(s)\n")
+
+
+def _fills_orbits(inps):
+    return bool(getattr(inps, 'track_table', None) or getattr(inps, 'footprint_index', None))
+
+
+def _is_missing(value):
+    return value is None or value == '' or (isinstance(value, float) and math.isnan(value))
+
+
+def _with_orbits(records):
+    """
+    Yields the records that have a relative orbit; the others (no track or granule of
+    the --track-table / --footprint-index covers their polygon) are reported and skipped.
+    """
+    for record in records:
+        if _is_missing(record.get('relative_orbit')):
+            print(f"WARNING: no relative orbit covers {record.get('name')} {record.get('polygon')}, no template written\n")
+            instrument.count('templates.skipped')
+            continue
+        yield record
+
+
+def _bounded_map(pool, func, iterable, window):
+    """
+    Like ``pool.map`` but submits at most ``window`` items ahead of the results, so a
+    lazy ``iterable`` is never read into memory as a whole.
+    """
+    pending = collections.deque()
+    for item in iterable:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(pool.submit(func, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _check(inps, problems):
+    """
+    Writes the --validation-report and raises ValidationError if there are problems.
+    """
+    if getattr(inps, 'validation_report', None):
+        save_report(problems, inps.validation_report)
+        print(f"Validation report saved in {inps.validation_report}")
+    if problems:
+        raise ValidationError(problems)
+
+
+def _load_sheets(inps, fills_orbits):
+    """
+    Loads and validates the --xlsfile sheets; several sheets are concatenated.
 
-        latitude = []
-        longitude = []
+    Returns:
+        (DataFrame, [(sheet name, row count), ...], problems)
+    """
+    from maketemplate import read_excel
 
-        for word in polygon.split(','):
-            if (float(word.split(' ')[1])) not in latitude:
-                latitude.append(float(word.split(' ')[1]))
-            if (float(word.split(' ')[0])) not in longitude:
-                longitude.append(float(word.split(' ')[0]))
+    paths = [inps.xlsfile] if isinstance(inps.xlsfile, str) else inps.xlsfile
+    frames, sheets, problems = [], [], []
+    for path in paths:
+        with instrument.stage('load'):
+            df = read_excel.main(path, columns=read_excel.SHEET_COLUMNS, cache=not getattr(inps, 'no_sheet_cache', False))
+        with instrument.stage('validate'):
+            sheet_problems = validate_sheet(df, allow_missing_orbit=fills_orbits, workflow=getattr(inps, 'workflow', None))
+        if len(paths) > 1:
+            sheet_problems = [problem._replace(sheet=os.path.basename(path)) for problem in sheet_problems]
+        frames.append(df)
+        sheets.append((os.path.basename(path), len(df)))
+        problems += sheet_problems
 
-        lon1, lon2 = round(min(longitude),2), round(max(longitude),2)
-        lat1, lat2 = round(min(latitude),2), round(max(latitude),2)
+    if len(frames) == 1:
+        return frames[0], sheets, problems
 
-        return lat1, lat2, lon1, lon2
+    import pandas as pd
 
+    return pd.concat(frames, ignore_index=True), sheets, problems
 
-def get_satellite_name(satellite):
-    if satellite == 'Sen':
-        return 'SENTINEL-1A,SENTINEL-1B'
-    elif satellite == 'Radarsat':
-        return 'RADARSAT2'
-    elif satellite == 'TerraSAR':
-        return 'TerraSAR-X'
+
+def _deduplicate(inps, df, sheets):
+    """
+    Clusters the overlapping rows of the sheet(s) and applies --dedup to them.
+    """
+    from maketemplate import clusters
+
+    with instrument.stage('clusters'):
+        found = clusters.find_clusters(
+            df,
+            overlap=getattr(inps, 'overlap', clusters.OVERLAP),
+            cell_size=getattr(inps, 'grid_cell', clusters.CELL_SIZE),
+        )
+        report = clusters.cluster_report(df, found, inps.dedup, sheets)
+        df = clusters.deduplicate(df, found, inps.dedup)
+    instrument.count('clusters', len(found))
+
+    clusters.print_report(report)
+    if getattr(inps, 'cluster_report', None):
+        clusters.save_report(report, inps.cluster_report)
+        print(f"Cluster report saved in {inps.cluster_report}")
+    return df
+
+
+def _template_problems(inps, satellites=('Sen',)):
+    """
+    Finds the unknown markers of the templates the run renders with: the --template
+    given, otherwise the profile templates of ``satellites`` and the workflow.
+    """
+    # path -> profile using it, None for the run template (the built-in config if missing)
+    paths = {}
+    if getattr(inps, 'template_given', False):
+        paths[inps.template] = None
     else:
-        raise ValueError("Invalid satellite name. Choose from ['Sen', 'Radarsat', 'TerraSAR']")
+        for satellite in satellites:
+            try:
+                profile = profiles.find(satellite, getattr(inps, 'workflow', None))
+            except ValueError:
+                # Reported by the satellite/workflow checks
+                continue
+            paths.setdefault(profiles.template_path(profile, inps.template), profile if profile.template else None)
+
+    problems = []
+    for path, profile in paths.items():
+        if path and os.path.exists(path):
+            problems += check_template(load_template(path))
+        elif profile is not None:
+            problems.append(Problem(None, 'template', path, f"template of the {profile.satellite} {profile.workflow} profile does not exist"))
+    return problems
+
+
+def _load_sheet(inps):
+    """
+    Loads and validates the --xlsfile sheets and applies --dedup.
+
+    Raises:
+        ValidationError: if the sheets or the template have problems.
+    """
+    df, sheets, problems = _load_sheets(inps, _fills_orbits(inps))
+    satellites = df['satellite'].dropna().unique().tolist() if 'satellite' in df.columns else []
+    _check(inps, _template_problems(inps, satellites) + problems)
+    if getattr(inps, 'dedup', None):
+        df = _deduplicate(inps, df, sheets)
+    return df
 
 
-def generate_config(relative_orbit, satellite, lat1, lat2, lon1, lon2, topLon1, topLon2, subswath, tropospheric_delay_method, miaLon1, miaLon2, lat_step, lon_step, start_date, end_date, min_temp_coh, template_file):
+def _watch(inps, stop=None):
     """
-    Generate configuration either by rendering a template file with ***markers*** or by
-    falling back to the built-in f-string config.
+    Renders the sheets, then keeps watching the sheets and the template: a sheet change
+    re-renders the rows that are new or changed (compared by content with the previous
+    load), a template change re-renders all rows. Runs until interrupted or ``stop``
+    (a threading.Event) is set.
+
+    Inputs with problems and sheets that cannot be loaded (e.g. saved halfway) are
+    reported and skipped; the last valid state is kept.
     """
-    if template_file and os.path.exists(template_file):
-        _RE_MARKER = re.compile(r'\*\*\*(\w+)\*\*\*')
-        with open(template_file, 'r', encoding='utf8') as f:
-            text = f.read()
-
-        # mapping of marker -> value (all converted to strings when substituted)
-        mapping = {
-            'satellite': satellite,
-            'relative_orbit': relative_orbit,
-            'start_date': start_date,
-            'end_date': end_date,
-            'subswath': subswath,
-            'tropospheric_delay_method': tropospheric_delay_method,
-            'lat1': lat1,
-            'lat2': lat2,
-            'lon1': lon1,
-            'lon2': lon2,
-            'miaLon1': miaLon1,
-            'miaLon2': miaLon2,
-            'lat_step': lat_step,
-            'lon_step': lon_step,
-            'min_temp_coh': min_temp_coh,
-        }
+    from maketemplate import read_excel
+    from maketemplate.watch import Watcher, diff_rows, row_hashes
 
-        def _repl(m):
-            key = m.group(1)
-            if key in mapping and mapping[key] is not None:
-                return str(mapping[key])
-            # leave unknown markers unchanged
-            return m.group(0)
-
-        return _RE_MARKER.sub(_repl, text)
-    config = f"""\
-######################################################
-ssaraopt.platform                  = {satellite}  # [Sentinel-1 / ALOS2 / RADARSAT2 / TerraSAR-X / COSMO-Skymed]
-ssaraopt.relativeOrbit             = {relative_orbit}
-ssaraopt.startDate                 = {start_date}  # YYYYMMDD
-ssaraopt.endDate                   = {end_date}    # YYYYMMDD
-######################################################
-topsStack.subswath                 = {subswath} # '1 2'
-topsStack.numConnections           = 3    # comment
-topsStack.azimuthLooks             = 5    # comment
-topsStack.rangeLooks               = 20   # comment
-topsStack.filtStrength             = 0.2  # comment
-topsStack.unwMethod                = snaphu  # comment
-topsStack.coregistration           = auto  # [NESD geometry], auto for NESD
-#topsStack.excludeDates            =  20240926
-######################################################
-mintpy.load.autoPath               = yes
-mintpy.compute.cluster             = local #[local / slurm / pbs / lsf / none], auto for none, cluster type
-mintpy.compute.numWorker           = 40 #[int > 1 / all], auto for 4 (local) or 40 (non-local), num of workers
-mintpy.plot.maxMemory              = 0.2  #[float], auto for 4, max memory used by one call of view.py for plotting.
-mintpy.networkInversion.parallel   = yes  #[yes / no], auto for no, parallel processing using dask
-mintpy.save.hdfEos5                = yes   #[yes / update / no], auto for no, save timeseries to UNAVCO InSAR Archive format
-mintpy.save.hdfEos5.update         = yes   #[yes / no], auto for no, put XXXXXXXX as endDate in output filename
-mintpy.save.hdfEos5.subset         = yes   #[yes / no], auto for no, put subset range info in output filename
-mintpy.save.kmz                    = yes   #[yes / no], auto for yes, save geocoded velocity to Google Earth KMZ file
-mintpy.reference.minCoherence      = auto      #[0.0-1.0], auto for 0.85, minimum coherence for auto method
-mintpy.troposphericDelay.method    = {tropospheric_delay_method}   # pyaps  #[pyaps / height_correlation / base_trop_cor / no], auto for pyaps
-######################################################
-miaplpy.load.processor               = isce
-miaplpy.multiprocessing.numProcessor = 40
-miaplpy.inversion.rangeWindow        = 24   # range window size for searching SHPs, auto for 15
-miaplpy.inversion.azimuthWindow      = 7    # azimuth window size for searching SHPs, auto for 15
-miaplpy.timeseries.tempCohType       = full     # [full, average], auto for full.
-miaplpy.interferograms.networkType   = delaunay # network
-miaplpy.unwrap.snaphu.tileNumPixels  = 10000000000     # number of pixels in a tile, auto for 10000000
-######################################################
-minsar.miaplpyDir.addition           = date  #[name / lalo / no] auto for no (miaply_$name_startDate_endDate))
-mintpy.subset.lalo                   = {lat1}:{lat2},{lon1}:{lon2}
-miaplpy.subset.lalo                  = {lat1}:{lat2},{miaLon1}:{miaLon2}  #[S:N,W:E / no], auto for no
-miaplpy.load.startDate               = auto  # 20200101
-miaplpy.load.endDate                 = auto
-mintpy.geocode.laloStep              = {lat_step},{lon_step}
-miaplpy.timeseries.minTempCoh        = {min_temp_coh}      # auto for 0.5
-mintpy.networkInversion.minTempCoh   = {min_temp_coh}
-mintpy.network.coherenceBased  = yes
-######################################################
-minsar.insarmaps_flag                = True
-minsar.upload_flag                   = True
-minsar.insarmaps_dataset             = filt*DS
-"""
-    return config
+    df = _load_sheet(inps)
+    _render(inps, iter_records(df, inps.lat_step))
+    hashes = row_hashes(df)
 
+    sheets = [inps.xlsfile] if isinstance(inps.xlsfile, str) else inps.xlsfile
+    paths = [read_excel.sheet_path(sheet) for sheet in sheets]
+    template = os.path.abspath(inps.template) if inps.template and os.path.exists(inps.template) else None
 
-def main(iargs=None):
-    inps = create_parser() if not isinstance(iargs, argparse.Namespace) else iargs
+    with Watcher(paths + ([template] if template else []), polling=getattr(inps, 'watch_polling', False)) as watcher:
+        print(f"Watching {', '.join(watcher.paths)} ({watcher.backend}), Ctrl-C to stop", flush=True)
+        try:
+            while stop is None or not stop.is_set():
+                changed = watcher.wait(timeout=None if stop is None else watcher.interval)
+                if not changed:
+                    continue
+                start = time.perf_counter()
+                print(f"Changed: {', '.join(changed)}")
+                try:
+                    new = _load_sheet(inps)
+                except Exception as error:
+                    # Invalid, or only partly saved (BadZipFile, KeyError, parser errors)
+                    print(f"{type(error).__name__}: {error}\nWaiting for the next change", flush=True)
+                    continue
+
+                new_hashes = row_hashes(new)
+                if template in changed:
+                    rows, removed = range(len(new)), 0
+                else:
+                    rows, removed = diff_rows(hashes, new_hashes)
+                df, hashes = new, new_hashes
+                if len(rows):
+                    _render(inps, iter_records(df.iloc[rows], inps.lat_step))
+                print(f"Re-rendered {len(rows)} of {len(df)} rows ({removed} removed) in {time.perf_counter() - start:.2f}s", flush=True)
+        except KeyboardInterrupt:
+            pass
+
+
+def _run(inps):
     data_collection = []
 
-    def _loc_dict(lat1, lat2, lon1, lon2, satellite):
-        miaLon1, miaLon2 = miaplpy_check_longitude(lon1, lon2)
-        topLon1, topLon2 = topstack_check_longitude(lon1, lon2)
-        return {
-            'latitude1': lat1,
-            'latitude2': lat2,
-            'longitude1': lon1,
-            'longitude2': lon2,
-            'miaplpy.longitude1': miaLon1,
-            'miaplpy.longitude2': miaLon2,
-            'topsStack.longitude1': topLon1,
-            'topsStack.longitude2': topLon2,
-            'satellite': satellite
-        }
+    # Every input is checked before anything is rendered or written
+    if inps.xlsfile:
+        df = _load_sheet(inps)
+    else:
+        polygon_run = inps.polygon and not inps.url and not getattr(inps, 'url_file', None)
+        problems = _template_problems(inps, [inps.satellite] if polygon_run else ['Sen'])
+        if polygon_run:
+            message = check_polygon(inps.polygon)
+            if message:
+                problems.append(Problem(None, '--polygon', inps.polygon, message))
+            if not inps.relative_orbit and not _fills_orbits(inps):
+                problems.append(Problem(None, '--relativeOrbit', None, 'is needed, or --track-table / --footprint-index to fill in the tracks covering the polygon'))
+            try:
+                profiles.find(inps.satellite, getattr(inps, 'workflow', None))
+            except ValueError as error:
+                problems.append(Problem(None, '--workflow', inps.workflow, str(error)))
+        for orbit in getattr(inps, 'relative_orbits', None) or []:
+            message = check_orbit(orbit, inps.satellite if polygon_run else 'Sen')
+            if message:
+                problems.append(Problem(None, '--relativeOrbit', orbit, message))
+        _check(inps, problems)
+
+    if getattr(inps, 'validate_only', False):
+        print(f"Inputs are valid{f' ({len(df)} rows)' if inps.xlsfile else ''}")
+        return
 
     if inps.xlsfile:
-        from src.maketemplate.read_excel import main
-        df = main(inps.xlsfile)
-
-        for index, row in df.iterrows():
-            lat1, lat2, lon1, lon2 = parse_polygon(row.polygon)
-            yesterday = dt.now() - td(days=1)
-
-            for _, row in df.iterrows():
-                lat1, lat2, lon1, lon2 = parse_polygon(row.polygon)
-                satellite = get_satellite_name(row.get('satellite'))
-                loc = _loc_dict(lat1, lat2, lon1, lon2, satellite)
-
-                processed_values = {
-                    **loc,
-                    'relative_orbit': row.get('ssaraopt.relativeOrbit', ''),
-                    'start_date': row.get('ssaraopt.startDate', ''),
-                    'end_date': yesterday.strftime('%Y%m%d') if 'auto' in row.get('ssaraopt.endDate', '') else row.get('ssaraopt.endDate', ''),
-                    'tropospheric_delay_method': row.get('mintpy.troposphericDelay', 'auto'),
-                    'subswath': row.get('topsStack.subswath', ''),
-                }
-
-                row_dict = row.to_dict()
-                row_dict.update(processed_values)
-                data_collection.append(row_dict)
+        # Records are built lazily while the templates are rendered
+        data_collection = iter_records(df, inps.lat_step)
+    elif getattr(inps, 'url_file', None):
+        from maketemplate import asf_extractor
+
+        entries = asf_extractor.read_url_file(inps.url_file)
+
+        with instrument.stage('asf'):
+            resolved = asf_extractor.resolve_urls(
+                [url for _, url in entries],
+                concurrency=getattr(inps, 'concurrency', None) or asf_extractor.CONCURRENCY,
+                offline=getattr(inps, 'offline', False),
+                refresh=getattr(inps, 'refresh_cache', False),
+            )
+
+        for i, ((name, _), values) in enumerate(zip(entries, resolved)):
+            relative_orbit, satellite, direction, lat1, lat2, lon1, lon2 = values
+            data = input_record(inps, relative_orbit, satellite, direction, lat1, lat2, lon1, lon2)
+            data['name'] = name or f"Unknown{i}"
+            data_collection.append(data)
     else:
         # URL or polygon input
         if inps.url:
-            relative_orbit, satellite, direction, lat1, lat2, lon1, lon2 = asf_extractor.main(inps.url)
+            from maketemplate import asf_extractor
+
+            with instrument.stage('asf'):
+                relative_orbit, satellite, direction, lat1, lat2, lon1, lon2 = asf_extractor.main(
+                    inps.url,
+                    offline=getattr(inps, 'offline', False),
+                    refresh=getattr(inps, 'refresh_cache', False),
+                )
         else:
-            lat1, lat2, lon1, lon2 = parse_polygon(inps.polygon)
+            with instrument.stage('polygons'):
+                lat1, lat2, lon1, lon2 = parse_polygon(inps.polygon)
             satellite = get_satellite_name(inps.satellite)
-            if not inps.relative_orbit:
-                pass
             direction = inps.direction
             relative_orbit = inps.relative_orbit
 
-        loc = _loc_dict(lat1, lat2, lon1, lon2, satellite)
+        data_collection.append(input_record(inps, relative_orbit, satellite, direction, lat1, lat2, lon1, lon2))
 
-        processed_values = {
-            **loc,
-            'name': inps.name if hasattr(inps, 'name') else 'Unknown',
-            'direction': direction,
-            'ssaraopt.startDate': inps.start_date if hasattr(inps, 'start_date') else 'auto',
-            'ssaraopt.endDate': inps.end_date if hasattr(inps, 'end_date') else 'auto',
-            'ssaraopt.relativeOrbit': inps.relative_orbit if hasattr(inps, 'relative_orbit') else None,
-            'topsStack.subswath': inps.subswath if hasattr(inps, 'subswath') else None,
-            'mintpy.troposphericDelay.method': inps.tropospheric_delay_method,
-            'polygon': inps.polygon if hasattr(inps, 'polygon') else None,
-            'relative_orbit': relative_orbit
-        }
+    _render(inps, data_collection)
 
-        data_collection.append(processed_values)
-
-    for data in data_collection:
-        template = create_insar_template(
-            inps=inps,
-            relative_orbit = data.get('relative_orbit',''),
-            subswath = data.get('topsStack.subswath', ''),
-            tropospheric_delay_method = data.get('inps.tropospheric_delay_method', 'auto'),
-            latitude_step = inps.lat_step,
-            start_date = data.get('start_date', ''),
-            end_date = data.get('end_date', ''),
-            satellite=data.get('satellite'),
-            lat1=data.get('latitude1'),
-            lat2=data.get('latitude2'),
-            lon1=data.get('longitude1'),
-            lon2=data.get('longitude2'),
-            miaLon1=data.get('miaplpy.longitude1'),
-            miaLon2=data.get('miaplpy.longitude2'),
-            topLon1=data.get('topsStack.longitude1'),
-            topLon2=data.get('topsStack.longitude2')
-        )
 
-        if inps.file_name or inps.save:
-            name = inps.file_name if inps.file_name else data.get('name', '')
-            sat = "Sen" if "SEN" in data.get('satellite', '').upper()[:4] else ""
-            template_name = os.path.join(f"{name}{sat}{data.get('direction')}{data.get('relative_orbit')}.template")
-            if inps.out_dir:
-                template_name = os.path.join(inps.out_dir, template_name)
-            with open(template_name, 'w') as f:
-                f.write(template)
-                print(f"Template saved in {template_name}")
+def _render(inps, data_collection):
+    """
+    Renders the templates of the records and writes them (--save) to the output.
+    """
+    if getattr(inps, 'track_table', None):
+        from maketemplate.track_table import TrackTable, expand_tracks
+
+        data_collection = expand_tracks(data_collection, TrackTable.load(inps.track_table))
+
+    if getattr(inps, 'footprint_index', None):
+        data_collection = _fill_relative_orbits(data_collection, inps.footprint_index)
+
+    if _fills_orbits(inps) and not getattr(inps, 'relative_orbits', None):
+        data_collection = _with_orbits(data_collection)
+
+    out_format = getattr(inps, 'out_format', 'dir')
+    save = inps.file_name or inps.save or out_format != 'dir'
+    sink = open_sink(out_format, inps.out_dir or os.getcwd(), getattr(inps, 'archive', None)) if save else None
+    options = RenderOptions.from_namespace(inps)
+    fan = FanOut(
+        options,
+        periods=getattr(inps, 'periods', ()),
+        subswaths=getattr(inps, 'subswath_sets', ()),
+        orbits=getattr(inps, 'relative_orbits', ()),
+    )
+    units = fan.units(data_collection)
+    incremental = getattr(inps, 'incremental', False)
+
+    def _is_current(name, key):
+        if sink is not None and incremental and sink.is_current(name, key):
+            sink.skip(name)
+            instrument.count('templates.unchanged')
+            return True
+        return False
+
+    def _emit(name, key, values, text):
+        _print_ranges(values)
+        instrument.count('templates.rendered')
+        if sink is not None:
+            with instrument.stage('write'):
+                sink.add(name, text, key)
+            instrument.count('templates.written')
+            print(f"Template saved in {sink.location(name)}")
+
+    def _process(unit):
+        name, key, values = fan.prepare(unit)
+        if _is_current(name, key):
+            return
+        with instrument.stage('render'):
+            text = fan.render(values, unit.profile)
+        _emit(name, key, values, text)
+
+    jobs = max(1, getattr(inps, 'jobs', 1) or 1)
+    processes = getattr(inps, 'processes', None)
+
+    with sink or contextlib.nullcontext():
+        if processes is not None:
+            # Workers render, the main process writes (sinks are not shared between
+            # processes); current outputs are skipped before they are sent to a worker
+            if sink is not None and incremental:
+                units = (unit for unit in units if not _is_current(*fan.prepare(unit)[:2]))
+            for name, key, values, text in render_processes(fan, units, processes, getattr(inps, 'chunk_size', CHUNK_SIZE)):
+                _emit(name, key, values, text)
+        elif jobs > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                for _ in _bounded_map(pool, _process, units, 4 * jobs):
+                    pass
+        else:
+            for unit in units:
+                _process(unit)
+
+    if sink is not None:
+        print(f"Templates: {sink.summary()}")
 
 if __name__ == '__main__':
     main(iargs=sys.argv)
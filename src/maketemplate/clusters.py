@@ -0,0 +1,216 @@
+"""
+Clustering of overlapping areas of interest.
+
+Rows of the same satellite, relative orbit and direction whose bounding boxes (as
+``parse_polygon`` computes them) overlap by more than a threshold describe the same
+area and would produce the same stack downstream. Candidates are found with a grid
+hash: every box is put into the grid cells it touches and only boxes sharing a cell
+are compared, so the cost grows with the number of rows, not with its square.
+
+    clusters = find_clusters(df)
+    df = deduplicate(df, clusters, 'union')
+"""
+import json
+from collections import namedtuple
+
+# What happens to the rows of a cluster: only reported, all but the first dropped, or
+# replaced by one row with the union bounding box
+MODES = ('flag', 'merge', 'union')
+
+# Intersection over union of two boxes from which they are one area
+OVERLAP = 0.8
+
+# Grid cell size in degrees
+CELL_SIZE = 0.5
+
+# rows: sorted positional row indices; bbox: (lat1, lat2, lon1, lon2) of their union;
+# overlap: smallest intersection over union of the pairs that joined the cluster
+Cluster = namedtuple('Cluster', ['rows', 'bbox', 'overlap'])
+
+
+def find_clusters(df, overlap=OVERLAP, cell_size=CELL_SIZE):
+    """
+    Finds the groups of rows on the same track whose areas overlap.
+
+    Overlap is transitive: A and C are in one cluster if both overlap with B. Rows
+    without relative orbit are never clustered.
+
+    Args:
+        df: DataFrame as returned by ``read_excel.main`` (valid, see ``validate_sheet``).
+        overlap: intersection over union above which two boxes are one area.
+        cell_size: grid cell size in degrees.
+
+    Returns:
+        A list of Clusters of two or more rows, in order of their first row.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from maketemplate import geometry
+
+    if not len(df):
+        return []
+    lat1, lat2, lon1, lon2 = geometry.polygon_bounds(df['polygon'].tolist())
+    orbit = pd.to_numeric(df['ssaraopt.relativeOrbit'], errors='coerce') if 'ssaraopt.relativeOrbit' in df.columns else pd.Series(np.nan, index=df.index)
+    direction = df['direction'] if 'direction' in df.columns else pd.Series('', index=df.index)
+    track, _ = pd.MultiIndex.from_arrays([df['satellite'], orbit, direction]).factorize()
+    track[orbit.isna().to_numpy()] = -1
+
+    # One entry per (row, grid cell touched by its box)
+    x0, x1 = np.floor(lon1 / cell_size).astype(np.int64), np.floor(lon2 / cell_size).astype(np.int64)
+    y0, y1 = np.floor(lat1 / cell_size).astype(np.int64), np.floor(lat2 / cell_size).astype(np.int64)
+    width = x1 - x0 + 1
+    counts = width * (y1 - y0 + 1)
+    rows = np.repeat(np.arange(len(df)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cells = pd.DataFrame({'track': track[rows], 'x': x0[rows] + k % width[rows], 'y': y0[rows] + k // width[rows], 'row': rows})
+    cells = cells[(cells['track'] >= 0) & cells.duplicated(['track', 'x', 'y'], keep=False)]
+
+    parent = np.arange(len(df))
+    smallest = {}
+
+    def _root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for bucket in cells.groupby(['track', 'x', 'y'], sort=False)['row']:
+        members = bucket[1].to_numpy()
+        iou = _overlaps(lat1[members], lat2[members], lon1[members], lon2[members])
+        for i, j in zip(*np.nonzero(np.triu(iou > overlap, 1))):
+            a, b = _root(members[i]), _root(members[j])
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+                smallest[min(a, b)] = min(iou[i, j], smallest.get(a, 1.0), smallest.get(b, 1.0))
+
+    roots = np.array([_root(i) for i in range(len(df))])
+    clustered = np.flatnonzero(np.bincount(roots, minlength=len(df))[roots] > 1)
+    # The root of a cluster is its first row
+    clustered = clustered[np.argsort(roots[clustered], kind='stable')]
+
+    clusters = []
+    for members in np.split(clustered, np.flatnonzero(np.diff(roots[clustered])) + 1):
+        if not members.size:
+            continue
+        bbox = (float(lat1[members].min()), float(lat2[members].max()), float(lon1[members].min()), float(lon2[members].max()))
+        clusters.append(Cluster(members.tolist(), bbox, float(smallest[members[0]])))
+    return clusters
+
+
+def _overlaps(lat1, lat2, lon1, lon2):
+    """
+    Returns the matrix of intersection over union of the boxes.
+    """
+    import numpy as np
+
+    height = np.clip(np.minimum.outer(lat2, lat2) - np.maximum.outer(lat1, lat1), 0, None)
+    width = np.clip(np.minimum.outer(lon2, lon2) - np.maximum.outer(lon1, lon1), 0, None)
+    inter = height * width
+    area = (lat2 - lat1) * (lon2 - lon1)
+    union = np.add.outer(area, area) - inter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Boxes of zero area overlap only if they are the same
+        same = (np.equal.outer(lat1, lat1) & np.equal.outer(lat2, lat2) & np.equal.outer(lon1, lon1) & np.equal.outer(lon2, lon2))
+        return np.where(union > 0, inter / union, same.astype(float))
+
+
+def bbox_polygon(bbox):
+    """
+    Returns the WKT polygon of a (lat1, lat2, lon1, lon2) box.
+    """
+    lat1, lat2, lon1, lon2 = bbox
+    return f"POLYGON(({lon1} {lat1},{lon2} {lat1},{lon2} {lat2},{lon1} {lat2},{lon1} {lat1}))"
+
+
+def deduplicate(df, clusters, mode):
+    """
+    Applies ``mode`` to the clusters of the sheet.
+
+    'flag' returns the sheet unchanged, 'merge' keeps the first row of every cluster,
+    'union' keeps the first row with the union box as polygon and the union of the
+    subswaths. The dates are those of the run options (see ``api.template_values``),
+    so the sheet dates are left alone.
+
+    Returns:
+        The new DataFrame, rows in their original order.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid mode. Choose from {list(MODES)}")
+    if mode == 'flag' or not clusters:
+        return df
+
+    df = df.copy()
+    drop = []
+    for cluster in clusters:
+        first, rest = df.index[cluster.rows[0]], df.index[cluster.rows[1:]]
+        drop.extend(rest)
+        if mode != 'union':
+            continue
+        rows = df.loc[[first, *rest]]
+        df.at[first, 'polygon'] = bbox_polygon(cluster.bbox)
+        if 'topsStack.subswath' in df.columns and rows['topsStack.subswath'].astype(str).nunique() > 1:
+            numbers = {number for value in rows['topsStack.subswath'] for number in str(value).split()}
+            # CSV/feather sheets with single subswaths have an int64 column
+            if df['topsStack.subswath'].dtype != object:
+                df['topsStack.subswath'] = df['topsStack.subswath'].astype(object)
+            df.at[first, 'topsStack.subswath'] = ' '.join(sorted(numbers))
+    return df.drop(index=drop)
+
+
+def cluster_report(df, clusters, mode, sheets=None):
+    """
+    Describes every cluster.
+
+    Args:
+        df: the sheet the clusters were found in.
+        clusters: see ``find_clusters``.
+        mode: one of MODES.
+        sheets: (sheet name, row count) of the sheets concatenated into ``df``, one
+            unnamed sheet if None.
+
+    Returns:
+        A list of dicts with the track, the union box, the smallest overlap and the
+        rows (sheet, sheet row number, name) of every cluster.
+    """
+    import numpy as np
+
+    sheets = sheets or [(None, len(df))]
+    starts = np.cumsum([0] + [count for _, count in sheets])
+    names = df['name'].tolist() if 'name' in df.columns else [None] * len(df)
+
+    def _origin(i):
+        sheet = int(np.searchsorted(starts, i, side='right')) - 1
+        return sheets[sheet][0], int(i - starts[sheet]) + 2
+
+    report = []
+    for number, cluster in enumerate(clusters, 1):
+        first = df.iloc[cluster.rows[0]]
+        report.append({
+            'cluster': number,
+            'action': mode,
+            'satellite': str(first['satellite']),
+            'relative_orbit': int(first['ssaraopt.relativeOrbit']),
+            'direction': str(first.get('direction')),
+            'bbox': list(cluster.bbox),
+            'overlap': round(cluster.overlap, 3),
+            'rows': [dict(zip(('sheet', 'row'), _origin(i)), name=names[i]) for i in cluster.rows],
+        })
+    return report
+
+
+def print_report(report):
+    rows = sum(len(entry['rows']) for entry in report)
+    action = report[0]['action'] if report else 'flag'
+    fewer = rows - len(report) if action != 'flag' else 0
+    print(f"Clusters: {len(report)} cluster(s) of {rows} overlapping rows, {fewer} template(s) fewer ({action})")
+    for entry in report:
+        rows = ', '.join(f"{row['sheet'] + ':' if row['sheet'] else ''}{row['row']} {row['name']}" for row in entry['rows'])
+        print(f"  {entry['satellite']} {entry['direction']}{entry['relative_orbit']} overlap >= {entry['overlap']}: {rows} -> {entry['bbox']}")
+    print()
+
+
+def save_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=1)
+        f.write('\n')
@@ -0,0 +1,179 @@
+"""
+Expansion of the template records over relative orbits, subswath sets and periods, and
+rendering of the resulting templates in a pool of worker processes.
+"""
+import os
+import itertools
+import collections
+import dataclasses
+
+from maketemplate import profiles
+from maketemplate.api import compile_template, render_values, template_name, template_values
+from maketemplate.manifest import content_hash
+from maketemplate.records import Record
+
+# Templates rendered per work unit sent to a worker process
+CHUNK_SIZE = 256
+
+# Records grouped by template profile at a time
+GROUP_SIZE = 4096
+
+# One template to render: record, (start_date, end_date) and template Profile
+Unit = collections.namedtuple('Unit', ['record', 'period', 'profile'])
+
+
+class FanOut:
+    """
+    One template per combination of record x relative orbit x subswath set x period.
+
+    Relative orbits and subswath sets replace the values of the records when given,
+    otherwise every record keeps its own. File names are built from the values only, so
+    they do not depend on worker scheduling: the relative orbit is part of every template
+    name, the subswath set ('_sw12') and the period ('_20170101_20191231') are appended
+    when more than one is requested.
+
+    Every record renders with the template profile of its satellite and the workflow of
+    ``options`` (see maketemplate.profiles), or with ``template`` if
+    ``options.profile_templates`` is False. Records are grouped by profile, GROUP_SIZE
+    records at a time, and every profile template is compiled once.
+
+    Args:
+        options: RenderOptions shared by all templates, the dates are replaced per period.
+        periods: (start_date, end_date) pairs, ``options`` dates only if empty.
+        subswaths: subswath sets such as '1 2', the record values if empty.
+        orbits: relative orbits, the record values if empty.
+        template: path or CompiledTemplate, ``options.template`` if None; the template
+            of the profiles without template file of their own.
+    """
+    def __init__(self, options, periods=(), subswaths=(), orbits=(), template=None):
+        self.periods = [tuple(period) for period in periods] or [(options.start_date, options.end_date)]
+        self.subswaths = list(subswaths) or [None]
+        self.orbits = list(orbits) or [None]
+        self.file_name = options.file_name
+        self.template = compile_template(template if template is not None else options.template)
+        self.workflow = options.workflow
+        self.profile_templates = options.profile_templates
+        self._templates = {}
+        self._options = {
+            period: dataclasses.replace(options, start_date=period[0], end_date=period[1])
+            for period in self.periods
+        }
+
+    def units(self, records):
+        """
+        Yields the work Units of ``records``, lazily and in a fixed order: the records of
+        every GROUP_SIZE batch grouped by profile, in order of first appearance.
+        """
+        iterator = iter(records)
+        while True:
+            batch = list(itertools.islice(iterator, GROUP_SIZE))
+            if not batch:
+                return
+            groups = {}
+            for record in batch:
+                groups.setdefault(self.profile(record), []).append(record)
+            for profile, group in groups.items():
+                for record in group:
+                    yield from self._units(record, profile)
+
+    def _units(self, record, profile):
+        for orbit, subswath in itertools.product(self.orbits, self.subswaths):
+            changes = {}
+            if orbit is not None:
+                changes['relative_orbit'] = orbit
+            if subswath is not None:
+                changes['topsStack.subswath'] = subswath
+            variant = _replace(record, changes) if changes else record
+            for period in self.periods:
+                yield Unit(variant, period, profile)
+
+    def profile(self, record):
+        if not self.profile_templates:
+            return None
+        return profiles.find(record.get('satellite'), self.workflow)
+
+    def compiled(self, profile):
+        """
+        Returns the CompiledTemplate of a profile (None for the built-in config).
+        """
+        if profile is None:
+            return self.template
+        if profile not in self._templates:
+            self._templates[profile] = profiles.compiled(profile, self.template)
+        return self._templates[profile]
+
+    def name(self, record, period):
+        suffix = ''
+        if len(self.subswaths) > 1:
+            suffix += '_sw' + ''.join(str(record.get('topsStack.subswath', '')).split())
+        if len(self.periods) > 1:
+            suffix += f"_{period[0]}_{period[1]}"
+        return template_name(record, self.file_name, suffix)
+
+    def prepare(self, unit):
+        """
+        Returns (file name, input hash, marker values) of a work unit.
+        """
+        record, period, profile = unit
+        values = template_values(record, self._options[period])
+        template = self.compiled(profile)
+        template_id = template.digest if template is not None else 'builtin'
+        return self.name(record, period), content_hash(values, template_id), values
+
+    def render(self, values, profile=None):
+        return render_values(self.compiled(profile), values)
+
+    def render_unit(self, unit):
+        name, key, values = self.prepare(unit)
+        return name, key, values, self.render(values, unit.profile)
+
+
+def _replace(record, changes):
+    if isinstance(record, Record):
+        return record.replace(**changes)
+    return {**record, **changes}
+
+
+_worker_fanout = None
+
+
+def _init_worker(fanout):
+    global _worker_fanout
+    _worker_fanout = fanout
+
+
+def _render_chunk(units):
+    return [_worker_fanout.render_unit(unit) for unit in units]
+
+
+def render_processes(fanout, units, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Renders work units in a pool of worker processes.
+
+    Units are sent in chunks of ``chunk_size``, at most two chunks per worker ahead of
+    the results, so a lazy ``units`` iterable is never read into memory as a whole.
+
+    Args:
+        fanout: FanOut the units come from, sent once to every worker.
+        units: iterable of work units (see ``FanOut.units``).
+        processes: number of worker processes, all cores if None or 0.
+
+    Yields:
+        (file name, input hash, marker values, template text) per unit, in input order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    processes = processes or os.cpu_count() or 1
+    iterator = iter(units)
+    pending = collections.deque()
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(fanout,)) as pool:
+        while True:
+            while len(pending) < 2 * processes:
+                chunk = list(itertools.islice(iterator, chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.submit(_render_chunk, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
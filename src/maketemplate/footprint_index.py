@@ -0,0 +1,145 @@
+import numpy as np
+
+from maketemplate import geometry
+
+
+def _is_missing(value):
+    return value is None or value == '' or (isinstance(value, float) and np.isnan(value))
+
+
+class FootprintIndex:
+    """
+    Bounding boxes of ASF granule footprints, sorted by minimum longitude.
+
+    A granule can only contain an area of interest if its minimum longitude is not
+    larger than the one of the area, so every lookup is restricted to a prefix of the
+    sorted boxes (``np.searchsorted``) and the remaining three bounds are checked with
+    one vectorized comparison over that prefix.
+
+    Args:
+        names: granule names.
+        paths: relative orbit numbers.
+        directions: flight directions ('A' or 'D').
+        bounds: (n, 4) array of (min_lon, max_lon, min_lat, max_lat).
+    """
+    def __init__(self, names, paths, directions, bounds):
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        order = np.argsort(bounds[:, 0], kind='stable')
+
+        self.names = np.asarray(names, dtype=str)[order]
+        self.paths = np.asarray(paths, dtype=np.int64)[order]
+        self.directions = np.asarray(directions, dtype=str)[order]
+        self.bounds = bounds[order]
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Builds the index from ASF jsonlite2 result entries ('gn', 'p', 'fd' and 'w' fields).
+        """
+        names, paths, directions, footprints = [], [], [], []
+        for result in results:
+            names.append(result['gn'])
+            paths.append(int(result['p']))
+            directions.append(str(result.get('fd') or '')[:1].upper())
+            footprints.append(result['w'])
+
+        extents = geometry.polygon_extents(*geometry.parse_polygons(footprints))
+        return cls(names, paths, directions, np.column_stack(extents) if names else np.empty((0, 4)))
+
+    def save(self, file_name):
+        np.savez(
+            file_name,
+            names=self.names,
+            paths=self.paths,
+            directions=self.directions,
+            bounds=self.bounds,
+        )
+
+    @classmethod
+    def load(cls, file_name):
+        with np.load(file_name, allow_pickle=False) as data:
+            return cls(data['names'], data['paths'], data['directions'], data['bounds'])
+
+    def query(self, extents):
+        """
+        Finds the granules that fully contain each area of interest.
+
+        Args:
+            extents: (m, 4) array of (min_lon, max_lon, min_lat, max_lat), one row per area.
+
+        Returns:
+            A list of m arrays of indices into the index.
+        """
+        extents = np.asarray(extents, dtype=np.float64).reshape(-1, 4)
+        stops = np.searchsorted(self.bounds[:, 0], extents[:, 0], side='right')
+
+        matches = []
+        for (min_lon, max_lon, min_lat, max_lat), stop in zip(extents, stops):
+            candidates = self.bounds[:stop]
+            inside = (
+                (candidates[:, 1] >= max_lon)
+                & (candidates[:, 2] <= min_lat)
+                & (candidates[:, 3] >= max_lat)
+            )
+            matches.append(np.flatnonzero(inside))
+        return matches
+
+    def query_polygons(self, polygons):
+        """
+        Same as ``query`` for a column of WKT polygons.
+        """
+        extents = geometry.polygon_extents(*geometry.parse_polygons(polygons))
+        return self.query(np.column_stack(extents) if len(polygons) else np.empty((0, 4)))
+
+    def relative_orbits(self, polygons, directions=None):
+        """
+        Finds the relative orbits whose granules fully contain each polygon.
+
+        Args:
+            polygons: column of WKT polygons.
+            directions: optional flight direction per polygon ('A'/'D'), restricts the orbits.
+
+        Returns:
+            A list with one list of (relative_orbit, direction, granule_count) per polygon,
+            sorted by decreasing number of containing granules.
+        """
+        if directions is None:
+            directions = [None] * len(polygons)
+
+        orbits = []
+        for indices, direction in zip(self.query_polygons(polygons), directions):
+            if not _is_missing(direction):
+                indices = indices[self.directions[indices] == str(direction)[:1].upper()]
+            counts = {}
+            for path, fd in zip(self.paths[indices].tolist(), self.directions[indices].tolist()):
+                counts[(path, fd)] = counts.get((path, fd), 0) + 1
+            orbits.append(sorted(((path, fd, n) for (path, fd), n in counts.items()), key=lambda o: (-o[2], o[0])))
+        return orbits
+
+
+def fill_relative_orbits(records, index):
+    """
+    Sets 'relative_orbit' of the records that have none to the relative orbit with most
+    granules containing the record polygon (restricted to the record 'direction').
+
+    Returns:
+        The number of records that were filled.
+    """
+    missing = [record for record in records if _is_missing(record.get('relative_orbit'))]
+    if not missing:
+        return 0
+
+    orbits = index.relative_orbits(
+        [record['polygon'] for record in missing],
+        [record.get('direction') for record in missing],
+    )
+
+    filled = 0
+    for record, candidates in zip(missing, orbits):
+        if candidates:
+            record['relative_orbit'] = candidates[0][0]
+            filled += 1
+    return filled
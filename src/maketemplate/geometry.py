@@ -0,0 +1,139 @@
+import numpy as np
+
+# Meters per degree of latitude
+METERS_PER_DEGREE = 111320
+
+
+def round_like_python(values, ndigits):
+    """
+    Rounds an array exactly like the builtin ``round(value, ndigits)``.
+
+    ``np.round`` scales by 10**ndigits before rounding, which moves values that sit
+    on a decimal tie (e.g. 10.7675 -> 10.77 vs 10.76). Those few elements are
+    rounded with the builtin instead, everything else stays vectorized.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    out = np.rint(scaled) / scale
+
+    near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if near_tie.size:
+        out[near_tie] = [round(value, ndigits) for value in values[near_tie].tolist()]
+    return out
+
+
+def parse_polygons(polygons):
+    """
+    Parses a column of WKT polygons into flat coordinate arrays.
+
+    Args:
+        polygons: iterable of 'POLYGON((lon lat,lon lat,...))' strings.
+
+    Returns:
+        A tuple (coords, offsets): coords is an (n, 2) array of (lon, lat) vertices of
+        all polygons, the vertices of polygon i are coords[offsets[i]:offsets[i + 1]].
+    """
+    bodies = [polygon.replace("POLYGON((", "").replace("))", "") for polygon in polygons]
+    counts = np.fromiter((body.count(',') + 1 for body in bodies), dtype=np.int64, count=len(bodies))
+    offsets = np.zeros(len(bodies) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    values = np.array(' '.join(bodies).replace(',', ' ').split(), dtype=np.float64)
+    if values.size != 2 * offsets[-1]:
+        raise ValueError("Malformed polygon: every vertex must be a 'lon lat' pair")
+
+    return values.reshape(-1, 2), offsets
+
+
+def polygon_extents(coords, offsets):
+    """
+    Computes the exact (unrounded) extent of every polygon.
+
+    Returns:
+        A tuple of arrays (min_lon, max_lon, min_lat, max_lat), one element per polygon.
+    """
+    starts = offsets[:-1]
+    if not starts.size:
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+
+    lon, lat = coords[:, 0], coords[:, 1]
+    return (
+        np.minimum.reduceat(lon, starts),
+        np.maximum.reduceat(lon, starts),
+        np.minimum.reduceat(lat, starts),
+        np.maximum.reduceat(lat, starts),
+    )
+
+
+def bounding_boxes(coords, offsets):
+    """
+    Computes the bounding box of every polygon, rounded to 2 decimals.
+
+    Returns:
+        A tuple of arrays (lat1, lat2, lon1, lon2), one element per polygon.
+    """
+    min_lon, max_lon, min_lat, max_lat = polygon_extents(coords, offsets)
+    return (
+        round_like_python(min_lat, 2),
+        round_like_python(max_lat, 2),
+        round_like_python(min_lon, 2),
+        round_like_python(max_lon, 2),
+    )
+
+
+def polygon_bounds(polygons):
+    """
+    Array version of ``parse_polygon``: (lat1, lat2, lon1, lon2) arrays for a column of WKT polygons.
+    """
+    return bounding_boxes(*parse_polygons(polygons))
+
+
+def miaplpy_check_longitudes(lon1, lon2):
+    """
+    Array version of ``miaplpy_check_longitude``.
+    """
+    lon1 = np.asarray(lon1, dtype=np.float64)
+    lon2 = np.asarray(lon2, dtype=np.float64)
+    width = np.abs(lon1 - lon2)
+    val = (width - 0.2) / 2
+
+    wide = width > 0.2
+    miaLon1 = np.where(wide, round_like_python(np.where(lon1 > 0, lon1 - val, lon1 + val), 2), lon1)
+    miaLon2 = np.where(wide, round_like_python(np.where(lon2 > 0, lon2 + val, lon2 - val), 2), lon2)
+    return miaLon1, miaLon2
+
+
+def topstack_check_longitudes(lon1, lon2):
+    """
+    Array version of ``topstack_check_longitude``.
+    """
+    lon1 = np.asarray(lon1, dtype=np.float64)
+    lon2 = np.asarray(lon2, dtype=np.float64)
+    width = np.abs(lon1 - lon2)
+    val = (5 - width) / 2
+
+    narrow = width < 5
+    topLon1 = np.where(narrow, round_like_python(np.where(lon1 > 0, lon1 + val, lon1 - val), 2), np.minimum(lon1, lon2))
+    topLon2 = np.where(narrow, round_like_python(np.where(lon2 > 0, lon2 - val, lon2 + val), 2), np.maximum(lon1, lon2))
+    return topLon1, topLon2
+
+
+def lat_lon_steps(latitude_step, lat1, lat2):
+    """
+    Array version of ``generate_lat_lon_steps``.
+
+    Args:
+        latitude_step: Latitude step size in meters.
+        lat1, lat2: arrays with the latitude range of every polygon.
+
+    Returns:
+        A tuple of arrays (lat_step, lon_step) in degrees.
+    """
+    lat1 = np.asarray(lat1, dtype=np.float64)
+    lat2 = np.asarray(lat2, dtype=np.float64)
+    lat_step = latitude_step / METERS_PER_DEGREE
+    latitude = (lat1 + lat2) / 2
+    lon_step = round_like_python(lat_step / np.cos(np.radians(latitude)), 5)
+    return np.full(lat1.shape, lat_step), lon_step
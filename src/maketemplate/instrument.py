@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+from collections import Counter
+
+# Active Recorder, None while instrumentation is off
+_recorder = None
+
+# Interval of the stack sampler behind --profile FILE.folded
+SAMPLE_INTERVAL = 0.005
+
+
+class Recorder:
+    """
+    Wall and CPU time per stage plus named counters of one run.
+
+    Stages may be entered concurrently from several worker threads; the time of a stage
+    is then the sum over all workers. CPU time is the CPU time of the thread that ran
+    the stage.
+    """
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def add(self, name, wall, cpu):
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                self.stages[name] = [1, wall, cpu]
+            else:
+                entry[0] += 1
+                entry[1] += wall
+                entry[2] += cpu
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'wall': time.perf_counter() - self._start,
+                'cpu': time.process_time() - self._cpu,
+                'stages': {name: {'calls': calls, 'wall': wall, 'cpu': cpu} for name, (calls, wall, cpu) in self.stages.items()},
+                'counters': dict(self.counters),
+            }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=1)
+            f.write('\n')
+
+    def report(self):
+        parts = [f"{name}: {wall:.3f}s" for name, (_, wall, _) in self.stages.items()]
+        print(f"Timings -> {', '.join(parts)}")
+
+
+class _Stage:
+    __slots__ = ('recorder', 'name', 'wall', 'cpu')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.add(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """
+    Context manager timing the ``name`` stage; a shared no-op while instrumentation is off.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_STAGE
+    return _Stage(recorder, name)
+
+
+def count(name, value=1):
+    """
+    Adds ``value`` to the ``name`` counter; does nothing while instrumentation is off.
+    """
+    recorder = _recorder
+    if recorder is not None:
+        recorder.count(name, value)
+
+
+@contextlib.contextmanager
+def recording(recorder=None):
+    """
+    Turns instrumentation on for the duration of the block.
+
+    Returns:
+        The Recorder collecting the stages and counters.
+    """
+    global _recorder
+    previous = _recorder
+    _recorder = recorder or Recorder()
+    try:
+        yield _recorder
+    finally:
+        _recorder = previous
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of all threads every ``interval`` seconds and writes
+    them in the collapsed format of flamegraph.pl / speedscope / inferno
+    ("outer;inner;leaf count" per line).
+    """
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='maketemplate-sampler', daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            for stack, samples in sorted(self.samples.items()):
+                f.write(f"{stack} {samples}\n")
+
+
+@contextlib.contextmanager
+def profile(path):
+    """
+    Profiles the block and writes the result to ``path``.
+
+    A path ending in .folded gets sampled stacks of all threads for flame graphs,
+    anything else a cProfile dump of the calling thread (read it with ``python -m
+    pstats`` or snakeviz). Does nothing if ``path`` is None.
+    """
+    if not path:
+        yield
+        return
+
+    if path.endswith('.folded'):
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.save(path)
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
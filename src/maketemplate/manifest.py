@@ -0,0 +1,110 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+
+MANIFEST_NAME = '.maketemplate_manifest.json'
+
+
+def content_hash(*parts):
+    """
+    Hashes JSON-serializable parts (values that are not serializable are hashed by ``str``).
+    """
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf8')).hexdigest()
+
+
+def temporary_file(path):
+    """
+    Creates a temporary file next to ``path`` to be renamed to it (see ``replace``).
+
+    The file is created with mode 0666, so unlike mkstemp's 0600 files it gets the usual
+    umask permissions.
+
+    Returns:
+        (file descriptor, temporary path)
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    tmp = os.path.join(folder, f".{uuid.uuid4().hex}.tmp")
+    return os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), tmp
+
+
+def replace(tmp, path):
+    """
+    Renames the temporary file ``tmp`` to ``path``; a replaced file keeps its mode.
+    """
+    try:
+        os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+    except FileNotFoundError:
+        pass
+    os.replace(tmp, path)
+
+
+def write_atomic(path, text):
+    """
+    Writes ``text`` to a temporary file in the same directory and renames it to ``path``,
+    so readers never see a partially written file.
+    """
+    fd, tmp = temporary_file(path)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Manifest:
+    """
+    Input hashes of the templates written to an output directory.
+
+    Each output file name maps to the hash of everything it was rendered from (record
+    values, template text, CLI options) plus the size and mtime of the written file,
+    so an output is only current if its inputs are unchanged and nobody touched it.
+    """
+    def __init__(self, out_dir):
+        self.path = os.path.join(out_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self.counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_current(self, file_name, key):
+        entry = self.entries.get(os.path.basename(file_name))
+        if not entry or entry['inputs'] != key:
+            return False
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            return False
+        return [stat.st_size, stat.st_mtime_ns] == entry['stat']
+
+    def skip(self, file_name):
+        with self._lock:
+            self.counts['unchanged'] += 1
+
+    def write(self, file_name, key, text):
+        """
+        Writes ``text`` atomically to ``file_name`` and records its input hash.
+        """
+        existed = os.path.exists(file_name)
+        write_atomic(file_name, text)
+        stat = os.stat(file_name)
+
+        with self._lock:
+            self.entries[os.path.basename(file_name)] = {'inputs': key, 'stat': [stat.st_size, stat.st_mtime_ns]}
+            self.counts['updated' if existed else 'created'] += 1
+
+    def save(self):
+        with self._lock:
+            write_atomic(self.path, json.dumps(self.entries, indent=1, sort_keys=True))
+
+    def summary(self):
+        return ', '.join(f"{count} {state}" for state, count in self.counts.items())
@@ -0,0 +1,117 @@
+"""
+Template profiles: the template of every satellite and processing workflow.
+
+A profile is looked up by the sheet/CLI satellite name ('Sen', 'Radarsat', 'TerraSAR')
+and the workflow; without workflow the default workflow of the satellite is used. The
+Sentinel-1 topsStack profile has no template file of its own, it renders with the run
+template (--template, docs/template.txt by default), so Sentinel-only runs are unchanged.
+
+    profile = find('Radarsat')              # Profile('Radarsat', 'stripmap', 'stripmap.txt')
+    template = compiled(profile, default='docs/template.txt')
+"""
+import os
+from collections import namedtuple
+
+from maketemplate.api import SATELLITES, compile_template
+
+WORKFLOWS = ('topsStack', 'stripmap', 'miaplpy')
+
+# Directory of the profile template files
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'docs', 'templates')
+
+# template: file name in TEMPLATE_DIR or path, None for the run template
+Profile = namedtuple('Profile', ['satellite', 'workflow', 'template'])
+
+PROFILES = {}
+
+# Workflow used for a satellite if none is given
+DEFAULT_WORKFLOWS = {
+    'Sen': 'topsStack',
+    'Radarsat': 'stripmap',
+    'TerraSAR': 'stripmap',
+}
+
+# Full satellite names of the records -> sheet/CLI satellite names
+_SATELLITE_KEYS = {name: key for key, name in SATELLITES.items()}
+
+
+def register(satellite, workflow, template=None):
+    """
+    Adds (or replaces) the profile of ``satellite`` and ``workflow``.
+
+    Args:
+        satellite: sheet/CLI satellite name, a key of ``api.SATELLITES``.
+        workflow: one of WORKFLOWS.
+        template: template file name in TEMPLATE_DIR or path, None for the run template.
+    """
+    if satellite not in SATELLITES:
+        raise ValueError(f"Invalid satellite name. Choose from {list(SATELLITES)}")
+    if workflow not in WORKFLOWS:
+        raise ValueError(f"Invalid workflow. Choose from {list(WORKFLOWS)}")
+    PROFILES[satellite, workflow] = Profile(satellite, workflow, template)
+
+
+register('Sen', 'topsStack')
+register('Sen', 'miaplpy', 'miaplpy.txt')
+for _satellite in ('Radarsat', 'TerraSAR'):
+    register(_satellite, 'stripmap', 'stripmap.txt')
+    register(_satellite, 'miaplpy', 'stripmap_miaplpy.txt')
+
+
+def satellite_key(satellite):
+    """
+    Returns the sheet/CLI name ('Sen') of a record satellite ('SENTINEL-1A,SENTINEL-1B',
+    'SENTINEL-1', 'Sen'), None if it is unknown.
+    """
+    if satellite in SATELLITES:
+        return satellite
+    if satellite in _SATELLITE_KEYS:
+        return _SATELLITE_KEYS[satellite]
+    if str(satellite or '').upper().startswith('SEN'):
+        return 'Sen'
+    return None
+
+
+def find(satellite, workflow=None):
+    """
+    Returns the profile of a satellite (sheet/CLI or record name) and workflow.
+
+    A record satellite that is unknown gets the Sentinel-1 profile, whose template is
+    the run template, like before profiles existed.
+
+    Raises:
+        ValueError: if the satellite has no profile for ``workflow``.
+    """
+    key = satellite_key(satellite) or 'Sen'
+    workflow = workflow or DEFAULT_WORKFLOWS[key]
+    try:
+        return PROFILES[key, workflow]
+    except KeyError:
+        workflows = [name for sat, name in PROFILES if sat == key]
+        raise ValueError(f"No {workflow} template for {key}, choose from {workflows}") from None
+
+
+def template_path(profile, default=None):
+    """
+    Returns the template path of ``profile``, ``default`` (the run template) if it has none.
+    """
+    if profile.template is None:
+        return default
+    if os.path.isabs(profile.template):
+        return profile.template
+    return os.path.join(TEMPLATE_DIR, profile.template)
+
+
+def compiled(profile, default=None):
+    """
+    Returns the CompiledTemplate of ``profile`` (None for the built-in config), compiled
+    once per process and file version (see ``load_template``).
+
+    Raises:
+        FileNotFoundError: if the template file of the profile is missing; only a
+            missing run template falls back to the built-in (Sentinel-1) config.
+    """
+    path = template_path(profile, default)
+    if profile.template is not None and not os.path.exists(path):
+        raise FileNotFoundError(f"Template {path} of the {profile.satellite} {profile.workflow} profile does not exist")
+    return compile_template(path)
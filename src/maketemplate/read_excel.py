@@ -1,18 +1,224 @@
 import os
+import glob
+import json
+import hashlib
+import datetime
+import numpy as np
 import pandas as pd
 
+from maketemplate import instrument
+
 scratch = os.getenv('SCRATCHDIR')
 
-def main(file_name):
-    path = os.path.join(scratch, file_name) if not(os.path.isabs(file_name)) else file_name
+# Spreadsheet columns used to build the templates
+SHEET_COLUMNS = (
+    'name',
+    'direction',
+    'ssaraopt.startDate',
+    'ssaraopt.endDate',
+    'ssaraopt.relativeOrbit',
+    'topsStack.subswath',
+    'mintpy.troposphericDelay',
+    'polygon',
+    'satellite',
+)
+
+# Parsed workbooks are cached in this directory next to the workbook, or in
+# $MAKETEMPLATE_CACHE_DIR if set
+CACHE_DIR = '.maketemplate_cache'
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+
+# Python types of the values of mixed (object) columns that the cache can restore
+_KINDS = ('none', 'str', 'int', 'float', 'bool', 'datetime')
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _kind(value):
+    if value is None:
+        return 'none'
+    if isinstance(value, (bool, np.bool_)):
+        return 'bool'
+    if isinstance(value, (int, np.integer)):
+        return 'int'
+    if isinstance(value, (float, np.floating)):
+        return 'float'
+    if isinstance(value, str):
+        return 'str'
+    if isinstance(value, datetime.datetime):
+        return 'datetime'
+    raise TypeError(f"cannot cache a {type(value).__name__} value")
+
+
+def _restore(kind, text):
+    if kind == 'none':
+        return None
+    if kind == 'int':
+        return int(text)
+    if kind == 'float':
+        return float(text)
+    if kind == 'bool':
+        return text == 'True'
+    if kind == 'datetime':
+        return pd.Timestamp(text)
+    return text
+
+
+def _to_table(df):
+    """
+    Converts a parsed sheet to an Arrow table with an explicit type per column.
+
+    Typed columns keep their dtype (recorded in the schema metadata); object columns
+    with mixed values (e.g. subswath '1 2' next to 3) are stored as text plus the type
+    of every value, so they are read back exactly as parsed.
+    """
+    import pyarrow as pa
+
+    arrays, names, columns = [], [], []
+    for i, name in enumerate(df.columns):
+        if not isinstance(name, str):
+            raise TypeError(f"cannot cache column name {name!r}")
+        values = df[name]
+        if values.dtype == object:
+            kinds = [_kind(value) for value in values.tolist()]
+            text = [None if kind == 'none' else (value.isoformat() if kind == 'datetime' else repr(value) if kind == 'float' else str(value))
+                    for kind, value in zip(kinds, values.tolist())]
+            arrays += [pa.array(text, type=pa.string()), pa.array([_KINDS.index(kind) for kind in kinds], type=pa.int8())]
+            names += [f"{i}", f"{i}.kind"]
+            columns.append({'name': name, 'dtype': 'object'})
+        else:
+            arrays.append(pa.Array.from_pandas(values))
+            names.append(f"{i}")
+            columns.append({'name': name, 'dtype': str(values.dtype)})
+    return pa.Table.from_arrays(arrays, names=names, metadata={'maketemplate': json.dumps(columns)})
+
+
+def _from_table(table):
+    columns = json.loads(table.schema.metadata[b'maketemplate'])
+    data = {}
+    for i, column in enumerate(columns):
+        values = table.column(f"{i}")
+        if column['dtype'] == 'object':
+            kinds = table.column(f"{i}.kind").to_pylist()
+            data[column['name']] = pd.Series([_restore(_KINDS[kind], text) for kind, text in zip(kinds, values.to_pylist())], dtype=object)
+        else:
+            data[column['name']] = values.to_pandas().astype(column['dtype'])
+    return pd.DataFrame(data, columns=[column['name'] for column in columns])
+
+
+def _read_excel_cached(path):
+    """
+    Reads a workbook through a parsed copy stored in CACHE_DIR next to it.
+
+    The copy is keyed by the absolute path and the content hash of the workbook and
+    stored as an Arrow (feather) file with explicit column types, see ``_to_table``.
+    Nothing in it is executed on load, so a shared cache directory is safe to read;
+    workbooks of the same name in different folders have their own copies.
+    """
+    import pyarrow.feather
+
+    folder, base = os.path.split(path)
+    cache_dir = os.getenv('MAKETEMPLATE_CACHE_DIR') or os.path.join(folder, CACHE_DIR)
+    prefix = f"{base}.{hashlib.sha1(os.path.abspath(path).encode('utf8')).hexdigest()[:12]}"
+    cache_file = os.path.join(cache_dir, f"{prefix}.{file_hash(path)[:16]}.feather")
+
+    if os.path.exists(cache_file):
+        instrument.count('read_excel.cache_hits')
+        with instrument.stage('read_excel.load_cache'):
+            return _from_table(pyarrow.feather.read_table(cache_file))
+
+    instrument.count('read_excel.cache_misses')
+    with instrument.stage('read_excel.parse'):
+        df = pd.read_excel(path)
+
+    try:
+        table = _to_table(df)
+        os.makedirs(cache_dir, exist_ok=True)
+        for stale in glob.glob(os.path.join(glob.escape(cache_dir), f"{glob.escape(prefix)}.*")):
+            os.remove(stale)
+        tmp = f"{cache_file}.{os.getpid()}.tmp"
+        pyarrow.feather.write_feather(table, tmp)
+        os.replace(tmp, cache_file)
+    except (OSError, TypeError):
+        # Read-only location or values the cache cannot type: it is an optimization only
+        pass
+
+    return df
+
+
+def _arrow_columns(path, columns, extension):
+    if columns is None:
+        return None
+
+    import pyarrow
+    if extension == '.parquet':
+        import pyarrow.parquet
+        names = pyarrow.parquet.read_schema(path).names
+    else:
+        import pyarrow.ipc
+        with pyarrow.memory_map(path) as source:
+            names = pyarrow.ipc.open_file(source).schema.names
+    return [column for column in columns if column in names]
+
+
+def sheet_path(file_name):
+    """
+    Returns the path of a sheet, relative to $SCRATCHDIR if not absolute.
+    """
+    return os.path.join(scratch, file_name) if not(os.path.isabs(file_name)) else file_name
+
+
+def main(file_name, columns=None, cache=True):
+    """
+    Loads the volcano sheet.
+
+    Args:
+        file_name: workbook (.xlsx), .csv, .parquet or .feather file, relative to $SCRATCHDIR if not absolute.
+        columns: only load these columns (missing ones are ignored), all columns if None.
+        cache: read workbooks through the parsed copy cached next to them.
+
+    Returns:
+        A pandas DataFrame.
+    """
+    path = sheet_path(file_name)
 
     if not os.path.exists(path):
         raise FileNotFoundError(f"File {file_name} does not exist in {scratch}")
 
-    df = pd.read_excel(path)
+    with instrument.stage('read_excel'):
+        df = _read(path, columns, cache)
+    instrument.count('read_excel.rows', len(df))
+    return df
+
+
+def _read(path, columns, cache):
+    extension = os.path.splitext(path)[1].lower()
+    wanted = (lambda column: column in columns) if columns is not None else None
+
+    if extension == '.csv':
+        return pd.read_csv(path, usecols=wanted)
+    if extension == '.parquet':
+        return pd.read_parquet(path, columns=_arrow_columns(path, columns, extension))
+    if extension == '.feather':
+        return pd.read_feather(path, columns=_arrow_columns(path, columns, extension))
+
+    if cache and extension in EXCEL_EXTENSIONS:
+        df = _read_excel_cached(path)
+    else:
+        with instrument.stage('read_excel.parse'):
+            df = pd.read_excel(path, usecols=wanted)
+
+    if columns is not None:
+        df = df[[column for column in df.columns if column in columns]]
 
     return df
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,114 @@
+"""
+Compact template records.
+
+A Record holds only the fields the templates are rendered from, in ``__slots__``, and
+keeps the dict interface (``get``, ``[]``, ``in``) of the former record dicts under
+their sheet/dict key names, e.g. ``record['topsStack.subswath']`` is ``record.subswath``.
+"""
+
+# Record attributes
+FIELDS = (
+    'name',
+    'direction',
+    'satellite',
+    'relative_orbit',
+    'start_date',
+    'end_date',
+    'subswath',
+    'tropospheric_delay_method',
+    'polygon',
+    'latitude1',
+    'latitude2',
+    'longitude1',
+    'longitude2',
+    'mia_lon1',
+    'mia_lon2',
+    'top_lon1',
+    'top_lon2',
+    'lat_step',
+    'lon_step',
+)
+
+# Sheet columns and former dict keys that hold the same value as a Record attribute
+ALIASES = {
+    'ssaraopt.relativeOrbit': 'relative_orbit',
+    'topsStack.subswath': 'subswath',
+    'mintpy.troposphericDelay': 'tropospheric_delay_method',
+    'mintpy.troposphericDelay.method': 'tropospheric_delay_method',
+    'miaplpy.longitude1': 'mia_lon1',
+    'miaplpy.longitude2': 'mia_lon2',
+    'topsStack.longitude1': 'top_lon1',
+    'topsStack.longitude2': 'top_lon2',
+}
+
+_ATTRIBUTES = {**{field: field for field in FIELDS}, **ALIASES}
+
+
+class Record:
+    """
+    One template record.
+
+    Fields that were never given are unset rather than None, so ``get`` returns its
+    default for them exactly like it did for a dict without the key.
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, **fields):
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """
+        Builds a record from a dict with sheet/dict key names; keys that no template
+        uses are dropped.
+        """
+        record = cls()
+        for key, value in mapping.items():
+            attribute = _ATTRIBUTES.get(key)
+            if attribute is not None:
+                setattr(record, attribute, value)
+        return record
+
+    def get(self, key, default=None):
+        attribute = _ATTRIBUTES.get(key)
+        if attribute is None:
+            return default
+        return getattr(self, attribute, default)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, _ATTRIBUTES[key])
+        except (KeyError, AttributeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in _ATTRIBUTES:
+            raise KeyError(key)
+        setattr(self, _ATTRIBUTES[key], value)
+
+    def __contains__(self, key):
+        return key in _ATTRIBUTES and hasattr(self, _ATTRIBUTES[key])
+
+    def replace(self, **changes):
+        """
+        Returns a copy with the fields in ``changes`` (sheet/dict key names work too) replaced.
+        """
+        record = Record(**self.as_dict())
+        for key, value in changes.items():
+            record[key] = value
+        return record
+
+    def as_dict(self):
+        """
+        Returns the set fields as a dict of attribute name -> value.
+        """
+        return {field: getattr(self, field) for field in FIELDS if hasattr(self, field)}
+
+    def __eq__(self, other):
+        if not isinstance(other, Record):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return f"Record({', '.join(f'{key}={value!r}' for key, value in self.as_dict().items())})"
@@ -0,0 +1,318 @@
+import os
+import json
+import stat
+import time
+import argparse
+import ipaddress
+import threading
+import socketserver
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from maketemplate import api, validate
+from maketemplate.cli import create_insar_template as cli
+
+# Request fields that map directly onto CLI options; files are never named by a
+# request, 'sheet' and 'template' pick one of the files the server was started with
+OPTION_FIELDS = {
+    'relative_orbit': 'relative_orbit',
+    'direction': 'direction',
+    'subswath': 'subswath',
+    'satellite': 'satellite',
+    'tropospheric_delay_method': 'tropospheric_delay_method',
+    'min_temp_coh': 'min_temp_coh',
+    'lat_step': 'lat_step',
+    'workflow': 'workflow',
+    'name': 'file_name',
+}
+
+# Types of the request fields; numbers are never booleans
+FIELD_TYPES = {
+    'relative_orbit': int,
+    'direction': str,
+    'subswath': str,
+    'satellite': str,
+    'tropospheric_delay_method': str,
+    'min_temp_coh': (int, float),
+    'lat_step': (int, float),
+    'workflow': str,
+    'name': str,
+    'start_date': str,
+    'end_date': str,
+    'polygon': str,
+    'url': str,
+}
+
+DIRECTIONS = ('A', 'D')
+
+
+class TemplateService:
+    """
+    Renders templates on request while keeping everything expensive in memory.
+
+    Compiled templates are cached by ``load_template``, sheets are loaded and turned into
+    records once per (path, mtime), ASF URLs are resolved once per server process (and go
+    through the on-disk response cache the first time).
+
+    Requests can only use the sheets (--xlsfile) and templates (--serve-template) named
+    when the server was started, by name or by position.
+
+    Args:
+        inps: parsed CLI options used as defaults of every request.
+    """
+    def __init__(self, inps):
+        self.inps = inps
+        self.sheet_files = {}
+        for path in inps.xlsfile or []:
+            name = os.path.basename(path)
+            if name in self.sheet_files:
+                raise ValueError(f"two --xlsfile sheets are named {name!r}")
+            self.sheet_files[name] = os.path.abspath(path)
+        self.template_files = {}
+        for entry in getattr(inps, 'serve_templates', None) or []:
+            name, sep, path = entry.partition('=')
+            if not sep or not name or not path:
+                raise ValueError(f"--serve-template {entry!r} must be NAME=PATH")
+            if name in self.template_files:
+                raise ValueError(f"--serve-template name {name!r} is given twice")
+            if not os.path.isfile(path):
+                raise ValueError(f"--serve-template {name}: no file {path}")
+            self.template_files[name] = os.path.abspath(path)
+        self._sheets = {}
+        self._urls = {}
+        self._lock = threading.Lock()
+
+    def _options(self, request):
+        for field, types in FIELD_TYPES.items():
+            value = request.get(field)
+            if value is not None and (not isinstance(value, types) or isinstance(value, bool)):
+                raise ValueError(f"{field} cannot be {type(value).__name__} {value!r}")
+        if request.get('direction') is not None and request['direction'] not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {list(DIRECTIONS)}, not {request['direction']!r}")
+
+        inps = argparse.Namespace(**vars(self.inps))
+        for field, option in OPTION_FIELDS.items():
+            if request.get(field) is not None:
+                setattr(inps, option, request[field])
+        if request.get('template') is not None:
+            inps.template = _pick(self.template_files, request['template'], 'template')
+            inps.template_given = True
+        if request.get('start_date'):
+            inps.start_date = [request['start_date']]
+        if request.get('end_date'):
+            inps.end_date = [request['end_date']]
+        return inps
+
+    def sheet_records(self, sheet):
+        """
+        Returns the records of a sheet named at startup (file name or position).
+        """
+        from maketemplate import read_excel
+
+        path = _pick(self.sheet_files, sheet, 'sheet')
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._sheets.get(path)
+            if cached is None or cached[0] != mtime:
+                df = read_excel.main(path, columns=read_excel.SHEET_COLUMNS)
+                cached = (mtime, api.records_from_dataframe(df))
+                self._sheets[path] = cached
+        return cached[1]
+
+    def resolve_url(self, url):
+        from maketemplate import asf_extractor
+
+        if url not in self._urls:
+            self._urls[url] = asf_extractor.main(url)
+        return self._urls[url]
+
+    def _sheet_record(self, request):
+        records = self.sheet_records(request['sheet'])
+        if 'row' in request:
+            row = request['row']
+            if not isinstance(row, int) or isinstance(row, bool) or not 0 <= row < len(records):
+                raise LookupError(f"row must be an index from 0 to {len(records) - 1}, not {row!r}")
+            return records[row]
+
+        matches = [
+            record for record in records
+            if record.get('name') == request.get('name')
+            and (request.get('direction') is None or record.get('direction') == request['direction'])
+        ]
+        if len(matches) != 1:
+            raise LookupError(f"{len(matches)} rows of {request['sheet']} match {request}")
+        return matches[0]
+
+    def render(self, request):
+        """
+        Renders one template.
+
+        Args:
+            request: dict with either 'polygon', 'url', or 'sheet' plus 'row' (index) or
+                     'name' (and optionally 'direction'); further fields override the
+                     server defaults (see OPTION_FIELDS, 'start_date', 'end_date'),
+                     'template' picks one of the --serve-template files.
+
+        Returns:
+            A tuple (file name, template text).
+        """
+        inps = self._options(request)
+
+        if 'sheet' in request:
+            data = self._sheet_record(request)
+        else:
+            if 'url' in request:
+                relative_orbit, satellite, direction, lat1, lat2, lon1, lon2 = self.resolve_url(request['url'])
+            elif 'polygon' in request:
+                inps.polygon = request['polygon']
+                problem = validate.check_polygon(inps.polygon)
+                if problem:
+                    raise ValueError(f"polygon {problem}")
+                lat1, lat2, lon1, lon2 = api.parse_polygon(inps.polygon)
+                satellite = api.get_satellite_name(inps.satellite)
+                direction = inps.direction or 'A'
+                relative_orbit = inps.relative_orbit
+                if relative_orbit is None:
+                    raise ValueError("polygon requests need a relative_orbit")
+            else:
+                raise KeyError("request needs one of 'polygon', 'url' or 'sheet'")
+            data = cli.input_record(inps, relative_orbit, satellite, direction, lat1, lat2, lon1, lon2)
+
+        options = api.RenderOptions.from_namespace(inps)
+        return api.template_name(data, options.file_name), api.render_record(data, options)
+
+
+def _pick(files, key, kind):
+    """
+    Returns the path of the file named ``key`` (or at position ``key``) of ``files``.
+    """
+    if isinstance(key, int) and not isinstance(key, bool) and 0 <= key < len(files):
+        return list(files.values())[key]
+    if isinstance(key, str) and key in files:
+        return files[key]
+    raise LookupError(f"unknown {kind} {key!r}, choose from {list(files)} or their position")
+
+
+def _is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self._reply(200, b'ok\n')
+        else:
+            self._reply(404, b'POST a JSON request to /render\n')
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/render':
+            self._reply(404, b'POST a JSON request to /render\n')
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError(f"request must be a JSON object, not {type(request).__name__}")
+            start = time.perf_counter()
+            name, template = self.service.render(request)
+            elapsed = time.perf_counter() - start
+        except (KeyError, LookupError, ValueError, TypeError, OSError) as error:
+            self._reply(400, f"{type(error).__name__}: {error}\n".encode())
+            return
+
+        self._reply(200, template.encode('utf8'), {
+            'X-Template-Name': name,
+            'X-Render-Time-ms': f"{elapsed * 1000:.3f}",
+        })
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ('', 0)
+
+
+def create_server(address, inps, allow_remote=False):
+    """
+    Creates the template server.
+
+    Args:
+        address: 'HOST:PORT', 'PORT' or 'unix:/path/to/socket'.
+        inps: parsed CLI options used as request defaults.
+        allow_remote: accept a HOST other than the loopback interface (the server
+            has no authentication, anyone who can connect can render).
+    """
+    handler = type('Handler', (_Handler,), {'service': TemplateService(inps)})
+
+    if address.startswith('unix:'):
+        path = address[len('unix:'):]
+        if os.path.lexists(path):
+            # Only a socket left by an earlier server is replaced
+            if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                raise ValueError(f"refusing to serve on unix:{path}, the file exists and is not a socket")
+            os.remove(path)
+        return _UnixHTTPServer(path, handler)
+
+    host, _, port = address.rpartition(':')
+    host = host or '127.0.0.1'
+    if not allow_remote and not _is_loopback(host):
+        raise ValueError(f"refusing to serve on {host}, not a loopback address (see --serve-remote)")
+    server = ThreadingHTTPServer((host, int(port)), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(address, inps):
+    server = create_server(address, inps, allow_remote=getattr(inps, 'serve_remote', False))
+    print(f"Serving templates on {address} (POST JSON to /render)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if address.startswith('unix:') and os.path.exists(address[len('unix:'):]):
+            os.remove(address[len('unix:'):])
+
+
+def request_template(address, request, timeout=60):
+    """
+    Client helper: asks the server at 'HOST:PORT' for a template.
+
+    Returns:
+        A tuple (file name, template text).
+    """
+    host, _, port = address.rpartition(':')
+    http_request = urllib.request.Request(
+        f"http://{host or '127.0.0.1'}:{port}/render",
+        data=json.dumps(request).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(http_request, timeout=timeout) as response:
+        return response.headers['X-Template-Name'], response.read().decode('utf8')
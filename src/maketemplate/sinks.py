@@ -0,0 +1,165 @@
+import io
+import os
+import json
+import time
+import tarfile
+import zipfile
+import threading
+
+from maketemplate.manifest import Manifest, replace, temporary_file
+
+OUT_FORMATS = ('dir', 'tar', 'zip', 'jsonl')
+BUFFER_SIZE = 1024 * 1024
+
+
+class DirSink:
+    """
+    Writes every template to its own file in ``out_dir`` (atomically, see ``Manifest``).
+    """
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.manifest = Manifest(out_dir)
+
+    def location(self, name):
+        return os.path.join(self.out_dir, name)
+
+    def is_current(self, name, key):
+        return self.manifest.is_current(self.location(name), key)
+
+    def skip(self, name):
+        self.manifest.skip(self.location(name))
+
+    def add(self, name, text, key=None):
+        self.manifest.write(self.location(name), key, text)
+
+    def close(self):
+        self.manifest.save()
+
+    def summary(self):
+        return self.manifest.summary()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class _StreamSink:
+    """
+    Base class of the single-file sinks, which implement ``_write(name, text)`` (called
+    under the sink lock) and optionally ``_open``/``_finish``.
+
+    Templates are appended to one buffered stream as they are rendered, so the number
+    of files created does not depend on the number of templates. The stream goes to a
+    temporary file next to ``path`` that replaces ``path`` on close.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        fd, self._tmp = temporary_file(path)
+        self._file = os.fdopen(fd, 'wb', buffering=BUFFER_SIZE)
+        self._open()
+
+    def _open(self):
+        pass
+
+    def _finish(self):
+        pass
+
+    def location(self, name):
+        return f"{self.path}:{name}"
+
+    def is_current(self, name, key):
+        return False
+
+    def skip(self, name):
+        pass
+
+    def add(self, name, text, key=None):
+        with self._lock:
+            self._write(name, text)
+            self.count += 1
+
+    def close(self, discard=False):
+        if self._file.closed:
+            return
+        try:
+            try:
+                self._finish()
+            finally:
+                self._file.close()
+            if not discard:
+                replace(self._tmp, self.path)
+        finally:
+            # Discarded, or _finish failed
+            if os.path.exists(self._tmp):
+                os.remove(self._tmp)
+
+    def summary(self):
+        return f"{self.count} written to {self.path}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(discard=exc_type is not None)
+        return False
+
+
+class TarSink(_StreamSink):
+    def _open(self):
+        self._tar = tarfile.open(fileobj=self._file, mode='w|')
+
+    def _write(self, name, text):
+        data = text.encode('utf8')
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def _finish(self):
+        self._tar.close()
+
+
+class ZipSink(_StreamSink):
+    def _open(self):
+        self._zip = zipfile.ZipFile(self._file, mode='w', compression=zipfile.ZIP_DEFLATED)
+
+    def _write(self, name, text):
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        self._zip.writestr(info, text.encode('utf8'))
+
+    def _finish(self):
+        self._zip.close()
+
+
+class JsonlSink(_StreamSink):
+    """
+    One JSON object {"name": ..., "template": ...} per line.
+    """
+    def _write(self, name, text):
+        self._file.write((json.dumps({'name': name, 'template': text}) + '\n').encode('utf8'))
+
+
+def open_sink(out_format, out_dir, archive=None):
+    """
+    Opens the output sink of a run.
+
+    Args:
+        out_format: one of OUT_FORMATS.
+        out_dir: output directory.
+        archive: path of the tar/zip/jsonl file, templates.<out_format> in out_dir if None.
+    """
+    if out_format == 'dir':
+        return DirSink(out_dir)
+
+    sinks = {'tar': TarSink, 'zip': ZipSink, 'jsonl': JsonlSink}
+    if out_format not in sinks:
+        raise ValueError(f"Invalid output format {out_format}. Choose from {list(OUT_FORMATS)}")
+    return sinks[out_format](archive or os.path.join(out_dir, f"templates.{out_format}"))
@@ -0,0 +1,67 @@
+import os
+import re
+import hashlib
+import functools
+
+_RE_MARKER = re.compile(r'\*\*\*(\w+)\*\*\*')
+
+# Number of compiled template files kept in memory per process
+CACHE_SIZE = 32
+
+
+class CompiledTemplate:
+    """
+    Template text split once into literal segments and ***marker*** slots.
+
+    Rendering fills the slots from a mapping and joins the segments, so no regular
+    expression runs per record. Markers without a value in the mapping (missing or
+    None) are left unchanged in the output.
+    """
+    def __init__(self, text, path=None):
+        self.path = path
+        self.digest = hashlib.sha1(text.encode('utf8')).hexdigest()
+        parts = _RE_MARKER.split(text)
+        # _RE_MARKER has one group: even entries are literals, odd entries marker names
+        self._segments = list(parts)
+        self._slots = [(i, parts[i]) for i in range(1, len(parts), 2)]
+        self.markers = tuple(dict.fromkeys(name for _, name in self._slots))
+
+    def missing_markers(self, mapping):
+        """
+        Returns the marker names that have no value in ``mapping``.
+
+        Args:
+            mapping: dict of marker name -> value.
+
+        Returns:
+            A list of marker names, in order of first appearance in the template.
+        """
+        return [name for name in self.markers if mapping.get(name) is None]
+
+    def render(self, mapping):
+        """
+        Renders the template with the values in ``mapping`` (converted with ``str``).
+        """
+        out = self._segments.copy()
+        for i, name in self._slots:
+            value = mapping.get(name)
+            out[i] = f'***{name}***' if value is None else str(value)
+        return ''.join(out)
+
+
+def load_template(path):
+    """
+    Returns the CompiledTemplate for ``path``.
+
+    Compiled templates are cached by absolute path and modification time, so the file
+    is read once per process and again only after it changes on disk.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return _compile_file(path, stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _compile_file(path, mtime_ns, size):
+    with open(path, 'r', encoding='utf8') as f:
+        return CompiledTemplate(f.read(), path=path)
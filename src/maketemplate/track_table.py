@@ -0,0 +1,204 @@
+"""
+Sentinel-1 relative orbit (track) and frame lookup table.
+
+The table is built once from a dump of ASF search results (jsonlite2 entries with the
+'p', 'f', 'fd' and 'w' fields) and stored as one .npy file, which is memory-mapped when
+loaded, so looking up the tracks covering an area needs no network access and reads
+only the pages of the table it touches.
+
+    python -m maketemplate.track_table footprints.json -o sentinel1_tracks.npy
+"""
+import os
+import json
+import argparse
+
+import numpy as np
+
+from maketemplate import geometry
+from maketemplate.footprint_index import _is_missing
+from maketemplate.records import Record
+
+TRACK_DTYPE = np.dtype([
+    ('min_lon', '<f8'),
+    ('max_lon', '<f8'),
+    ('min_lat', '<f8'),
+    ('max_lat', '<f8'),
+    ('path', '<i2'),
+    ('frame', '<i2'),
+    ('direction', 'S1'),
+])
+
+# Records looked up at a time by expand_tracks
+BATCH_SIZE = 4096
+
+
+class TrackTable:
+    """
+    Footprints of the (relative orbit, frame, direction) combinations, sorted by
+    minimum longitude.
+
+    The footprint of a frame is the median of the bounding boxes of its granules, so a
+    single short or shifted acquisition does not change it. An area is covered by a
+    track if the frames of the track that span the longitudes of the area together
+    cover its latitudes without gap, i.e. areas on a frame boundary are found too.
+
+    Args:
+        table: structured array of TRACK_DTYPE, sorted by 'min_lon'.
+    """
+    def __init__(self, table):
+        self.table = table
+        self._min_lon = None
+
+    def __len__(self):
+        return len(self.table)
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Builds the table from ASF jsonlite2 result entries.
+        """
+        groups = {}
+        for result in results:
+            key = (int(result['p']), int(result['f']), str(result.get('fd') or '')[:1].upper())
+            groups.setdefault(key, []).append(result['w'])
+
+        table = np.empty(len(groups), dtype=TRACK_DTYPE)
+        for i, ((path, frame, direction), footprints) in enumerate(groups.items()):
+            extents = np.column_stack(geometry.polygon_extents(*geometry.parse_polygons(footprints)))
+            table[i] = (*np.median(extents, axis=0), path, frame, direction.encode())
+
+        return cls(table[np.argsort(table['min_lon'], kind='stable')])
+
+    def save(self, file_name):
+        np.save(file_name, self.table, allow_pickle=False)
+
+    @classmethod
+    def load(cls, file_name):
+        table = np.load(file_name, mmap_mode='r', allow_pickle=False)
+        if table.dtype != TRACK_DTYPE:
+            raise ValueError(f"{file_name} is not a track table")
+        return cls(table)
+
+    def tracks(self, polygons, directions=None):
+        """
+        Finds the tracks covering each polygon.
+
+        Args:
+            polygons: column of WKT polygons.
+            directions: optional flight direction per polygon ('A'/'D'), restricts the tracks.
+
+        Returns:
+            A list with one list of (relative_orbit, direction, frames) per polygon, sorted
+            by direction and relative orbit; frames is a tuple of frame numbers.
+        """
+        if not len(polygons):
+            return []
+        if directions is None:
+            directions = [None] * len(polygons)
+        if self._min_lon is None:
+            # The one column every lookup searches is kept in memory
+            self._min_lon = np.ascontiguousarray(self.table['min_lon'])
+
+        extents = np.column_stack(geometry.polygon_extents(*geometry.parse_polygons(polygons)))
+        stops = np.searchsorted(self._min_lon, extents[:, 0], side='right')
+
+        result = []
+        for (min_lon, max_lon, min_lat, max_lat), stop, direction in zip(extents, stops, directions):
+            candidates = self.table[:stop]
+            mask = (candidates['max_lon'] >= max_lon) & (candidates['max_lat'] >= min_lat) & (candidates['min_lat'] <= max_lat)
+            if not _is_missing(direction):
+                mask &= candidates['direction'] == str(direction)[:1].upper().encode()
+            result.append(_covering_tracks(candidates[mask], min_lat, max_lat))
+        return result
+
+
+def _covering_tracks(frames, min_lat, max_lat):
+    tracks = {}
+    for frame in np.sort(frames, order=['direction', 'path', 'min_lat']):
+        key = (int(frame['path']), frame['direction'].decode())
+        tracks.setdefault(key, []).append((float(frame['min_lat']), float(frame['max_lat']), int(frame['frame'])))
+
+    covering = []
+    for (path, direction), intervals in tracks.items():
+        reach, used = min_lat, []
+        for low, high, number in intervals:
+            if low > reach:
+                break
+            if high > reach or not used:
+                used.append(number)
+            reach = max(reach, high)
+            if reach >= max_lat:
+                covering.append((path, direction, tuple(used)))
+                break
+    return sorted(covering, key=lambda track: (track[1], track[0]))
+
+
+def expand_tracks(records, table, batch_size=BATCH_SIZE):
+    """
+    Yields the records, replacing every record without relative orbit by one record per
+    track covering its polygon (restricted to the record direction if it has one).
+
+    Records without polygon or covering track are yielded unchanged.
+    """
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield from _expand_batch(batch, table)
+            batch = []
+    yield from _expand_batch(batch, table)
+
+
+def _expand_batch(records, table):
+    missing = [
+        i for i, record in enumerate(records)
+        if _is_missing(record.get('relative_orbit')) and not _is_missing(record.get('polygon'))
+    ]
+    tracks = dict(zip(missing, table.tracks(
+        [records[i]['polygon'] for i in missing],
+        [records[i].get('direction') for i in missing],
+    )))
+
+    for i, record in enumerate(records):
+        if not tracks.get(i):
+            yield record
+            continue
+        for path, direction, _ in tracks[i]:
+            yield _with_track(record, path, direction)
+
+
+def _with_track(record, path, direction):
+    changes = {'relative_orbit': path, 'direction': direction}
+    if isinstance(record, Record):
+        return record.replace(**changes)
+    return {**record, **changes}
+
+
+def read_dump(file_name):
+    """
+    Reads ASF search results from a JSON file ({"results": [...]} or a list) or a JSON
+    lines file (one result per line).
+    """
+    with open(file_name) as f:
+        if file_name.endswith('.jsonl'):
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+    return data['results'] if isinstance(data, dict) else data
+
+
+def main(iargs=None):
+    parser = argparse.ArgumentParser(description='Build the Sentinel-1 track lookup table from ASF search result dumps.')
+    parser.add_argument('dumps', nargs='+', help='JSON / JSON lines files of ASF jsonlite2 results.')
+    parser.add_argument('-o', '--output', default='sentinel1_tracks.npy', help='Table file (default: %(default)s).')
+    inps = parser.parse_args(iargs)
+
+    results = []
+    for dump in inps.dumps:
+        results.extend(read_dump(dump))
+    table = TrackTable.from_results(results)
+    table.save(inps.output)
+    print(f"{len(table)} frames of {len(set(table.table['path'].tolist()))} tracks saved in {os.path.abspath(inps.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Validation of the template inputs before anything is rendered.
+
+The sheet checks work on whole columns (pandas string methods and numpy), so a sheet
+of any length is checked in one pass and every bad row is reported at once, instead of
+the first bad value stopping a run halfway through its output.
+
+    problems = validate_sheet(df)
+    if problems:
+        raise ValidationError(problems)
+"""
+import re
+import json
+import datetime
+from collections import namedtuple
+
+from maketemplate import profiles
+from maketemplate.api import SATELLITES, TEMPLATE_MARKERS
+
+# Relative orbits per repeat cycle of the satellites in api.SATELLITES
+ORBITS = {
+    'Sen': 175,
+    'Radarsat': 343,
+    'TerraSAR': 167,
+}
+
+_NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+_VERTEX = rf'{_NUMBER}\s+{_NUMBER}'
+# 'POLYGON((lon lat,lon lat,...))' with two coordinates per vertex
+WKT_POLYGON = rf'\s*POLYGON\(\(\s*{_VERTEX}(?:\s*,\s*{_VERTEX})*\s*\)\)\s*'
+_RE_POLYGON = re.compile(WKT_POLYGON)
+_RE_DATE = re.compile(r'\d{8}')
+
+# Vertices of the smallest closed polygon (a triangle plus the closing vertex)
+MIN_VERTICES = 4
+
+# One problem of the inputs; row is the sheet row number (the header is row 1), None
+# for problems that are not about a row; sheet is set when several sheets are checked
+Problem = namedtuple('Problem', ['row', 'column', 'value', 'message', 'sheet'], defaults=(None,))
+
+
+class ValidationError(ValueError):
+    """
+    Raised with every problem found by a validation pass.
+    """
+    def __init__(self, problems):
+        self.problems = list(problems)
+        super().__init__(format_report(self.problems))
+
+
+def format_report(problems):
+    """
+    Formats problems as one line each, 'row 5, polygon: message ('value')'.
+    """
+    lines = [f"{len(problems)} problem(s) in the inputs:"]
+    for problem in problems:
+        where = f"row {problem.row}, {problem.column}" if problem.row is not None else problem.column
+        if problem.sheet:
+            where = f"{problem.sheet} {where}"
+        lines.append(f"  {where}: {problem.message} ({problem.value!r})")
+    return '\n'.join(lines)
+
+
+def save_report(problems, path):
+    """
+    Writes the problems to ``path`` as a JSON list of {row, column, value, message, sheet}.
+    """
+    with open(path, 'w') as f:
+        json.dump([{**problem._asdict(), 'value': str(problem.value)} for problem in problems], f, indent=1)
+        f.write('\n')
+
+
+def check_date(value, allow_auto=False):
+    """
+    Returns the problem with a YYYYMMDD date (or 'auto' if allowed), None if it is valid.
+    """
+    text = str(value).strip()
+    if allow_auto and 'auto' in text:
+        return None
+    if not _RE_DATE.fullmatch(text):
+        return 'must be a date in the format YYYYMMDD'
+    try:
+        datetime.datetime.strptime(text, '%Y%m%d')
+    except ValueError:
+        return 'is not a valid date'
+    return None
+
+
+def check_orbit(orbit, satellite='Sen'):
+    """
+    Returns the problem with a relative orbit of ``satellite`` (sheet/CLI name), None if
+    it is between 1 and the orbits per repeat cycle of the satellite.
+    """
+    limit = ORBITS.get(satellite, ORBITS['Sen'])
+    if isinstance(orbit, bool) or not isinstance(orbit, int) or not 1 <= orbit <= limit:
+        return f"must be a relative orbit of {satellite} between 1 and {limit}"
+    return None
+
+
+def check_polygon(polygon):
+    """
+    Returns the problem with a WKT polygon, None if it is valid.
+
+    Pure Python, for the single --polygon of the command line.
+    """
+    if not isinstance(polygon, str) or not _RE_POLYGON.fullmatch(polygon):
+        return "must be a WKT polygon 'POLYGON((lon lat,lon lat,...))'"
+    vertices = [tuple(float(value) for value in vertex.split()) for vertex in polygon.strip()[9:-2].split(',')]
+    if len(vertices) < MIN_VERTICES:
+        return f"needs at least {MIN_VERTICES} vertices"
+    if vertices[0] != vertices[-1]:
+        return 'is not closed, the first and last vertex differ'
+    if any(not -180 <= lon <= 180 or not -90 <= lat <= 90 for lon, lat in vertices):
+        return 'has coordinates outside of -180..180 / -90..90'
+    return None
+
+
+def check_template(template):
+    """
+    Finds the markers of a template that no template value fills in.
+
+    Args:
+        template: CompiledTemplate.
+
+    Returns:
+        A list of Problems, empty if every marker is known.
+    """
+    return [
+        Problem(None, 'template', f'***{name}***', f"unknown marker in {template.path or 'the template'}")
+        for name in template.missing_markers(dict.fromkeys(TEMPLATE_MARKERS, ''))
+    ]
+
+
+def validate_sheet(df, allow_missing_orbit=False, workflow=None):
+    """
+    Checks every row of the spreadsheet.
+
+    Covers the satellite names and their template profiles, the WKT syntax, closure and
+    coordinate ranges of the polygons, the start/end date formats and the relative orbit
+    ranges.
+
+    Args:
+        df: DataFrame as returned by ``read_excel.main``.
+        allow_missing_orbit: accept rows without relative orbit (filled in later from
+            a track table or footprint index).
+        workflow: workflow of the run, every satellite needs a profile for it.
+
+    Returns:
+        A list of Problems sorted by row, empty if the sheet is valid.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from maketemplate import geometry
+
+    problems = []
+
+    def _report(column, bad, message):
+        bad = np.asarray(bad, dtype=bool)
+        if not bad.any():
+            return
+        values = df[column].tolist()
+        for i in np.flatnonzero(bad).tolist():
+            problems.append(Problem(i + 2, column, values[i], message))
+
+    def _text(column):
+        values = df[column]
+        if pd.api.types.is_float_dtype(values):
+            # Integers of a column with missing values are read as floats
+            whole = values.notna() & (values % 1 == 0)
+            values = values.astype(object).where(~whole, values[whole].astype('int64').astype(str))
+        return values.astype(str).str.strip().where(values.notna())
+
+    for column in ('satellite', 'polygon', 'ssaraopt.startDate', 'ssaraopt.endDate', 'ssaraopt.relativeOrbit'):
+        if column not in df.columns and not (column == 'ssaraopt.relativeOrbit' and allow_missing_orbit):
+            problems.append(Problem(None, column, None, 'missing column'))
+    if problems:
+        return problems
+
+    satellite = df['satellite']
+    known = satellite.isin(list(SATELLITES))
+    _report('satellite', ~known, f"unknown satellite, choose from {list(SATELLITES)}")
+    if workflow is not None:
+        supported = [satellite for satellite in SATELLITES if (satellite, workflow) in profiles.PROFILES]
+        _report('satellite', known & ~satellite.isin(supported), f"no {workflow} template profile, choose from {supported}")
+
+    polygon = df['polygon'].where(df['polygon'].map(type) == str)
+    syntax = polygon.str.fullmatch(WKT_POLYGON).fillna(False).astype(bool)
+    _report('polygon', ~syntax, "must be a WKT polygon 'POLYGON((lon lat,lon lat,...))'")
+    if syntax.any():
+        rows = np.flatnonzero(syntax.to_numpy())
+        coords, offsets = geometry.parse_polygons(polygon.iloc[rows].tolist())
+        counts = np.diff(offsets)
+        too_few = counts < MIN_VERTICES
+        open_ = ~too_few & np.any(coords[offsets[:-1]] != coords[offsets[1:] - 1], axis=1)
+        min_lon, max_lon, min_lat, max_lat = geometry.polygon_extents(coords, offsets)
+        outside = (min_lon < -180) | (max_lon > 180) | (min_lat < -90) | (max_lat > 90)
+        for bad, message in (
+            (too_few, f"needs at least {MIN_VERTICES} vertices"),
+            (open_, 'is not closed, the first and last vertex differ'),
+            (outside, 'has coordinates outside of -180..180 / -90..90'),
+        ):
+            mask = np.zeros(len(df), dtype=bool)
+            mask[rows[bad]] = True
+            _report('polygon', mask, message)
+
+    dates = {}
+    for column, allow_auto in (('ssaraopt.startDate', False), ('ssaraopt.endDate', True)):
+        text = _text(column)
+        auto = text.str.contains('auto', regex=False).fillna(False).astype(bool) if allow_auto else np.zeros(len(df), dtype=bool)
+        parsed = pd.to_datetime(text.where(text.str.fullmatch(r'\d{8}').fillna(False).astype(bool)), format='%Y%m%d', errors='coerce')
+        _report(column, parsed.isna() & ~auto, 'must be a date in the format YYYYMMDD' + (" or 'auto'" if allow_auto else ''))
+        dates[column] = parsed
+    _report('ssaraopt.endDate', dates['ssaraopt.startDate'] > dates['ssaraopt.endDate'], 'is before the start date')
+
+    if 'ssaraopt.relativeOrbit' in df.columns:
+        orbit = pd.to_numeric(df['ssaraopt.relativeOrbit'], errors='coerce')
+        missing = df['ssaraopt.relativeOrbit'].isna() | (_text('ssaraopt.relativeOrbit') == '')
+        limit = satellite.map(ORBITS)
+        bad = (orbit.isna() | (orbit % 1 != 0) | (orbit < 1) | (orbit > limit.fillna(np.inf))) & known
+        if allow_missing_orbit:
+            bad &= ~missing
+        _report('ssaraopt.relativeOrbit', bad, 'must be a relative orbit between 1 and the orbits per cycle of the satellite')
+
+    problems.sort(key=lambda problem: problem.row)
+    return problems
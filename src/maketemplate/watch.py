@@ -0,0 +1,174 @@
+"""
+File watching and sheet diffs for the --watch mode.
+
+Files are watched through inotify on Linux (the directories are watched, so files that
+editors and Excel replace by renaming a temporary file are seen too) and polled
+everywhere else or on request, e.g. on network file systems where inotify sees no
+changes made by other hosts. Either way a file counts as changed only when its size,
+modification time or inode changed.
+"""
+import os
+import sys
+import time
+import select
+
+# Seconds between two looks at the files when polling
+POLL_INTERVAL = 0.5
+
+# Seconds to wait after a change for the writer to finish (saves come in several writes)
+SETTLE_TIME = 0.1
+
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class _Inotify:
+    """
+    inotify instance watching directories, used as a wake-up only.
+    """
+    def __init__(self, fd):
+        self.fd = fd
+
+    @classmethod
+    def create(cls, directories):
+        """
+        Returns the instance, None if inotify is not available.
+        """
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            import ctypes
+            import ctypes.util
+
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        for directory in directories:
+            if libc.inotify_add_watch(fd, os.fsencode(directory), _IN_MASK) < 0:
+                os.close(fd)
+                return None
+        return cls(fd)
+
+    def wait(self, timeout):
+        """
+        Waits up to ``timeout`` seconds for events; returns True if there were any.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watcher:
+    """
+    Waits for changes of a set of files.
+
+    Args:
+        paths: files to watch.
+        polling: poll the files instead of using inotify.
+        interval: seconds between two looks at the files when polling.
+    """
+    def __init__(self, paths, polling=False, interval=POLL_INTERVAL):
+        self.paths = list(dict.fromkeys(os.path.abspath(path) for path in paths))
+        self.interval = interval
+        self._signatures = {path: _signature(path) for path in self.paths}
+        self._inotify = None if polling else _Inotify.create(sorted({os.path.dirname(path) for path in self.paths}))
+        self.backend = 'inotify' if self._inotify is not None else 'polling'
+
+    def changed(self):
+        """
+        Returns the files changed since the last call (or the start), in watch order.
+
+        A file that is missing, e.g. halfway through a save, counts as changed only once
+        it is back.
+        """
+        changed = []
+        for path in self.paths:
+            signature = _signature(path)
+            if signature is not None and signature != self._signatures[path]:
+                self._signatures[path] = signature
+                changed.append(path)
+        return changed
+
+    def wait(self, timeout=None):
+        """
+        Blocks until at least one file changed or ``timeout`` seconds passed.
+
+        Returns:
+            The changed files, empty on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            step = self.interval if deadline is None else max(0.0, min(self.interval, deadline - time.monotonic()))
+            if self._inotify is not None:
+                self._inotify.wait(step)
+            else:
+                time.sleep(step)
+
+            changed = self.changed()
+            if changed:
+                time.sleep(SETTLE_TIME)
+                return changed + [path for path in self.changed() if path not in changed]
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def row_hashes(df):
+    """
+    Returns one 64-bit hash per row of the sheet, over the values of all columns.
+    """
+    import pandas as pd
+
+    # Mixed columns (subswath 2 next to '2 3') are hashed by their text
+    return pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()
+
+
+def diff_rows(old, new):
+    """
+    Compares two versions of a sheet by row content, wherever the rows are.
+
+    Args:
+        old, new: row hashes (see ``row_hashes``) of the previous and the current sheet.
+
+    Returns:
+        (positions of the new or changed rows of ``new``, number of rows of ``old`` that are gone)
+    """
+    import numpy as np
+
+    added = np.flatnonzero(~np.isin(new, old))
+    removed = int(np.count_nonzero(~np.isin(old, new)))
+    return added, removed
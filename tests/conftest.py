@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Make the package importable when the tests are run without PYTHONPATH=src
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+
+@pytest.fixture(autouse=True)
+def sheet_cache_dir(tmp_path_factory, monkeypatch):
+    """
+    Keeps the parsed workbook cache of every test (and its subprocesses) in a temporary
+    directory instead of next to the workbooks in docs/.
+    """
+    path = tmp_path_factory.mktemp("sheet_cache")
+    monkeypatch.setenv("MAKETEMPLATE_CACHE_DIR", str(path))
+    return path
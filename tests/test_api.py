@@ -0,0 +1,55 @@
+import os
+import types
+
+from maketemplate import read_excel
+from maketemplate.api import RenderOptions, location_record, records_from_dataframe, render_templates
+from maketemplate.cli.create_insar_template import create_parser, main
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XLSFILE = os.path.join(PROJECT_ROOT, "docs", "Central_America.xlsx")
+TEMPLATE = os.path.join(PROJECT_ROOT, "docs", "template.txt")
+
+
+def test_render_templates_matches_cli(tmp_path, capsys):
+    main(create_parser(["--xlsfile", XLSFILE, "--save", "--dir", str(tmp_path)]))
+    capsys.readouterr()
+
+    records = records_from_dataframe(read_excel.main(XLSFILE))
+    templates = render_templates(records, TEMPLATE, RenderOptions())
+
+    assert isinstance(templates, types.GeneratorType)
+    rendered = dict(templates)
+    assert len(rendered) == 26
+    for name, text in rendered.items():
+        assert text == (tmp_path / name).read_text()
+
+    # Rendering is free of side effects
+    assert capsys.readouterr().out == ""
+
+
+def test_render_templates_options():
+    record = location_record(54, "SENTINEL-1A,SENTINEL-1B", "D", 31.28, 31.59, 130.59, 131.05,
+                             name="Sakurajima", tropospheric_delay_method="height_correlation")
+    options = RenderOptions(start_date="20160601", end_date="20230926", min_temp_coh=0.6)
+
+    (name, text), = render_templates([record], TEMPLATE, options)
+
+    assert name == "SakurajimaSenD54.template"
+    assert "ssaraopt.startDate                 = 20160601" in text
+    assert "ssaraopt.endDate                   = 20230926" in text
+    assert "mintpy.troposphericDelay.method    = height_correlation" in text
+    assert "miaplpy.timeseries.minTempCoh        = 0.6 " in text
+
+    # Without a template file the built-in config is rendered
+    (_, builtin), = render_templates([record], None, options)
+    assert builtin.rstrip("\n") == text
+
+
+def test_blank_tropospheric_delay_is_auto():
+    df = read_excel.main(XLSFILE).head(3).copy()
+    df["mintpy.troposphericDelay"] = [float("nan"), "", "height_correlation"]
+
+    texts = [text for _, text in render_templates(records_from_dataframe(df), TEMPLATE, RenderOptions())]
+    methods = [line.split("=")[1].split()[0] for text in texts for line in text.splitlines()
+               if line.startswith("mintpy.troposphericDelay.method")]
+    assert methods == ["auto", "auto", "height_correlation"]
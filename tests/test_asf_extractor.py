@@ -0,0 +1,186 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from maketemplate import asf_extractor
+from maketemplate.asf_cache import ResponseCache
+
+GRANULE = "S1B_IW_SLC__1SDV_20190627T092113_20190627T092140_016880_01FC2F_0C69"
+URL = (
+    "https://search.asf.alaska.edu/#/?zoom=9.065&center=130.657,31.033"
+    "&polygon=POLYGON((130.5892%2031.2764,131.0501%2031.2764,131.0501%2031.5882,130.5892%2031.5882,130.5892%2031.2764))"
+    f"&productTypes=SLC&flightDirs=Ascending&resultsLoaded=true&granule={GRANULE}-SLC"
+)
+RESULTS = {
+    "results": [
+        {"gn": "S1A_IW_SLC__1SDV_OTHER", "p": 1, "w": "POLYGON((0 0,1 0,1 1,0 1,0 0))"},
+        {"gn": GRANULE, "p": 54, "w": "POLYGON((129.5 30.5,132.0 30.5,132.0 32.5,129.5 32.5,129.5 30.5))"},
+    ]
+}
+
+
+@pytest.fixture
+def asf_stub():
+    """Local stand-in for the ASF search API, counting the requests it serves."""
+    hits = []
+    state = {"delay": 0.0, "failures": 0, "in_flight": 0, "max_in_flight": 0, "results": RESULTS["results"]}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                hits.append(self.path)
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+                fail = state["failures"] > 0
+                state["failures"] -= fail
+            time.sleep(state["delay"])
+            with lock:
+                state["in_flight"] -= 1
+
+            if fail:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            # Newest first, limited to maxResults granules starting no later than 'end'
+            query = parse_qs(urlparse(self.path).query)
+            results = sorted(state["results"], key=lambda r: r.get("st", ""), reverse=True)
+            if "end" in query:
+                results = [r for r in results if r["st"] <= query["end"][0]]
+            results = results[:int(query["maxResults"][0])]
+
+            body = json.dumps({"results": results}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}/services/search/param"
+    yield api_url, hits, state
+    server.shutdown()
+    server.server_close()
+
+
+def test_main_uses_response_cache(asf_stub, tmp_path):
+    api_url, hits, _ = asf_stub
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+
+    expected = ("54", "SENTINEL-1", "A", 31.2764, 31.5882, 130.5892, 131.0501)
+
+    assert asf_extractor.main(URL, cache=cache, api_url=api_url) == expected
+    assert asf_extractor.main(URL, cache=cache, api_url=api_url) == expected
+    assert len(hits) == 1
+
+    # Offline runs are served from the cache only
+    assert asf_extractor.main(URL, cache=cache, offline=True, api_url="http://127.0.0.1:9") == expected
+
+    asf_extractor.main(URL, cache=cache, refresh=True, api_url=api_url)
+    assert len(hits) == 2
+
+
+def test_offline_cache_miss_raises(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    with pytest.raises(RuntimeError):
+        asf_extractor.main(URL, cache=cache, offline=True)
+
+
+def test_cli_offline_cache_miss_exits(tmp_path, monkeypatch, capsys):
+    from maketemplate import asf_cache
+    from maketemplate.cli.create_insar_template import create_parser, main
+
+    monkeypatch.setattr(asf_cache, "SCRATCHDIR", str(tmp_path))
+    with pytest.raises(SystemExit) as error:
+        main(create_parser(["--url", URL, "--offline", "--dir", str(tmp_path)]))
+    assert error.value.code == 1
+    assert "No cached ASF response" in capsys.readouterr().err
+
+
+def test_response_cache_ttl_and_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl=3600, max_bytes=10)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    cache.get("a")
+    cache.put("c", "12345")
+
+    # "b" is the least recently used entry once the size bound is exceeded
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345"
+    assert cache.get("c") == "12345"
+
+    expired = ResponseCache(cache.path, ttl=-1)
+    assert expired.get("a") is None
+
+
+def test_resolve_urls_concurrently_in_input_order(asf_stub, tmp_path):
+    api_url, hits, state = asf_stub
+    state["delay"] = 0.05
+    state["failures"] = 1
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+
+    # Distinct areas inside the stub footprint, so every URL is a separate query
+    urls, expected = [], []
+    for i in range(16):
+        lat1, lat2 = round(31.0 + i * 0.05, 4), round(31.1 + i * 0.05, 4)
+        polygon = f"POLYGON((130.5%20{lat1},131.0%20{lat1},131.0%20{lat2},130.5%20{lat2},130.5%20{lat1}))"
+        urls.append(URL.replace(URL[URL.index("POLYGON"):URL.index("&productTypes")], polygon))
+        expected.append(("54", "SENTINEL-1", "A", lat1, lat2, 130.5, 131.0))
+
+    results = asf_extractor.resolve_urls(urls, concurrency=8, backoff=0.01, cache=cache, api_url=api_url)
+
+    assert results == expected
+    # 16 queries plus the retried 503
+    assert len(hits) == 17
+    assert state["max_in_flight"] > 1
+
+
+def test_iter_results_pages_until_match(asf_stub, tmp_path):
+    api_url, hits, state = asf_stub
+    footprint = RESULTS["results"][1]["w"]
+    # 1000 granules, two of them share every start time to exercise the page boundaries
+    state["results"] = [
+        {"gn": f"S1A_IW_SLC__1SDV_{i:04d}", "p": i % 175, "st": f"2020-01-01T{i // 2 // 60:02d}:{i // 2 % 60:02d}:00", "w": footprint}
+        for i in range(1000)
+    ]
+    match = state["results"][300]
+    url = URL.replace(GRANULE, match["gn"])
+
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    names = [r["gn"] for r in asf_extractor.iter_results((0, 0, 1, 1), "SENTINEL-1", "SLC", "Ascending", page_size=250, cache=cache, api_url=api_url)]
+    assert sorted(names) == sorted(r["gn"] for r in state["results"])
+
+    hits.clear()
+    fresh_cache = ResponseCache(str(tmp_path / "fresh.sqlite"))
+    assert asf_extractor.main(url, cache=fresh_cache, api_url=api_url)[0] == str(match["p"])
+    # Granule 300 is on the third page (newest first), the fourth page is never requested
+    assert len(hits) == 3
+    assert asf_extractor.main(url, cache=fresh_cache, offline=True, api_url=api_url)[0] == str(match["p"])
+
+    # A granule that does not contain the polygon stops the search on its page too
+    match["w"] = "POLYGON((0 0,1 0,1 1,0 1,0 0))"
+    hits.clear()
+    with pytest.raises(ValueError, match="does not contain the input polygon"):
+        asf_extractor.main(url, cache=ResponseCache(str(tmp_path / "other.sqlite")), api_url=api_url)
+    assert len(hits) == 3
+
+
+def test_iter_json_items_across_chunks():
+    text = json.dumps({"count": 3, "results": [{"gn": "a", "w": "x,y"}, {"gn": "b"}, {"gn": "c"}]})
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+
+    assert [item["gn"] for item in asf_extractor.iter_json_items(chunks)] == ["a", "b", "c"]
+
+    with pytest.raises(ValueError):
+        list(asf_extractor.iter_json_items(chunks[:-3]))
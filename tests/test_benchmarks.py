@@ -0,0 +1,34 @@
+import os
+import sys
+import json
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUITE = os.path.join(PROJECT_ROOT, "benchmarks", "suite.py")
+
+
+def test_benchmark_suite_runs_and_compares(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    cmd = [sys.executable, SUITE, "--filter", "parse_polygon[5]", "--filter", "main_xlsfile[10]",
+           "--repeat", "1", "--min-time", "0", "--work-dir", str(tmp_path / "work"), "--baseline", str(baseline)]
+
+    result = subprocess.run(cmd + ["--save"], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert sorted(json.loads(baseline.read_text())["results"]) == ["main_xlsfile[10]", "parse_polygon[5]"]
+
+    # Every benchmark counts as a regression against a baseline 1000x faster
+    saved = json.loads(baseline.read_text())
+    for numbers in saved["results"].values():
+        numbers["median"] /= 1000
+    baseline.write_text(json.dumps(saved))
+    result = subprocess.run(cmd + ["--compare"], capture_output=True, text=True)
+    assert result.returncode == 1
+    assert "REGRESSION" in result.stdout
+
+
+def test_baseline_covers_suite():
+    with open(os.path.join(PROJECT_ROOT, "benchmarks", "baseline.json")) as f:
+        results = json.load(f)["results"]
+    for name in ("read_excel_uncached[100000]", "parse_polygon[10000]", "generate_config[builtin]",
+                 "main_xlsfile[1000]", "asf_lookup[1000]"):
+        assert name in results
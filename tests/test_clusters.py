@@ -0,0 +1,70 @@
+import os
+import json
+
+import pandas as pd
+
+from maketemplate import clusters
+from maketemplate.cli.create_insar_template import create_parser, main
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XLSFILE = os.path.join(PROJECT_ROOT, "docs", "Central_America.xlsx")
+
+
+def _box(lon1, lat1, lon2, lat2):
+    return f"POLYGON(({lon1} {lat1},{lon2} {lat1},{lon2} {lat2},{lon1} {lat2},{lon1} {lat1}))"
+
+
+def _sheet(rows):
+    base = {"name": "Aso", "direction": "D", "ssaraopt.startDate": 20160701, "ssaraopt.endDate": "auto",
+            "ssaraopt.relativeOrbit": 54, "topsStack.subswath": "1 2", "satellite": "Sen"}
+    return pd.DataFrame([{**base, **row} for row in rows])
+
+
+def test_find_clusters():
+    df = _sheet([
+        {"polygon": _box(130.90, 32.80, 131.20, 33.00)},
+        {"polygon": _box(130.91, 32.80, 131.20, 33.01), "ssaraopt.startDate": 20150101, "topsStack.subswath": "2 3"},
+        {"polygon": _box(130.90, 32.80, 131.20, 33.00), "ssaraopt.relativeOrbit": 163},
+        {"polygon": _box(130.90, 32.80, 131.20, 33.00), "direction": "A"},
+        {"polygon": _box(131.00, 32.80, 131.30, 33.00)},
+        # On a grid line: the boxes share no cell corner but several cells
+        {"polygon": _box(-0.02, -0.02, 0.02, 0.02), "ssaraopt.relativeOrbit": 1},
+        {"polygon": _box(-0.02, -0.02, 0.02, 0.021), "ssaraopt.relativeOrbit": 1},
+        {"polygon": _box(130.90, 32.80, 131.20, 33.00), "ssaraopt.relativeOrbit": None},
+    ])
+    found = clusters.find_clusters(df)
+
+    assert [cluster.rows for cluster in found] == [[0, 1], [5, 6]]
+    assert found[0].bbox == (32.8, 33.01, 130.9, 131.2)
+    assert 0.9 < found[0].overlap < 1
+    # A lower threshold also takes the shifted box (overlap 0.5)
+    assert clusters.find_clusters(df, overlap=0.4)[0].rows == [0, 1, 4]
+
+    merged = clusters.deduplicate(df, found, "merge")
+    assert list(merged.index) == [0, 2, 3, 4, 5, 7]
+    union = clusters.deduplicate(df, found, "union")
+    assert union.loc[0, "polygon"] == _box(130.9, 32.8, 131.2, 33.01)
+    assert union.loc[0, "topsStack.subswath"] == "1 2 3"
+    assert union.loc[0, "ssaraopt.startDate"] == 20160701
+    assert union["ssaraopt.startDate"].dtype == "int64"
+
+    # Numeric subswath columns (CSV/feather) take the union too
+    numeric = df.assign(**{"topsStack.subswath": [1, 2, 1, 1, 1, 1, 1, 1]})
+    assert clusters.deduplicate(numeric, found, "union").loc[0, "topsStack.subswath"] == "1 2"
+    assert clusters.deduplicate(df, found, "flag") is df
+
+
+def test_dedup_across_sheets(tmp_path, capsys):
+    report = tmp_path / "clusters.json"
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    main(create_parser(["--xlsfile", XLSFILE, XLSFILE, "--save", "--dir", str(out_dir),
+                        "--dedup", "merge", "--cluster-report", str(report)]))
+
+    assert "Clusters: 26 cluster(s) of 52 overlapping rows, 26 template(s) fewer (merge)" in capsys.readouterr().out
+    assert len(os.listdir(out_dir)) == 26 + 1  # templates and the manifest
+    entries = json.loads(report.read_text())
+    assert entries[0]["rows"] == [
+        {"sheet": "Central_America.xlsx", "row": 2, "name": "Rincon"},
+        {"sheet": "Central_America.xlsx", "row": 2, "name": "Rincon"},
+    ]
@@ -0,0 +1,90 @@
+import os
+
+from maketemplate.api import RenderOptions, location_record
+from maketemplate.cli.create_insar_template import create_parser, main
+from maketemplate.fanout import FanOut, render_processes
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XLSFILE = os.path.join(PROJECT_ROOT, "docs", "Central_America.xlsx")
+TEMPLATE = os.path.join(PROJECT_ROOT, "docs", "template.txt")
+
+
+def _record(name):
+    return location_record(54, "SENTINEL-1A,SENTINEL-1B", "D", 31.28, 31.59, 130.59, 131.05,
+                           name=name, **{"topsStack.subswath": "1 2 3"})
+
+
+def test_fanout_cross_product_and_names():
+    fan = FanOut(RenderOptions(template=TEMPLATE), periods=[("20170101", "20191231"), ("20200101", "20221231")],
+                 subswaths=["1 2", "2 3"], orbits=[54, 163])
+    units = list(fan.units([_record("Sakurajima"), _record("Aso")]))
+
+    assert len(units) == 2 * 2 * 2 * 2
+    names = [fan.prepare(unit)[0] for unit in units]
+    assert len(set(names)) == len(names)
+    assert names[:3] == [
+        "SakurajimaSenD54_sw12_20170101_20191231.template",
+        "SakurajimaSenD54_sw12_20200101_20221231.template",
+        "SakurajimaSenD54_sw23_20170101_20191231.template",
+    ]
+
+    name, _, _, text = fan.render_unit(units[-1])
+    assert name == "AsoSenD163_sw23_20200101_20221231.template"
+    assert "ssaraopt.relativeOrbit             = 163" in text
+    assert "ssaraopt.startDate                 = 20200101" in text
+    assert "topsStack.subswath                 = 2 3" in text
+
+    # A single period/subswath set keeps the plain template name
+    plain = FanOut(RenderOptions(template=TEMPLATE))
+    assert [plain.prepare(unit)[0] for unit in plain.units([_record("Aso")])] == ["AsoSenD54.template"]
+
+
+def test_render_processes_matches_sequential():
+    fan = FanOut(RenderOptions(template=TEMPLATE), periods=[("20170101", "20191231"), ("20200101", "auto")])
+    records = [_record(f"Site{i}") for i in range(20)]
+
+    expected = [fan.render_unit(unit) for unit in fan.units(records)]
+    assert list(render_processes(fan, fan.units(records), processes=2, chunk_size=3)) == expected
+
+
+def test_cli_fanout_with_processes(tmp_path, capsys):
+    sequential, parallel = tmp_path / "sequential", tmp_path / "parallel"
+    sequential.mkdir()
+    parallel.mkdir()
+    args = ["--xlsfile", XLSFILE, "--save", "--period", "20170101:20191231", "20200101:20221231",
+            "--subswath", "1 2", "2 3"]
+
+    main(create_parser(args + ["--dir", str(sequential)]))
+    main(create_parser(args + ["--dir", str(parallel), "--processes", "2", "--chunk-size", "5"]))
+    assert "Templates: 104 created, 0 updated, 0 unchanged" in capsys.readouterr().out
+
+    names = sorted(os.listdir(sequential))
+    assert names == sorted(os.listdir(parallel))
+    assert len([name for name in names if name.endswith(".template")]) == 26 * 2 * 2
+    assert "SangaySenA18_sw23_20200101_20221231.template" in names
+    for name in names:
+        if name.endswith(".template"):
+            assert (sequential / name).read_text() == (parallel / name).read_text()
+
+
+def test_incremental_processes_render_only_changed_units(tmp_path, capsys, monkeypatch):
+    from maketemplate.cli import create_insar_template as cli
+
+    submitted = []
+
+    def counting(fanout, units, *args):
+        units = list(units)
+        submitted.append(len(units))
+        return render_processes(fanout, units, *args)
+
+    monkeypatch.setattr(cli, "render_processes", counting)
+    args = ["--xlsfile", XLSFILE, "--save", "--incremental", "--processes", "2", "--dir", str(tmp_path)]
+
+    main(create_parser(args))
+    main(create_parser(args))
+    main(create_parser(args + ["--minTempCoh", "0.5"]))
+
+    out = capsys.readouterr().out
+    assert "Templates: 0 created, 0 updated, 26 unchanged" in out
+    assert "Templates: 0 created, 26 updated, 0 unchanged" in out
+    assert submitted == [26, 0, 26]
@@ -0,0 +1,68 @@
+import numpy as np
+
+from maketemplate.footprint_index import FootprintIndex, fill_relative_orbits
+
+
+def _box(min_lon, max_lon, min_lat, max_lat):
+    return f"POLYGON(({min_lon} {min_lat},{max_lon} {min_lat},{max_lon} {max_lat},{min_lon} {max_lat},{min_lon} {min_lat}))"
+
+
+def _granules(count=500, seed=1):
+    rng = np.random.default_rng(seed)
+    results = []
+    for i in range(count):
+        lon, lat = rng.uniform(-100, -60), rng.uniform(-10, 20)
+        results.append({
+            "gn": f"S1A_{i:04d}",
+            "p": int(rng.integers(1, 176)),
+            "fd": rng.choice(["ASCENDING", "DESCENDING"]),
+            "w": _box(round(lon, 4), round(lon + 2.5, 4), round(lat, 4), round(lat + 2.0, 4)),
+        })
+    return results
+
+
+def test_query_matches_linear_scan(tmp_path):
+    results = _granules()
+    index = FootprintIndex.from_results(results)
+
+    rng = np.random.default_rng(2)
+    polygons = []
+    for _ in range(200):
+        lon, lat = rng.uniform(-100, -60), rng.uniform(-10, 20)
+        polygons.append(_box(round(lon, 4), round(lon + 0.1, 4), round(lat, 4), round(lat + 0.1, 4)))
+
+    def contains(result, polygon):
+        coords = np.array([p.split() for p in polygon[9:-2].split(",")], dtype=float)
+        granule = np.array([p.split() for p in result["w"][9:-2].split(",")], dtype=float)
+        return (granule[:, 0].min() <= coords[:, 0].min() and granule[:, 0].max() >= coords[:, 0].max()
+                and granule[:, 1].min() <= coords[:, 1].min() and granule[:, 1].max() >= coords[:, 1].max())
+
+    # Persisted indexes answer the same
+    index.save(str(tmp_path / "index.npz"))
+    loaded = FootprintIndex.load(str(tmp_path / "index.npz"))
+
+    for polygon, indices in zip(polygons, loaded.query_polygons(polygons)):
+        expected = sorted(r["gn"] for r in results if contains(r, polygon))
+        assert sorted(loaded.names[indices]) == expected
+
+
+def test_fill_relative_orbits():
+    results = [
+        {"gn": "a", "p": 54, "fd": "ASCENDING", "w": _box(130, 133, 30, 33)},
+        {"gn": "b", "p": 54, "fd": "ASCENDING", "w": _box(130.1, 133, 30, 33)},
+        {"gn": "c", "p": 163, "fd": "ASCENDING", "w": _box(129, 132, 30, 33)},
+        {"gn": "d", "p": 61, "fd": "DESCENDING", "w": _box(129, 132, 30, 33)},
+    ]
+    index = FootprintIndex.from_results(results)
+    polygon = _box(130.5892, 131.0501, 31.2764, 31.5882)
+
+    assert index.relative_orbits([polygon]) == [[(54, "A", 2), (61, "D", 1), (163, "A", 1)]]
+
+    records = [
+        {"polygon": polygon, "direction": "D", "relative_orbit": float("nan")},
+        {"polygon": polygon, "direction": "A", "relative_orbit": ""},
+        {"polygon": polygon, "direction": "A", "relative_orbit": 163},
+        {"polygon": _box(0, 1, 0, 1), "direction": "A", "relative_orbit": None},
+    ]
+    assert fill_relative_orbits(records, index) == 2
+    assert [record["relative_orbit"] for record in records] == [61, 54, 163, None]
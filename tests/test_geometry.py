@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from maketemplate import geometry
+from maketemplate.cli.create_insar_template import (
+    parse_polygon,
+    miaplpy_check_longitude,
+    topstack_check_longitude,
+    generate_lat_lon_steps,
+)
+
+
+@pytest.fixture
+def polygons():
+    rng = np.random.default_rng(42)
+    result = []
+    for _ in range(2000):
+        nvertices = rng.integers(3, 40)
+        lon = np.round(rng.uniform(-180, 180) + rng.uniform(-3, 3, nvertices), 4)
+        lat = np.round(rng.uniform(-80, 80) + rng.uniform(-1, 1, nvertices), 4)
+        points = ','.join(f"{x} {y}" for x, y in zip(lon, lat))
+        result.append(f"POLYGON(({points},{lon[0]} {lat[0]}))")
+    return result
+
+
+def test_polygon_bounds_match_parse_polygon(polygons):
+    lat1, lat2, lon1, lon2 = geometry.polygon_bounds(polygons)
+    expected = [parse_polygon(polygon) for polygon in polygons]
+
+    assert list(zip(lat1.tolist(), lat2.tolist(), lon1.tolist(), lon2.tolist())) == expected
+
+
+def test_longitude_checks_and_steps_match_scalar(polygons):
+    lat1, lat2, lon1, lon2 = geometry.polygon_bounds(polygons)
+
+    mia = geometry.miaplpy_check_longitudes(lon1, lon2)
+    top = geometry.topstack_check_longitudes(lon1, lon2)
+    steps = geometry.lat_lon_steps(15, lat1, lat2)
+
+    for i in range(len(polygons)):
+        assert (mia[0][i], mia[1][i]) == miaplpy_check_longitude(lon1[i].item(), lon2[i].item())
+        assert (top[0][i], top[1][i]) == topstack_check_longitude(lon1[i].item(), lon2[i].item())
+        assert (steps[0][i], steps[1][i]) == generate_lat_lon_steps(15, lat1[i].item(), lat2[i].item())
+
+
+def test_malformed_polygon_raises():
+    with pytest.raises(ValueError):
+        geometry.parse_polygons(["POLYGON((1 2,3))"])
@@ -0,0 +1,58 @@
+import os
+import json
+import pstats
+import threading
+
+from maketemplate import instrument
+from maketemplate.cli.create_insar_template import create_parser, main
+
+XLSFILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docs", "Central_America.xlsx")
+
+
+def test_off_by_default():
+    assert instrument.stage("a") is instrument.stage("b")
+    with instrument.stage("a"):
+        instrument.count("a")
+    assert instrument._recorder is None
+
+
+def test_recording_from_threads():
+    def work():
+        for _ in range(100):
+            with instrument.stage("work"):
+                instrument.count("items", 2)
+
+    with instrument.recording() as recorder:
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    result = recorder.as_dict()
+    assert result["stages"]["work"]["calls"] == 400
+    assert result["counters"] == {"items": 800}
+    assert instrument._recorder is None
+
+
+def test_cli_timings_and_profile(tmp_path, capsys):
+    timings = tmp_path / "timings.json"
+    folded = tmp_path / "run.folded"
+    main(create_parser(["--xlsfile", XLSFILE, "--save", "--dir", str(tmp_path), "--jobs", "2",
+                        "--timings", str(timings), "--profile", str(folded)]))
+    assert "Timings ->" in capsys.readouterr().out
+
+    result = json.loads(timings.read_text())
+    assert {"read_excel", "polygons", "render", "write"} <= set(result["stages"])
+    assert result["stages"]["render"]["calls"] == 26
+    assert result["counters"]["templates.written"] == 26
+    assert result["counters"]["read_excel.rows"] == 26
+
+    for line in folded.read_text().splitlines():
+        stack, samples = line.rsplit(" ", 1)
+        assert stack and int(samples) > 0
+
+    dump = tmp_path / "run.prof"
+    main(create_parser(["--xlsfile", XLSFILE, "--save", "--dir", str(tmp_path), "--profile", str(dump)]))
+    functions = {name for _, _, name in pstats.Stats(str(dump)).stats}
+    assert "render_values" in functions
@@ -71,4 +71,97 @@ def test_create_insar_template(project_root, env_with_src, tmp_path):
 
     print(f"Output files found: {output_files}")
 
-    assert len(output_files) > 0, "No matching output files were created."
\ No newline at end of file
+    assert len(output_files) > 0, "No matching output files were created."
+
+def test_create_insar_template_jobs(project_root, env_with_src, tmp_path):
+    xlsfile_path = os.path.join(project_root, "docs", "Central_America.xlsx")
+
+    cmd = [
+        "python",
+        "-m",
+        "maketemplate.cli.create_insar_template",
+        "--xlsfile",
+        xlsfile_path,
+        "--save",
+        "--jobs",
+        "4",
+        "--dir",
+        str(tmp_path),
+    ]
+
+    result = subprocess.run(cmd, capture_output=True, text=True, env=env_with_src)
+
+    assert result.returncode == 0, result.stderr
+    # One template per spreadsheet row, each written exactly once
+    assert result.stdout.count("Template saved in") == 26
+    assert len(glob.glob(str(tmp_path / "*.template"))) == 26
+    assert "Timings" in result.stdout
+
+
+def test_create_insar_template_incremental(project_root, env_with_src, tmp_path):
+    xlsfile_path = os.path.join(project_root, "docs", "Central_America.xlsx")
+    cmd = [
+        "python",
+        "-m",
+        "maketemplate.cli.create_insar_template",
+        "--xlsfile",
+        xlsfile_path,
+        "--save",
+        "--incremental",
+        "--dir",
+        str(tmp_path),
+    ]
+
+    def run(*extra):
+        result = subprocess.run(cmd + list(extra), capture_output=True, text=True, env=env_with_src)
+        assert result.returncode == 0, result.stderr
+        return result.stdout
+
+    assert "Templates: 26 created, 0 updated, 0 unchanged" in run()
+    mtimes = {path: os.stat(path).st_mtime_ns for path in glob.glob(str(tmp_path / "*.template"))}
+
+    assert "Templates: 0 created, 0 updated, 26 unchanged" in run()
+    assert mtimes == {path: os.stat(path).st_mtime_ns for path in mtimes}
+
+    # Outputs edited by hand are rewritten
+    edited = sorted(mtimes)[0]
+    with open(edited, "a") as f:
+        f.write("# edited\n")
+    assert "Templates: 0 created, 1 updated, 25 unchanged" in run()
+
+    # Changed CLI options invalidate every template
+    assert "Templates: 0 created, 26 updated, 0 unchanged" in run("--minTempCoh", "0.5")
+
+
+def test_polygon_run_does_not_import_heavy_modules(env_with_src, tmp_path):
+    code = (
+        "import sys, runpy; "
+        "sys.argv = ['create_insar_template.py', '--polygon', "
+        "'POLYGON((130.5892 31.2764,131.0501 31.2764,131.0501 31.5882,130.5892 31.5882,130.5892 31.2764))', "
+        f"'--relativeOrbit', '54', '--save', '--dir', {str(tmp_path)!r}]; "
+        "runpy.run_module('maketemplate.cli.create_insar_template', run_name='__main__'); "
+        "print(sorted(m for m in ('numpy', 'pandas', 'openpyxl', 'requests') if m in sys.modules))"
+    )
+    result = subprocess.run(["python", "-c", code], capture_output=True, text=True, env=env_with_src)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == "[]"
+    assert os.path.exists(tmp_path / "UnknownSenA54.template")
+
+
+def test_write_atomic_permissions(tmp_path):
+    from maketemplate.manifest import write_atomic
+
+    umask = os.umask(0o027)
+    try:
+        path = tmp_path / "a.template"
+        write_atomic(str(path), "x")
+        assert os.stat(path).st_mode & 0o777 == 0o640
+
+        # A replaced file keeps its mode
+        os.chmod(path, 0o600)
+        write_atomic(str(path), "y")
+        assert os.stat(path).st_mode & 0o777 == 0o600 and path.read_text() == "y"
+        assert os.listdir(tmp_path) == ["a.template"]
+    finally:
+        os.umask(umask)
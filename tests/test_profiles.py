@@ -0,0 +1,106 @@
+import os
+
+import pandas as pd
+import pytest
+
+from maketemplate import profiles
+from maketemplate.api import RenderOptions, location_record, render_record, render_templates
+from maketemplate.cli.create_insar_template import create_parser, main
+from maketemplate.fanout import FanOut
+from maketemplate.validate import validate_sheet
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE = os.path.join(PROJECT_ROOT, "docs", "template.txt")
+POLYGON = "POLYGON((130.5892 31.2764,131.0501 31.2764,131.0501 31.5882,130.5892 31.5882,130.5892 31.2764))"
+
+
+def _record(name, satellite):
+    return location_record(54, satellite, "D", 31.28, 31.59, 130.59, 131.05, name=name)
+
+
+def test_find_profiles():
+    assert profiles.find("Sen") == profiles.Profile("Sen", "topsStack", None)
+    assert profiles.find("RADARSAT2").workflow == "stripmap"
+    assert profiles.find("SENTINEL-1", "miaplpy").template == "miaplpy.txt"
+    with pytest.raises(ValueError, match="No topsStack template for TerraSAR"):
+        profiles.find("TerraSAR", "topsStack")
+    # Sentinel-1 topsStack renders with the run template
+    assert profiles.template_path(profiles.find("Sen"), TEMPLATE) == TEMPLATE
+
+
+def test_mixed_records_are_grouped_by_profile():
+    fan = FanOut(RenderOptions(template=TEMPLATE))
+    records = [_record("A", "SENTINEL-1A,SENTINEL-1B"), _record("B", "RADARSAT2"),
+               _record("C", "SENTINEL-1A,SENTINEL-1B"), _record("D", "TerraSAR-X")]
+    units = list(fan.units(records))
+
+    assert [unit.record["name"] for unit in units] == ["A", "C", "B", "D"]
+    texts = {unit.record["name"]: fan.render_unit(unit)[3] for unit in units}
+    assert "topsStack.subswath" in texts["A"] and "stripmapStack" not in texts["A"]
+    assert "stripmapStack.boundingBox          = 31.28 31.59 130.59 131.05" in texts["B"]
+    assert "ssaraopt.platform                  = TerraSAR-X" in texts["D"]
+    # One compiled template per profile, Radarsat and TerraSAR share the stripmap file
+    assert len(fan._templates) == 3
+    assert len({id(template) for template in fan._templates.values()}) == 2
+
+
+def test_workflow_must_have_a_profile_for_every_row(tmp_path):
+    df = pd.DataFrame({
+        "satellite": ["Sen", "Radarsat"], "polygon": [POLYGON] * 2, "ssaraopt.startDate": [20160701] * 2,
+        "ssaraopt.endDate": ["auto"] * 2, "ssaraopt.relativeOrbit": [54, 12],
+    })
+    assert validate_sheet(df) == []
+    assert [problem.row for problem in validate_sheet(df, workflow="topsStack")] == [3]
+    assert validate_sheet(df, workflow="miaplpy") == []
+
+    with pytest.raises(SystemExit):
+        main(create_parser(["--polygon", POLYGON, "--relativeOrbit", "54", "--satellite", "TerraSAR",
+                            "--workflow", "topsStack", "--dir", str(tmp_path), "--save"]))
+    assert os.listdir(tmp_path) == []
+
+
+def test_polygon_run_with_workflow(tmp_path):
+    main(create_parser(["--polygon", POLYGON, "--relativeOrbit", "54", "--satellite", "Radarsat",
+                        "--workflow", "miaplpy", "--dir", str(tmp_path), "--save"]))
+    text = (tmp_path / "UnknownA54.template").read_text()
+    assert "ssaraopt.platform                  = RADARSAT2" in text
+    assert "stripmapStack" in text and "miaplpy.load.processor" in text
+    assert "mintpy.troposphericDelay.method" not in text
+
+
+def test_library_renders_with_the_record_profile(monkeypatch):
+    records = [_record("A", "SENTINEL-1A,SENTINEL-1B"), _record("B", "RADARSAT2")]
+    (_, sentinel), (_, radarsat) = render_templates(records, None, RenderOptions(template=TEMPLATE))
+    assert "topsStack.subswath" in sentinel and "stripmapStack" not in sentinel
+    assert "stripmapStack.boundingBox          = 31.28 31.59 130.59 131.05" in radarsat
+    assert render_record(records[1], RenderOptions(template=TEMPLATE)) == radarsat
+
+    # A missing profile file is an error, not a silent Sentinel-1 template
+    monkeypatch.setitem(profiles.PROFILES, ("Radarsat", "stripmap"),
+                        profiles.Profile("Radarsat", "stripmap", "missing.txt"))
+    with pytest.raises(FileNotFoundError, match="Radarsat stripmap profile"):
+        render_record(records[1], RenderOptions(template=TEMPLATE))
+
+
+def test_explicit_template_renders_every_profile(tmp_path):
+    template = tmp_path / "custom.txt"
+    template.write_text("ssaraopt.platform = ***satellite***\nssaraopt.relativeOrbit = ***relative_orbit***\n")
+    for satellite in ("Sen", "Radarsat"):
+        main(create_parser(["--polygon", POLYGON, "--relativeOrbit", "54", "--satellite", satellite,
+                            "--template", str(template), "--dir", str(tmp_path), "--save"]))
+
+    assert (tmp_path / "UnknownA54.template").read_text() == "ssaraopt.platform = RADARSAT2\nssaraopt.relativeOrbit = 54\n"
+    assert (tmp_path / "UnknownSenA54.template").read_text().startswith("ssaraopt.platform = SENTINEL-1")
+
+
+def test_profile_templates_are_validated(tmp_path, monkeypatch, capsys):
+    broken = tmp_path / "stripmap.txt"
+    broken.write_text("stripmapStack.unknown = ***unknown***\n")
+    monkeypatch.setitem(profiles.PROFILES, ("Radarsat", "stripmap"),
+                        profiles.Profile("Radarsat", "stripmap", str(broken)))
+
+    with pytest.raises(SystemExit):
+        main(create_parser(["--polygon", POLYGON, "--relativeOrbit", "54", "--satellite", "Radarsat",
+                            "--dir", str(tmp_path), "--save"]))
+    assert "***unknown***" in capsys.readouterr().err
+    assert not os.path.exists(tmp_path / "UnknownA54.template")
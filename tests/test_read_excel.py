@@ -0,0 +1,85 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from maketemplate import read_excel
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    source = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docs", "Central_America.xlsx")
+    path = tmp_path / "Central_America.xlsx"
+    shutil.copy(source, path)
+    return str(path)
+
+
+def test_workbook_cache(workbook, sheet_cache_dir, monkeypatch):
+    df = read_excel.main(workbook, columns=read_excel.SHEET_COLUMNS)
+    cached = os.listdir(sheet_cache_dir)
+    assert len(cached) == 1 and cached[0].endswith(".feather")
+
+    # Unchanged workbooks are not parsed again
+    def fail(*args, **kwargs):
+        raise AssertionError("workbook parsed again")
+
+    monkeypatch.setattr(pd, "read_excel", fail)
+    pd.testing.assert_frame_equal(read_excel.main(workbook, columns=read_excel.SHEET_COLUMNS), df)
+    assert list(read_excel.main(workbook, columns=("name", "polygon", "unknown")).columns) == ["name", "polygon"]
+
+
+def test_workbook_cache_keeps_mixed_values(workbook, monkeypatch):
+    import datetime
+
+    parsed = pd.DataFrame({
+        "name": ["Aso", "Sangay", "Fuego"],
+        "ssaraopt.startDate": [20160701, 20170101, 20180101],
+        "ssaraopt.endDate": ["auto", 20200101, float("nan")],
+        "topsStack.subswath": ["1 2", 3, None],
+        "when": [datetime.datetime(2020, 1, 2), "later", True],
+        "ssaraopt.relativeOrbit": [54.0, float("nan"), 18.0],
+    })
+    monkeypatch.setattr(pd, "read_excel", lambda path: parsed)
+    read_excel.main(workbook)
+
+    monkeypatch.setattr(pd, "read_excel", None)
+    cached = read_excel.main(workbook)
+    pd.testing.assert_frame_equal(cached, parsed)
+    assert [type(value) for value in cached["topsStack.subswath"]] == [str, int, type(None)]
+
+
+def test_csv_and_arrow_inputs(workbook, tmp_path):
+    df = read_excel.main(workbook)
+
+    df.to_csv(tmp_path / "sheet.csv", index=False)
+    csv = read_excel.main(str(tmp_path / "sheet.csv"), columns=("name", "polygon"))
+    assert list(csv.columns) == ["name", "polygon"]
+    assert csv["polygon"].tolist() == df["polygon"].tolist()
+
+    pytest.importorskip("pyarrow")
+    df = df.astype({"topsStack.subswath": str})
+    df.to_parquet(tmp_path / "sheet.parquet")
+    df.to_feather(tmp_path / "sheet.feather")
+    for name in ("sheet.parquet", "sheet.feather"):
+        loaded = read_excel.main(str(tmp_path / name), columns=("name", "polygon", "unknown"))
+        pd.testing.assert_frame_equal(loaded, df[["name", "polygon"]])
+
+
+def test_workbooks_of_the_same_name_keep_their_caches(workbook, tmp_path, sheet_cache_dir, monkeypatch):
+    other = tmp_path / "other" / "Central_America.xlsx"
+    other.parent.mkdir()
+    shutil.copy(workbook, other)
+    with open(other, "ab") as f:
+        f.write(b"\0")  # different content, same parse
+
+    df = read_excel.main(workbook)
+    read_excel.main(str(other))
+    assert len(os.listdir(sheet_cache_dir)) == 2
+
+    def fail(*args, **kwargs):
+        raise AssertionError("workbook parsed again")
+
+    monkeypatch.setattr(pd, "read_excel", fail)
+    pd.testing.assert_frame_equal(read_excel.main(workbook), df)
+    read_excel.main(str(other))
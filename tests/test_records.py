@@ -0,0 +1,85 @@
+import types
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from maketemplate import api
+from maketemplate.records import Record
+
+
+def _sheet(rows):
+    polygon = "POLYGON((-78.3894 -2.0414,-78.2989 -2.0414,-78.2989 -1.979,-78.3894 -1.979,-78.3894 -2.0414))"
+    return pd.DataFrame({
+        "name": [f"Site{i}" for i in range(rows)],
+        "direction": ["A", "D"] * (rows // 2),
+        "ssaraopt.startDate": [20160701] * rows,
+        "ssaraopt.endDate": ["auto"] * rows,
+        "ssaraopt.relativeOrbit": list(range(rows)),
+        "topsStack.subswath": ["1 2"] * rows,
+        "mintpy.troposphericDelay": ["auto"] * rows,
+        "polygon": [polygon] * rows,
+        "satellite": ["Sen"] * rows,
+    })
+
+
+def test_record_keeps_dict_interface():
+    record = Record.from_mapping({"name": "Sangay", "topsStack.subswath": "2 3", "miaplpy.longitude1": -78.4,
+                                  "relative_orbit": None, "ssaraopt.startDate": 20160701})
+
+    assert record["topsStack.subswath"] == record.subswath == "2 3"
+    assert record.get("miaplpy.longitude1") == -78.4
+    # Unset fields behave like missing dict keys, fields set to None keep None
+    assert "lat_step" not in record and record.get("lat_step", 15) == 15
+    assert "relative_orbit" in record and record.get("relative_orbit", "") is None
+    # Columns no template uses are not kept
+    assert record.get("ssaraopt.startDate") is None
+    with pytest.raises(KeyError):
+        record["ssaraopt.startDate"]
+    with pytest.raises(AttributeError):
+        record.unknown = 1
+
+    record["relative_orbit"] = 142
+    assert record.relative_orbit == 142
+
+
+def test_iter_records_is_lazy_and_chunked():
+    df = _sheet(10)
+    records = api.iter_records(df, latitude_step=15, chunk_size=3)
+
+    assert isinstance(records, types.GeneratorType)
+    assert list(records) == api.records_from_dataframe(df, latitude_step=15)
+
+    first = api.records_from_dataframe(df)[0]
+    assert first.name == "Site0" and first.subswath == "1 2" and first.relative_orbit == 0
+    assert (first.latitude1, first.latitude2, first.longitude1, first.longitude2) == (-2.04, -1.98, -78.39, -78.3)
+    assert (first.mia_lon1, first.mia_lon2) == api.miaplpy_check_longitude(-78.39, -78.3)
+    assert (first.top_lon1, first.top_lon2) == api.topstack_check_longitude(-78.39, -78.3)
+
+
+def test_iter_records_memory_does_not_grow_with_sheet():
+    def peak(rows):
+        df = _sheet(rows)
+        tracemalloc.start()
+        for _ in api.iter_records(df, chunk_size=500):
+            pass
+        result = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result
+
+    assert peak(10000) < 1.5 * peak(1000)
+
+
+def test_missing_orbit_keeps_the_other_orbits_int(tmp_path):
+    df = _sheet(4)
+    df.loc[1, "ssaraopt.relativeOrbit"] = None
+    df.to_csv(tmp_path / "sheet.csv", index=False)
+    df = pd.read_csv(tmp_path / "sheet.csv")
+    assert df["ssaraopt.relativeOrbit"].dtype == "float64"
+
+    records = api.records_from_dataframe(df)
+    assert [record.relative_orbit for record in records[::2]] == [0, 2]
+    assert all(type(record.relative_orbit) is int for record in records[::2])
+    assert pd.isna(records[1].relative_orbit)
+    assert api.template_name(records[2]) == "Site2SenA2.template"
+    assert "ssaraopt.relativeOrbit             = 2\n" in api.render_record(records[2])
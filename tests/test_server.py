@@ -0,0 +1,97 @@
+import os
+import threading
+
+import pytest
+
+from maketemplate.cli.create_insar_template import create_parser, main
+from maketemplate.server import create_server, request_template
+
+POLYGON = "POLYGON((130.5892 31.2764,131.0501 31.2764,131.0501 31.5882,130.5892 31.5882,130.5892 31.2764))"
+XLSFILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docs", "Central_America.xlsx")
+
+
+@pytest.fixture
+def server():
+    template = os.path.join(os.path.dirname(XLSFILE), "template.txt")
+    server = create_server("127.0.0.1:0", create_parser(["--xlsfile", XLSFILE, "--serve-template", f"default={template}"]))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_server_matches_cli(server, tmp_path):
+    main(create_parser(["--polygon", POLYGON, "--relativeOrbit", "54", "--subswath", "1 2", "--save", "--dir", str(tmp_path)]))
+    main(create_parser(["--xlsfile", XLSFILE, "--save", "--dir", str(tmp_path)]))
+
+    name, text = request_template(server, {"polygon": POLYGON, "relative_orbit": 54, "subswath": "1 2"})
+    assert name == "UnknownSenA54.template"
+    assert text == (tmp_path / name).read_text()
+
+    for request in ({"sheet": "Central_America.xlsx", "row": 3}, {"sheet": 0, "name": "Sangay", "direction": "A", "template": "default"}):
+        name, text = request_template(server, request)
+        assert name == "SangaySenA18.template"
+        assert text == (tmp_path / name).read_text()
+
+
+def test_server_rejects_bad_requests(server):
+    from urllib.error import HTTPError
+
+    with pytest.raises(HTTPError) as error:
+        request_template(server, {"sheet": "Central_America.xlsx", "name": "Sangay"})
+    assert error.value.code == 400
+
+    # Bodies that are not JSON objects
+    for request in ([], "polygon", 1):
+        with pytest.raises(HTTPError) as error:
+            request_template(server, request)
+        assert error.value.code == 400
+        assert b"must be a JSON object" in error.value.read()
+
+    # Fields of the wrong type or out of range
+    for request in ({"polygon": POLYGON, "relative_orbit": 54, "lat_step": "x"}, {"sheet": 0, "row": [1]},
+                    {"sheet": 0, "row": -1}, {"sheet": 0, "row": 26}, {"polygon": POLYGON, "relative_orbit": True},
+                    {"polygon": POLYGON, "relative_orbit": 54, "direction": "X"}, {"polygon": POLYGON}):
+        with pytest.raises(HTTPError) as error:
+            request_template(server, request)
+        assert error.value.code == 400, request
+
+
+@pytest.mark.parametrize("request_", [
+    {"polygon": POLYGON, "relative_orbit": 54, "template": "/etc/hostname"},
+    {"polygon": POLYGON, "relative_orbit": 54, "template": 1},
+    {"sheet": XLSFILE, "row": 3},
+    {"sheet": "../docs/Central_America.xlsx", "row": 3},
+])
+def test_server_rejects_files_not_named_at_startup(server, request_):
+    from urllib.error import HTTPError
+
+    with pytest.raises(HTTPError) as error:
+        request_template(server, request_)
+    assert error.value.code == 400
+    assert b"LookupError" in error.value.read()
+
+
+def test_unix_socket_replaces_only_stale_sockets(tmp_path):
+    import socket
+
+    path = tmp_path / "file"
+    path.write_text("keep")
+    with pytest.raises(ValueError, match="not a socket"):
+        create_server(f"unix:{path}", create_parser([]))
+    assert path.read_text() == "keep"
+
+    stale = tmp_path / "stale.sock"
+    sock = socket.socket(socket.AF_UNIX)
+    sock.bind(str(stale))
+    sock.close()
+    server = create_server(f"unix:{stale}", create_parser([]))
+    server.server_close()
+
+
+def test_server_listens_on_loopback_only():
+    with pytest.raises(ValueError):
+        create_server("0.0.0.0:0", create_parser([]))
+    server = create_server("0.0.0.0:0", create_parser([]), allow_remote=True)
+    server.server_close()
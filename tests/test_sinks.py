@@ -0,0 +1,77 @@
+import os
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+from maketemplate.cli.create_insar_template import create_parser, main
+from maketemplate.sinks import open_sink
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XLSFILE = os.path.join(PROJECT_ROOT, "docs", "Central_America.xlsx")
+
+
+def _archive_contents(out_format, path):
+    if out_format == "tar":
+        with tarfile.open(path) as tar:
+            return {member.name: tar.extractfile(member).read().decode("utf8") for member in tar}
+    if out_format == "zip":
+        with zipfile.ZipFile(path) as archive:
+            return {name: archive.read(name).decode("utf8") for name in archive.namelist()}
+    with open(path) as f:
+        return {entry["name"]: entry["template"] for entry in map(json.loads, f)}
+
+
+@pytest.mark.parametrize("out_format", ["tar", "zip", "jsonl"])
+def test_archive_matches_dir_output(tmp_path, capsys, out_format):
+    dir_out = tmp_path / "dir"
+    dir_out.mkdir()
+    main(create_parser(["--xlsfile", XLSFILE, "--save", "--dir", str(dir_out)]))
+
+    archive = tmp_path / f"all.{out_format}"
+    main(create_parser(["--xlsfile", XLSFILE, "--out-format", out_format, "--archive", str(archive), "--jobs", "4"]))
+    assert f"Templates: 26 written to {archive}" in capsys.readouterr().out
+
+    contents = _archive_contents(out_format, archive)
+    assert len(contents) == 26
+    for name, text in contents.items():
+        assert text == (dir_out / name).read_text()
+    # Only the archive is written, no temporary files are left behind
+    assert sorted(os.listdir(tmp_path)) == sorted(["dir", archive.name])
+
+
+def test_failed_run_leaves_no_archive(tmp_path):
+    archive = tmp_path / "templates.tar"
+    with pytest.raises(RuntimeError):
+        with open_sink("tar", str(tmp_path)) as sink:
+            sink.add("a.template", "x")
+            raise RuntimeError
+    assert os.listdir(tmp_path) == []
+    assert not archive.exists()
+
+
+def test_archive_permissions_and_failed_finish(tmp_path, monkeypatch):
+    umask = os.umask(0o027)
+    try:
+        with open_sink("zip", str(tmp_path)) as sink:
+            sink.add("a.template", "x")
+        archive = tmp_path / "templates.zip"
+        assert os.stat(archive).st_mode & 0o777 == 0o640
+
+        # A replaced archive keeps its mode
+        os.chmod(archive, 0o600)
+        with open_sink("zip", str(tmp_path)) as sink:
+            sink.add("a.template", "y")
+        assert os.stat(archive).st_mode & 0o777 == 0o600
+    finally:
+        os.umask(umask)
+
+    def disk_full():
+        raise OSError("disk full")
+
+    sink = open_sink("tar", str(tmp_path))
+    monkeypatch.setattr(sink, "_finish", disk_full)
+    with pytest.raises(OSError):
+        sink.close()
+    assert sorted(os.listdir(tmp_path)) == ["templates.zip"]
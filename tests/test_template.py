@@ -0,0 +1,47 @@
+import os
+import re
+import builtins
+
+from maketemplate.template import CompiledTemplate, load_template
+
+
+def test_render_matches_regex_substitution():
+    text = "a = ***lat1***:***lat2***\nb = ***missing*** ***lat1***\n"
+    mapping = {'lat1': 1.5, 'lat2': -2, 'unused': 'x'}
+
+    expected = re.sub(
+        r'\*\*\*(\w+)\*\*\*',
+        lambda m: str(mapping[m.group(1)]) if mapping.get(m.group(1)) is not None else m.group(0),
+        text,
+    )
+
+    template = CompiledTemplate(text)
+    assert template.render(mapping) == expected
+    assert template.markers == ('lat1', 'lat2', 'missing')
+    assert template.missing_markers(mapping) == ['missing']
+
+
+def test_load_template_reads_file_once(tmp_path, monkeypatch):
+    path = tmp_path / "template.txt"
+    path.write_text("orbit = ***relative_orbit***\n")
+
+    opened = []
+    real_open = builtins.open
+
+    def counting_open(file, *args, **kwargs):
+        if str(file) == str(path):
+            opened.append(file)
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", counting_open)
+
+    for orbit in range(100):
+        assert load_template(str(path)).render({'relative_orbit': orbit}) == f"orbit = {orbit}\n"
+    assert len(opened) == 1
+
+    # A modified file is compiled again
+    path.write_text("track = ***relative_orbit***\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_template(str(path)).render({'relative_orbit': 54}) == "track = 54\n"
+    assert len(opened) == 2
@@ -0,0 +1,99 @@
+import os
+import json
+
+import numpy as np
+import pytest
+
+from maketemplate.api import location_record
+from maketemplate.cli.create_insar_template import create_parser, main
+from maketemplate.track_table import TrackTable, expand_tracks, read_dump
+from maketemplate.track_table import main as build_table
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sentinel1_footprints.json")
+SAKURAJIMA = "POLYGON((130.5892 31.2764,131.0501 31.2764,131.0501 31.5882,130.5892 31.5882,130.5892 31.2764))"
+SANGAY = "POLYGON((-78.3894 -2.0414,-78.2989 -2.0414,-78.2989 -1.979,-78.3894 -1.979,-78.3894 -2.0414))"
+
+
+@pytest.fixture
+def table_file(tmp_path):
+    path = str(tmp_path / "tracks.npy")
+    build_table([FIXTURE, "-o", path])
+    return path
+
+
+def test_table_is_memory_mapped(table_file):
+    table = TrackTable.load(table_file)
+
+    assert isinstance(table.table, np.memmap)
+    # Three acquisitions of track 54 frame 97 make one frame: 10 granules, 8 frames
+    assert len(table) == 8
+    assert list(table.table["min_lon"]) == sorted(table.table["min_lon"])
+
+
+def test_covering_tracks(table_file):
+    table = TrackTable.load(table_file)
+
+    sakurajima, sangay, nowhere = table.tracks([SAKURAJIMA, SANGAY, SAKURAJIMA.replace("130.", "10.")])
+    # 156 starts east of the polygon, 127 ends south of it; 61 covers it with two frames
+    assert sakurajima == [(54, "A", (97,)), (61, "D", (482, 487)), (163, "D", (487,))]
+    assert sangay == [(18, "A", (1180,)), (142, "D", (610,))]
+    assert nowhere == []
+
+    assert table.tracks([SAKURAJIMA], ["D"]) == [[(61, "D", (482, 487)), (163, "D", (487,))]]
+
+
+def test_expand_tracks(table_file):
+    table = TrackTable.load(table_file)
+    records = [
+        location_record(None, "SENTINEL-1A,SENTINEL-1B", "D", 31.28, 31.59, 130.59, 131.05, name="Sakurajima", polygon=SAKURAJIMA),
+        location_record(float("nan"), "SENTINEL-1A,SENTINEL-1B", None, -2.04, -1.98, -78.39, -78.3, name="Sangay", polygon=SANGAY),
+        location_record(54, "SENTINEL-1A,SENTINEL-1B", "A", 31.28, 31.59, 130.59, 131.05, name="Known", polygon=SAKURAJIMA),
+    ]
+
+    expanded = [(r["name"], r["direction"], r["relative_orbit"]) for r in expand_tracks(records, table, batch_size=2)]
+    assert expanded == [
+        ("Sakurajima", "D", 61), ("Sakurajima", "D", 163),
+        ("Sangay", "A", 18), ("Sangay", "D", 142),
+        ("Known", "A", 54),
+    ]
+
+
+def test_polygon_run_fills_tracks(table_file, tmp_path, capsys):
+    main(create_parser(["--polygon", SAKURAJIMA, "--direction", "D", "--track-table", table_file,
+                        "--save", "--dir", str(tmp_path)]))
+
+    assert "Templates: 2 created" in capsys.readouterr().out
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".template")) == [
+        "UnknownSenD163.template", "UnknownSenD61.template",
+    ]
+    assert "ssaraopt.relativeOrbit             = 61" in (tmp_path / "UnknownSenD61.template").read_text()
+
+
+def test_polygon_run_fills_tracks_of_both_directions(table_file, tmp_path):
+    main(create_parser(["--polygon", SAKURAJIMA, "--track-table", table_file, "--save", "--dir", str(tmp_path)]))
+
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".template")) == [
+        "UnknownSenA54.template", "UnknownSenD163.template", "UnknownSenD61.template",
+    ]
+    # Without table the direction is still ascending
+    assert create_parser(["--polygon", SAKURAJIMA]).direction == "A"
+
+
+def test_polygon_run_without_orbit(table_file, tmp_path, capsys):
+    # No --relativeOrbit and nothing to fill it in
+    with pytest.raises(SystemExit):
+        main(create_parser(["--polygon", SAKURAJIMA, "--save", "--dir", str(tmp_path)]))
+    assert "--relativeOrbit: is needed" in capsys.readouterr().err
+
+    # No track of the table covers the polygon
+    main(create_parser(["--polygon", SAKURAJIMA.replace("130.", "10."), "--track-table", table_file,
+                        "--save", "--dir", str(tmp_path)]))
+    assert "WARNING: no relative orbit covers Unknown" in capsys.readouterr().out
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".template")]
+
+
+def test_read_dump_formats(tmp_path):
+    results = read_dump(FIXTURE)
+    lines = tmp_path / "dump.jsonl"
+    lines.write_text("\n".join(json.dumps(r) for r in results) + "\n")
+    assert read_dump(str(lines)) == results
@@ -0,0 +1,112 @@
+import os
+import json
+
+import pandas as pd
+import pytest
+
+from maketemplate import read_excel
+from maketemplate.cli.create_insar_template import create_parser, main
+from maketemplate.template import CompiledTemplate
+from maketemplate.validate import check_polygon, check_template, validate_sheet
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XLSFILE = os.path.join(PROJECT_ROOT, "docs", "Central_America.xlsx")
+POLYGON = "POLYGON((130.5892 31.2764,131.0501 31.2764,131.0501 31.5882,130.5892 31.5882,130.5892 31.2764))"
+
+
+def _sheet(rows):
+    base = {"name": "Aso", "direction": "D", "ssaraopt.startDate": 20160701, "ssaraopt.endDate": "auto",
+            "ssaraopt.relativeOrbit": 54, "topsStack.subswath": "1 2", "mintpy.troposphericDelay": "auto",
+            "polygon": POLYGON, "satellite": "Sen"}
+    return pd.DataFrame([{**base, **row} for row in rows])
+
+
+def test_valid_sheet_has_no_problems():
+    df = read_excel.main(XLSFILE, columns=read_excel.SHEET_COLUMNS)
+    assert validate_sheet(df) == []
+
+
+def test_every_bad_row_is_reported():
+    df = _sheet([
+        {},
+        {"satellite": "Envisat"},
+        {"polygon": "POLYGON((1 2,3 ,5 6,1 2))"},
+        {"polygon": "POLYGON((1 2,3 4,5 6,1 3))"},
+        {"ssaraopt.startDate": "2016-07-01"},
+        {"ssaraopt.endDate": "20150230"},
+        {"ssaraopt.endDate": "20150101"},
+        {"ssaraopt.relativeOrbit": 200},
+        {"ssaraopt.relativeOrbit": None},
+    ])
+    problems = validate_sheet(df)
+
+    assert [(problem.row, problem.column) for problem in problems] == [
+        (3, "satellite"),
+        (4, "polygon"),
+        (5, "polygon"),
+        (6, "ssaraopt.startDate"),
+        (7, "ssaraopt.endDate"),
+        (8, "ssaraopt.endDate"),
+        (9, "ssaraopt.relativeOrbit"),
+        (10, "ssaraopt.relativeOrbit"),
+    ]
+    assert "not closed" in problems[2].message
+    assert problems[0].value == "Envisat"
+    # Rows without orbit pass when a track table or footprint index fills them in
+    assert [problem.row for problem in validate_sheet(df, allow_missing_orbit=True)][-1] == 9
+
+
+def test_check_polygon_and_template():
+    assert check_polygon(POLYGON) is None
+    assert "WKT" in check_polygon("POLYGON((130.5 31.2,131.0))")
+    assert "at least" in check_polygon("POLYGON((1 2,3 4,1 2))")
+    assert "outside" in check_polygon("POLYGON((1 2,3 4,5 96,1 2))")
+
+    problems = check_template(CompiledTemplate("lat1 = ***lat1***\nfoo = ***foo***\n"))
+    assert [problem.value for problem in problems] == ["***foo***"]
+
+
+def test_bad_sheet_fails_before_writing(tmp_path, capsys):
+    sheet = tmp_path / "sheet.csv"
+    _sheet([{}, {"polygon": "POLYGON((1 2,3 4))"}, {"satellite": "Envisat"}]).to_csv(sheet, index=False)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    report = tmp_path / "problems.json"
+
+    with pytest.raises(SystemExit) as error:
+        main(create_parser(["--xlsfile", str(sheet), "--save", "--dir", str(out_dir), "--validation-report", str(report)]))
+
+    assert error.value.code == 1
+    err = capsys.readouterr().err
+    assert err.startswith("2 problem(s) in the inputs:") and "Traceback" not in err
+    assert "row 3, polygon" in err
+    assert os.listdir(out_dir) == []
+    assert [entry["row"] for entry in json.loads(report.read_text())] == [3, 4]
+
+
+def test_validate_only_writes_nothing(tmp_path, capsys):
+    main(create_parser(["--xlsfile", XLSFILE, "--save", "--dir", str(tmp_path), "--validate-only"]))
+    assert "Inputs are valid (26 rows)" in capsys.readouterr().out
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("period", ["20170101:2019123", "2017-01-01", "20170101:20191332"])
+def test_period_dates_are_checked(period, capsys):
+    with pytest.raises(SystemExit) as error:
+        create_parser(["--polygon", POLYGON, "--period", period])
+    assert error.value.code == 2
+    assert "not valid" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("satellite, orbit", [("Sen", "999"), ("Sen", "0"), ("TerraSAR", "168")])
+def test_relative_orbit_is_checked(satellite, orbit, tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        main(create_parser(["--polygon", POLYGON, "--relativeOrbit", "54", orbit, "--satellite", satellite,
+                            "--dir", str(tmp_path), "--save"]))
+    assert "--relativeOrbit: must be a relative orbit" in capsys.readouterr().err
+    assert os.listdir(tmp_path) == []
+
+
+def test_period_accepts_valid_dates():
+    inps = create_parser(["--polygon", POLYGON, "--period", "20170101,20191231", "20200101:auto"])
+    assert inps.periods == [("20170101", "20191231"), ("20200101", "auto")]
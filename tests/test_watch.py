@@ -0,0 +1,102 @@
+import os
+import time
+import threading
+
+import pandas as pd
+import pytest
+
+from maketemplate import read_excel
+from maketemplate.cli import create_insar_template as cli
+from maketemplate.watch import Watcher, diff_rows, row_hashes
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XLSFILE = os.path.join(PROJECT_ROOT, "docs", "Central_America.xlsx")
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+@pytest.mark.parametrize("polling", [False, True])
+def test_watcher_sees_writes_and_replacements(tmp_path, polling):
+    path = tmp_path / "sheet.csv"
+    path.write_text("a\n")
+    with Watcher([str(path)], polling=polling, interval=0.05) as watcher:
+        assert watcher.wait(timeout=0.1) == []
+
+        path.write_text("a\nb\n")
+        assert watcher.wait(timeout=5) == [str(path)]
+
+        # Saved through a temporary file renamed over the original
+        (tmp_path / "sheet.tmp").write_text("c\n")
+        os.replace(tmp_path / "sheet.tmp", path)
+        assert watcher.wait(timeout=5) == [str(path)]
+
+
+def test_diff_rows():
+    old = pd.DataFrame({"name": ["A", "B", "C"], "topsStack.subswath": [2, "2 3", 1]})
+    new = pd.DataFrame({"name": ["X", "A", "B", "C"], "topsStack.subswath": [1, 2, "1 2", 1]})
+    added, removed = diff_rows(row_hashes(old), row_hashes(new))
+    assert added.tolist() == [0, 2]
+    assert removed == 1
+
+
+def test_watch_renders_changed_rows_only(tmp_path):
+    sheet = tmp_path / "sheet.csv"
+    df = read_excel.main(XLSFILE, columns=read_excel.SHEET_COLUMNS)
+    df.to_csv(sheet, index=False)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    inps = cli.create_parser(["--xlsfile", str(sheet), "--save", "--dir", str(out_dir), "--watch"])
+
+    stop = threading.Event()
+    thread = threading.Thread(target=cli._watch, args=(inps, stop))
+    thread.start()
+    try:
+        _wait_for(lambda: len(os.listdir(out_dir)) == 26 + 1)
+        before = {name: os.stat(out_dir / name).st_mtime_ns for name in os.listdir(out_dir)}
+        time.sleep(0.6)  # let the watcher start
+
+        df.loc[2, "topsStack.subswath"] = "1 2 3"
+        df.to_csv(sheet, index=False)
+        changed = out_dir / "SangaySenD142.template"
+        _wait_for(lambda: "topsStack.subswath                 = 1 2 3" in changed.read_text())
+    finally:
+        stop.set()
+        thread.join()
+
+    after = {name: os.stat(out_dir / name).st_mtime_ns for name in os.listdir(out_dir)}
+    assert [name for name in before if name.endswith(".template") and before[name] != after[name]] == [changed.name]
+
+
+def test_watch_survives_partly_saved_workbook(tmp_path, capsys):
+    sheet = tmp_path / "sheet.xlsx"
+    content = open(XLSFILE, "rb").read()
+    sheet.write_bytes(content)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    inps = cli.create_parser(["--xlsfile", str(sheet), "--save", "--dir", str(out_dir), "--watch"])
+
+    stop = threading.Event()
+    thread = threading.Thread(target=cli._watch, args=(inps, stop))
+    thread.start()
+    try:
+        _wait_for(lambda: len(os.listdir(out_dir)) == 26 + 1)
+        time.sleep(0.6)  # let the watcher start
+
+        sheet.write_bytes(content[:len(content) // 2])
+        _wait_for(lambda: "Waiting for the next change" in capsys.readouterr().out)
+        sheet.write_bytes(content)
+        _wait_for(lambda: "Re-rendered 0 of 26 rows" in capsys.readouterr().out)
+        assert thread.is_alive()
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_watch_needs_sheet():
+    with pytest.raises(SystemExit):
+        cli.create_parser(["--polygon", "POLYGON((1 2,3 4,5 6,1 2))", "--watch"])